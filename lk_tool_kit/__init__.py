@@ -4,6 +4,7 @@ from __future__ import print_function
 
 from ._version import get_versions
 from .func_redis_cache import RedisCache
+from .keyspace_analyzer import KeyspaceAnalyzer
 from .log_utils import UUIDFilter, time_consuming_log
 from .model_utils import (
     compiles_init,
@@ -14,6 +15,7 @@ from .model_utils import (
 from .model_utils.csv_data_model import CSVData
 from .model_utils.pymysql_converters_update import pymysql_converters_update
 from .port_detect import port_used
+from .sharded_redis_cache import ShardedRedisCache
 
 __version__ = get_versions()["version"]
 
@@ -22,6 +24,8 @@ del get_versions
 __all__ = [
     CSVData,
     RedisCache,
+    ShardedRedisCache,
+    KeyspaceAnalyzer,
     UUIDFilter,
     time_consuming_log,
     pymysql_converters_update,
@@ -29,5 +29,90 @@ def version() -> str:
     return lk_tool_kit.__version__
 
 
+def warm_up(
+    target: str,
+    file: str = None,
+    recorded: bool = False,
+    concurrency: int = 4,
+    executor: str = None,
+    batch_size: int = 100,
+) -> dict:
+    """预热缓存函数 只计算redis中不存在的参数集
+
+    Args:
+        target: 缓存函数的导入路径 eg. "my_app.service:get_report"
+        file: 参数集文件(JSON Lines) 每行为数组(位置参数)/对象(关键字参数)/单个参数
+        recorded: 重放 cached(record_hits=True) 记录的命中参数集
+        concurrency: 同时计算的最大数量
+        executor: thread/process, 协程函数为 asyncio; 默认同步函数为thread
+        batch_size: 每批检查与写入的参数集数量
+
+    Returns:
+        总数/跳过/计算/失败数, 耗时与吞吐量
+    """
+    import logging
+
+    from lk_tool_kit.cache_utils.warm_up import import_object, load_arg_sets
+
+    logging.basicConfig(level=logging.INFO)
+    if (file is None) == (not recorded):
+        raise ValueError("need exactly one of --file or --recorded")
+    decorator = import_object(target)
+    arg_sets = decorator.recorded_arg_sets() if recorded else load_arg_sets(file)
+    options = dict(concurrency=concurrency, batch_size=batch_size)
+    if executor is not None:
+        options["executor"] = executor
+    report = decorator.warm_up(arg_sets, **options)
+    decorator.redis_cache.flush()
+    return report.as_dict()
+
+
+def analyze_keyspace(
+    url: str,
+    name: str = "cache",
+    pattern: str = "*",
+    sample_rate: float = 1.0,
+    max_keys_per_second: float = 1000,
+    memory_usage: bool = None,
+    limit: int = None,
+    output: str = "table",
+) -> str:
+    """分析RedisCache命名空间的内存占用 按函数前缀输出键数量/大小/TTL/压缩占比
+
+    Args:
+        url: redis url eg. "redis://localhost:6379/1", 多个分片用逗号分隔
+        name: RedisCache.name
+        pattern: 匹配模式(不含命名空间前缀)
+        sample_rate: 读取大小/TTL/头部的抽样比例
+        max_keys_per_second: 每秒最多遍历的键数 避免影响线上redis
+        memory_usage: 是否使用 MEMORY USAGE, 默认自动检测, 不支持时使用STRLEN
+        limit: 每个节点最多遍历的键数
+        output: table 或 json
+    """
+    import json
+
+    from lk_tool_kit import RedisCache, ShardedRedisCache
+    from lk_tool_kit.keyspace_analyzer import KeyspaceAnalyzer, format_table
+
+    if output not in ("table", "json"):
+        raise ValueError("output must be table or json")
+    urls = url.split(",")
+    if len(urls) > 1:
+        redis_cache = ShardedRedisCache.from_urls(urls, name=name)
+    else:
+        redis_cache = RedisCache.from_url(url, name=name)
+    analyzer = KeyspaceAnalyzer(
+        redis_cache,
+        sample_rate=sample_rate,
+        max_keys_per_second=max_keys_per_second,
+        memory_usage=memory_usage,
+        limit=limit,
+    )
+    report = analyzer.analyze(pattern)
+    if output == "json":
+        return json.dumps(report, indent=2, ensure_ascii=False)
+    return format_table(report)
+
+
 if __name__ == "__main__":
     entry_point()
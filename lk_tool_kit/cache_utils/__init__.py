@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 10:05
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : __init__.py
+from lk_tool_kit.cache_utils.admission import (
+    AdmissionPolicy,
+    AllOf,
+    CountMinSketch,
+    FrequencyAdmission,
+    MaxSize,
+    MinComputeTime,
+)
+from lk_tool_kit.cache_utils.chunking import ChunkedValue, ChunkManifest
+from lk_tool_kit.cache_utils.circuit_breaker import CircuitBreaker, RedisUnavailable
+from lk_tool_kit.cache_utils.hash_ring import HashRing
+from lk_tool_kit.cache_utils.invalidation import InvalidationBus
+from lk_tool_kit.cache_utils.key_builder import hash_arguments, signature_key_fn
+from lk_tool_kit.cache_utils.local_cache import LocalCache
+from lk_tool_kit.cache_utils.metrics import (
+    LATENCY_BUCKETS,
+    SIZE_BUCKETS,
+    TTL_BUCKETS,
+    CacheMetrics,
+    Histogram,
+    render_prometheus,
+)
+from lk_tool_kit.cache_utils.pool import (
+    PoolRegistry,
+    StatsBlockingConnectionPool,
+    StatsConnectionPool,
+    pool_registry,
+    pool_stats,
+)
+from lk_tool_kit.cache_utils.refresh_ahead import DecayingCounter, RefreshAheadScheduler
+from lk_tool_kit.cache_utils.warm_up import CallArgs, WarmUpReport, load_arg_sets
+from lk_tool_kit.cache_utils.write_behind import (
+    AsyncWriteBehindWriter,
+    WriteBehindWriter,
+)
+
+__all__ = [
+    LocalCache,
+    WriteBehindWriter,
+    AsyncWriteBehindWriter,
+    hash_arguments,
+    signature_key_fn,
+    CacheMetrics,
+    Histogram,
+    render_prometheus,
+    LATENCY_BUCKETS,
+    SIZE_BUCKETS,
+    TTL_BUCKETS,
+    PoolRegistry,
+    StatsConnectionPool,
+    StatsBlockingConnectionPool,
+    pool_registry,
+    pool_stats,
+    HashRing,
+    InvalidationBus,
+    ChunkManifest,
+    ChunkedValue,
+    CallArgs,
+    WarmUpReport,
+    load_arg_sets,
+    CircuitBreaker,
+    RedisUnavailable,
+    AdmissionPolicy,
+    AllOf,
+    CountMinSketch,
+    FrequencyAdmission,
+    MaxSize,
+    MinComputeTime,
+    DecayingCounter,
+    RefreshAheadScheduler,
+]
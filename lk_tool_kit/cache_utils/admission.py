@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/19 02:20
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : admission.py
+import hashlib
+import threading
+from typing import Iterable, List, Optional, Union
+
+
+class AdmissionPolicy:
+    """缓存写入准入策略 未命中计算完成后决定是否写入redis
+
+    子类实现 admit, 参数为缓存键、序列化后的字节数与计算(含序列化)耗时(秒)
+    """
+
+    def admit(self, key: str, size: int, compute_time: float) -> bool:
+        raise NotImplementedError
+
+    def __and__(self, other: "AdmissionPolicy") -> "AllOf":
+        return AllOf(self, other)
+
+
+class MinComputeTime(AdmissionPolicy):
+    def __init__(self, seconds: float):
+        """只缓存计算耗时不少于 seconds 秒的结果
+
+        >>> MinComputeTime(0.01).admit("key", 10, 0.001)
+        False
+        """
+        self.seconds = seconds
+
+    def admit(self, key: str, size: int, compute_time: float) -> bool:
+        return compute_time >= self.seconds
+
+
+class MaxSize(AdmissionPolicy):
+    def __init__(self, max_bytes: int):
+        """不缓存序列化后超过 max_bytes 字节的结果
+
+        >>> MaxSize(1024).admit("key", 2048, 1.0)
+        False
+        """
+        self.max_bytes = max_bytes
+
+    def admit(self, key: str, size: int, compute_time: float) -> bool:
+        return size <= self.max_bytes
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 4096, depth: int = 4, sample_size: int = None):
+        """进程内的近似频率统计 (count-min sketch)
+
+        计数只会高估不会低估; 累计 sample_size 次后所有计数减半(TinyLFU老化),
+        使频率反映近期的访问
+
+        Args:
+            width: 每行计数器数量
+            depth: 行数(哈希函数数) 不超过8
+            sample_size: 老化周期 默认 10 * width
+
+        >>> sketch = CountMinSketch(width=64, sample_size=8)
+        >>> [sketch.increment("a") for _ in range(3)]
+        [1, 2, 3]
+        >>> sketch.estimate("b")
+        0
+        >>> for _ in range(5):
+        ...     _ = sketch.increment("c")
+        >>> sketch.estimate("a")  # 第8次计数后减半
+        1
+        """
+        if not 0 < depth <= 8:
+            raise ValueError("depth must be in [1, 8]")
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size or 10 * width
+        self._rows = [[0] * width for _ in range(depth)]
+        self._additions = 0
+        self._lock = threading.Lock()
+
+    def _indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.depth).digest()
+        words = memoryview(digest).cast("Q")
+        return [word % self.width for word in words]
+
+    def estimate(self, key: str) -> int:
+        indexes = self._indexes(key)
+        with self._lock:
+            return min(row[index] for row, index in zip(self._rows, indexes))
+
+    def increment(self, key: str) -> int:
+        """计数加一 返回加一后的估计值"""
+        indexes = self._indexes(key)
+        with self._lock:
+            for row, index in zip(self._rows, indexes):
+                row[index] += 1
+            count = min(row[index] for row, index in zip(self._rows, indexes))
+            self._additions += 1
+            if self._additions >= self.sample_size:
+                self._additions //= 2
+                for row in self._rows:
+                    row[:] = [value >> 1 for value in row]
+            return count
+
+
+class FrequencyAdmission(AdmissionPolicy):
+    def __init__(self, min_count: int = 2, width: int = 4096, depth: int = 4):
+        """同一缓存键第 min_count 次未命中时才写入, 只被请求一次的结果不进入redis
+
+        频率保存在进程内的 CountMinSketch 中, 多进程时各自计数
+
+        Args:
+            min_count: 写入所需的最少请求次数
+            width: sketch 每行计数器数量 宜大于热点键数量
+            depth: sketch 行数
+
+        >>> policy = FrequencyAdmission()
+        >>> policy.admit("key", 10, 0.1), policy.admit("key", 10, 0.1)
+        (False, True)
+        """
+        self.min_count = min_count
+        self.sketch = CountMinSketch(width, depth)
+
+    def admit(self, key: str, size: int, compute_time: float) -> bool:
+        return self.sketch.increment(key) >= self.min_count
+
+
+class AllOf(AdmissionPolicy):
+    def __init__(self, *policies: AdmissionPolicy):
+        """全部策略都准入时才写入 按顺序判断, 前面的策略拒绝时不再调用后面的
+
+        >>> policy = MaxSize(1024) & MinComputeTime(0.01)
+        >>> policy.admit("key", 10, 0.1), policy.admit("key", 2048, 0.1)
+        (True, False)
+        """
+        self.policies = policies
+
+    def admit(self, key: str, size: int, compute_time: float) -> bool:
+        return all(policy.admit(key, size, compute_time) for policy in self.policies)
+
+
+AdmissionOption = Union[AdmissionPolicy, Iterable[AdmissionPolicy], None]
+
+
+def get_admission(admission: AdmissionOption) -> Optional[AdmissionPolicy]:
+    """cached(admission=...) 的参数转换为策略 多个策略组合为 AllOf
+
+    >>> get_admission([MaxSize(10), MinComputeTime(1)]).policies[0].max_bytes
+    10
+    """
+    if admission is None or isinstance(admission, AdmissionPolicy):
+        return admission
+    return AllOf(*admission)
@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 22:30
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : chunking.py
+import hashlib
+import uuid
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+CHUNK_MAGIC = b"\x00lkchunk:"
+MIN_CHUNK_SIZE = 1024  # 序列化头部必须完整地落在第一块中
+
+# 缓存键的原值为分块清单时删除其各块 ARGV[1]为CHUNK_MAGIC, ARGV[2]为分块前缀
+_UNLINK_OLD_CHUNKS = """
+local old = redis.call("get", KEYS[1])
+if old and string.sub(old, 1, #ARGV[1]) == ARGV[1] then
+    local chunk_id, count = string.match(string.sub(old, #ARGV[1] + 1), "^(%w+):(%d+):")
+    if chunk_id then
+        for index = 0, tonumber(count) - 1 do
+            redis.call("unlink", ARGV[2] .. chunk_id .. ":" .. index)
+        end
+    end
+end
+"""
+
+# 删除缓存键 键为分块清单时同时删除各块
+DELETE_CHUNKED_SCRIPT = (
+    _UNLINK_OLD_CHUNKS
+    + """
+return redis.call("unlink", KEYS[1])
+"""
+)
+
+# 覆盖写入缓存键 ARGV[3]为新值, ARGV[4]为过期时间(秒, 0为不过期); 原值的各块被删除, 不会遗留
+SET_CHUNKED_SCRIPT = (
+    _UNLINK_OLD_CHUNKS
+    + """
+if tonumber(ARGV[4]) > 0 then
+    redis.call("set", KEYS[1], ARGV[3], "ex", ARGV[4])
+else
+    redis.call("set", KEYS[1], ARGV[3])
+end
+return 1
+"""
+)
+
+
+class ChunkManifest(NamedTuple):
+    """分块清单 保存在原缓存键中, 各块保存在 `前缀+chunk_id:序号` 中"""
+
+    chunk_id: str
+    count: int
+    size: int
+    digest: str
+
+    def dumps(self) -> bytes:
+        return CHUNK_MAGIC + ("%s:%d:%d:%s" % self).encode()
+
+    @classmethod
+    def loads(cls, value: bytes) -> Optional["ChunkManifest"]:
+        """解析分块清单 不是清单时返回None
+
+        >>> manifest = ChunkManifest("abc", 2, 2048, "ff")
+        >>> ChunkManifest.loads(manifest.dumps()) == manifest
+        True
+        >>> ChunkManifest.loads(b"value") is None
+        True
+        """
+        if not value or not value.startswith(CHUNK_MAGIC):
+            return None
+        try:
+            chunk_id, count, size, digest = (
+                value[len(CHUNK_MAGIC) :].decode().split(":")  # noqa: E203
+            )
+            return cls(chunk_id, int(count), int(size), digest)
+        except ValueError:
+            return None
+
+    def keys(self, prefix: str) -> List[str]:
+        return [
+            "%s%s:%d" % (prefix, self.chunk_id, index) for index in range(self.count)
+        ]
+
+
+def _digest(chunks) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def split_chunks(
+    value: Union[bytes, memoryview], chunk_size: int
+) -> Tuple[ChunkManifest, List[memoryview]]:
+    """按固定大小切分 各块为原数据的memoryview, 不复制数据
+
+    >>> manifest, chunks = split_chunks(b"a" * 2500, 1024)
+    >>> manifest.count, manifest.size, [len(chunk) for chunk in chunks]
+    (3, 2500, [1024, 1024, 452])
+    """
+    if chunk_size < MIN_CHUNK_SIZE:
+        raise ValueError("chunk_size must be at least %d" % MIN_CHUNK_SIZE)
+    view = memoryview(value)
+    starts = range(0, len(view), chunk_size)
+    chunks = [view[start : start + chunk_size] for start in starts]  # noqa: E203
+    manifest = ChunkManifest(uuid.uuid4().hex, len(chunks), len(view), _digest(chunks))
+    return manifest, chunks
+
+
+def join_chunks(
+    manifest: ChunkManifest, chunks: List[Optional[bytes]]
+) -> Optional["ChunkedValue"]:
+    """校验各块的大小与摘要 块缺失或数据不一致时返回None
+
+    >>> manifest, chunks = split_chunks(b"a" * 2500, 1024)
+    >>> len(join_chunks(manifest, [bytes(chunk) for chunk in chunks]))
+    2500
+    >>> join_chunks(manifest, [bytes(chunk) for chunk in chunks[:2]] + [None]) is None
+    True
+    >>> join_chunks(manifest, [b"b" * 1024] + [bytes(chunk) for chunk in chunks[1:]]) is None
+    True
+    """
+    if len(chunks) != manifest.count or any(chunk is None for chunk in chunks):
+        return None
+    if sum(len(chunk) for chunk in chunks) != manifest.size:
+        return None
+    if _digest(chunks) != manifest.digest:
+        return None
+    return ChunkedValue(chunks)
+
+
+class ChunkedValue:
+    def __init__(self, chunks: List[bytes]):
+        """分块读取的缓存值 保留各块数据, 不拼接为一个完整的bytes
+
+        支持 len/切片/下标, 反序列化时通过 iter_from 逐块流式解压
+
+        >>> value = ChunkedValue([b"abc", b"def"])
+        >>> len(value), value[2:4], value[4], bytes(value)
+        (6, b'cd', 101, b'abcdef')
+        >>> [bytes(chunk) for chunk in value.iter_from(4)]
+        [b'ef']
+        """
+        self.chunks = chunks
+        self._size = sum(len(chunk) for chunk in chunks)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __bytes__(self) -> bytes:
+        return b"".join(self.chunks)
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[int, bytes]:
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._size)
+            if step != 1:
+                return bytes(self)[item]
+            return b"".join(self.iter_from(start, stop - start))
+        if item < 0:
+            item += self._size
+        for chunk in self.iter_from(item, 1):
+            return chunk[0]
+        raise IndexError("ChunkedValue index out of range")
+
+    def iter_from(
+        self, offset: int = 0, length: Optional[int] = None
+    ) -> Iterator[memoryview]:
+        """从 offset 开始依次返回各块数据"""
+        remaining = self._size - offset if length is None else length
+        for chunk in self.chunks:
+            if remaining <= 0:
+                return
+            if offset >= len(chunk):
+                offset -= len(chunk)
+                continue
+            view = memoryview(chunk)[offset : offset + remaining]  # noqa: E203
+            offset = 0
+            remaining -= len(view)
+            yield view
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/19 01:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : circuit_breaker.py
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from lk_tool_kit.cache_utils.metrics import CacheMetrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_COUNTERS = (
+    "failures",
+    "slow_calls",
+    "rejected",
+    "opened",
+    "half_opened",
+    "closed",
+)
+_TRANSITION_COUNTERS = {OPEN: "opened", HALF_OPEN: "half_opened", CLOSED: "closed"}
+
+
+class RedisUnavailable(Exception):
+    """redis调用失败/超出耗时预算, 或熔断器打开 调用方应绕过缓存"""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 10.0,
+        half_open_max_calls: int = 1,
+    ):
+        """redis调用的熔断器
+
+        closed: 正常调用, 连续失败(含超出耗时预算)达到 failure_threshold 次后打开;
+        open: 直接拒绝调用, recovery_timeout 秒后进入半开;
+        half_open: 最多放行 half_open_max_calls 个探测调用, 成功则关闭, 失败则重新打开.
+
+        Args:
+            failure_threshold: 打开熔断器的连续失败次数
+            recovery_timeout: 打开后多久开始探测(秒)
+            half_open_max_calls: 半开状态同时放行的探测调用数
+
+        >>> breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0)
+        >>> breaker.record_failure()
+        >>> breaker.record_failure()
+        >>> breaker.state
+        'open'
+        >>> breaker.allow(), breaker.state, breaker.allow()
+        (True, 'half_open', False)
+        >>> breaker.record_success()
+        >>> breaker.state
+        'closed'
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.metrics = CacheMetrics(counters=BREAKER_COUNTERS)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self.metrics.incr(_TRANSITION_COUNTERS[state])
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == HALF_OPEN:
+            self._probes = 0
+        self._failures = 0
+        logger.warning("redis circuit breaker %s", state)
+
+    def allow(self) -> bool:
+        """是否放行本次调用"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self.metrics.incr("rejected")
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self.metrics.incr("rejected")
+                    return False
+                self._probes += 1
+            return True
+
+    def release(self) -> None:
+        """调用未得到结果(如被取消)时归还半开状态的探测名额, 不记录成功或失败"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self.state == HALF_OPEN:
+                self._transition(CLOSED)
+
+    def record_failure(self, slow: bool = False) -> None:
+        """记录一次失败 slow 为超出耗时预算"""
+        with self._lock:
+            self.metrics.incr("slow_calls" if slow else "failures")
+            if self.state == HALF_OPEN:
+                self._transition(OPEN)
+            elif self.state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.metrics.counters(), state=self.state)
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 20:00
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : hash_ring.py
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+    )
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 160):
+        """一致性哈希环 每个节点映射为 replicas 个虚拟节点
+
+        增删节点只会迁移约 1/节点数 的键
+
+        Args:
+            nodes: 节点名称 环上位置只由名称决定, 与加入顺序无关
+            replicas: 每个节点的虚拟节点数
+
+        >>> ring = HashRing(["a", "b", "c"])
+        >>> keys = ["key%s" % i for i in range(1000)]
+        >>> before = {key: ring.get_node(key) for key in keys}
+        >>> ring.add_node("d")
+        >>> moved = [key for key in keys if ring.get_node(key) != before[key]]
+        >>> all(ring.get_node(key) == "d" for key in moved)
+        True
+        >>> 150 < len(moved) < 350
+        True
+        """
+        self.replicas = replicas
+        # (有序位置, 位置->节点) 整体替换, 读取时无需加锁
+        self._state: Tuple[List[int], Dict[int, str]] = ([], {})
+        self._nodes: List[str] = []
+        self._lock = threading.Lock()
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add_node(self, node: str) -> None:
+        with self._lock:
+            if node in self._nodes:
+                raise ValueError("node %r already in ring" % node)
+            self._nodes.append(node)
+            ring = dict(self._state[1])
+            for index in range(self.replicas):
+                ring[_hash("%s#%s" % (node, index))] = node
+            self._state = (sorted(ring), ring)
+
+    def remove_node(self, node: str) -> None:
+        with self._lock:
+            self._nodes.remove(node)
+            ring = {
+                position: owner
+                for position, owner in self._state[1].items()
+                if owner != node
+            }
+            self._state = (sorted(ring), ring)
+
+    def get_node(self, key: str) -> Optional[str]:
+        """键所在的节点 环为空时返回None"""
+        positions, ring = self._state
+        if not positions:
+            return None
+        index = bisect.bisect(positions, _hash(key)) % len(positions)
+        return ring[positions[index]]
+
+    def __len__(self) -> int:
+        return len(self._nodes)
@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 21:00
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : invalidation.py
+import atexit
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, List, Optional
+
+import redis
+
+from lk_tool_kit.cache_utils.metrics import CacheMetrics
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_COUNTERS = (
+    "published",
+    "publish_errors",
+    "received",
+    "reconnects",
+)
+
+
+def is_pattern(key: str) -> bool:
+    """是否为 glob 匹配模式"""
+    return any(char in key for char in "*?[")
+
+
+def compact_keys(keys: Iterable[str], max_batch: int) -> List[str]:
+    """合并待发送的失效键 数量超过max_batch时退化为按函数名前缀失效
+
+    >>> compact_keys(["f:1", "f:2", "g:1"], 10)
+    ['f:1', 'f:2', 'g:1']
+    >>> compact_keys(["f:1", "f:2", "g:1"], 2)
+    ['f:*', 'g:*']
+    >>> compact_keys(["f:1", "*"], 10)
+    ['*']
+    """
+    keys = sorted(set(keys))
+    if "*" in keys:
+        return ["*"]
+    if len(keys) > max_batch:
+        keys = sorted({key.split(":", 1)[0] + ":*" for key in keys})
+    return keys
+
+
+class InvalidationBus:
+    def __init__(
+        self,
+        database: redis.Redis,
+        channel: str,
+        on_invalidate: Callable[[List[str]], None],
+        on_reset: Callable[[], None],
+        batch_interval: float = 0.01,
+        max_batch: int = 500,
+        fallback_ttl: float = 1.0,
+        reconnect_delay: float = 0.5,
+        max_reconnect_delay: float = 30,
+    ):
+        """通过redis pub/sub 在进程间广播一级缓存失效
+
+        发布: 失效键先放入集合, 由后台线程每 batch_interval 秒合并为一条消息发送;
+        订阅: 后台线程接收其他进程的消息并调用 on_invalidate, 跳过本进程发出的消息.
+        订阅断开期间 connected 为False, 调用方应缩短一级缓存过期时间至 fallback_ttl;
+        订阅断开时与(重新)连接成功后都调用 on_reset 清空一级缓存:
+        断开前写入的条目不再能收到失效消息, 断线期间写入的条目可能错过了失效消息.
+
+        Args:
+            database: redis连接
+            channel: 频道名称
+            on_invalidate: 收到失效键(可能为 glob 模式)时的回调
+            on_reset: 订阅断开及(重新)建立时的回调
+            batch_interval: 合并发送的时间窗口(秒)
+            max_batch: 单条消息最多包含的键数 超出时按函数名前缀失效
+            fallback_ttl: 订阅断开时一级缓存的最长过期时间(秒)
+            reconnect_delay: 首次重连等待时间(秒) 之后指数退避
+            max_reconnect_delay: 最长重连等待时间(秒)
+        """
+        self.database = database
+        self.channel = channel
+        self.on_invalidate = on_invalidate
+        self.on_reset = on_reset
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.fallback_ttl = fallback_ttl
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.origin = uuid.uuid4().hex
+        self.connected = False
+        self.metrics = CacheMetrics(counters=INVALIDATION_COUNTERS)
+        self._pending = set()
+        self._cond = threading.Condition()
+        self._closed = threading.Event()
+        self._publisher: Optional[threading.Thread] = None
+        self._subscriber: Optional[threading.Thread] = None
+        self._atexit_registered = False
+
+    def _register_atexit(self) -> None:
+        if not self._atexit_registered:
+            self._atexit_registered = True
+            atexit.register(self.close, 1)
+
+    def publish(self, key: str) -> None:
+        """加入待发送的失效键 不阻塞调用方"""
+        if self._closed.is_set():
+            return
+        with self._cond:
+            self._pending.add(key)
+            if self._publisher is None:
+                self._register_atexit()
+                self._publisher = threading.Thread(
+                    target=self._run_publisher, daemon=True
+                )
+                self._publisher.start()
+            self._cond.notify()
+
+    def start(self) -> None:
+        """启动订阅线程 重复调用无副作用"""
+        with self._cond:
+            if self._subscriber is not None or self._closed.is_set():
+                return
+            self._register_atexit()
+            self._subscriber = threading.Thread(
+                target=self._run_subscriber, daemon=True
+            )
+            self._subscriber.start()
+
+    def _run_publisher(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed.is_set():
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            if not self._closed.is_set():
+                time.sleep(self.batch_interval)  # 合并时间窗口内的失效
+            with self._cond:
+                keys, self._pending = self._pending, set()
+            self._send(compact_keys(keys, self.max_batch))
+
+    def _send(self, keys: List[str]) -> None:
+        message = json.dumps({"origin": self.origin, "keys": keys})
+        try:
+            self.database.publish(self.channel, message)
+            self.metrics.incr("published")
+        except redis.RedisError as error:
+            self.metrics.incr("publish_errors")
+            logger.warning("publish cache invalidation failed: %r", error)
+
+    def _run_subscriber(self) -> None:
+        delay = self.reconnect_delay
+        while not self._closed.is_set():
+            pubsub = None
+            try:
+                pubsub = self.database.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.connected = True
+                self.on_reset()
+                delay = self.reconnect_delay
+                while not self._closed.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle(message["data"])
+            except Exception as error:
+                logger.warning("cache invalidation subscriber error: %r", error)
+            finally:
+                if self.connected:
+                    self.connected = False  # 先标记断开, 之后写入的条目使用 fallback_ttl
+                    self.on_reset()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception as error:
+                        logger.debug("close pubsub failed: %r", error)
+            if self._closed.wait(delay):
+                break
+            self.metrics.incr("reconnects")
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _handle(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning("invalid cache invalidation message: %r", data)
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.metrics.incr("received")
+        self.on_invalidate(message.get("keys", []))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """发送剩余的失效键并停止后台线程"""
+        self._closed.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in (self._publisher, self._subscriber):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
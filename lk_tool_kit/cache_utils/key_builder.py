@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 15:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : key_builder.py
+import hashlib
+import inspect
+import pickle  # noqa: S403
+import sys
+from typing import Any, Callable
+
+_SCALAR_TYPES = (bool, int, float, complex, type(None))
+
+
+def _update_digest(digest: Any, value: Any) -> None:  # noqa: C901
+    """将参数按类型写入摘要
+
+    基础类型按值写入, 容器递归写入, numpy/pandas 对象直接写入底层内存,
+    其他对象退化为pickle. 每段数据带类型标记与长度, 避免不同参数拼接后相同.
+    """
+    if isinstance(value, _SCALAR_TYPES):
+        data = repr(value).encode()
+        digest.update(b"%s%d:" % (type(value).__name__.encode(), len(data)))
+        digest.update(data)
+    elif isinstance(value, str):
+        data = value.encode("utf-8", "surrogatepass")
+        digest.update(b"s%d:" % len(data))
+        digest.update(data)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest.update(b"b%d:" % len(value))
+        digest.update(value)
+    elif isinstance(value, (tuple, list)):
+        digest.update(b"%s%d:" % (type(value).__name__.encode(), len(value)))
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, dict):
+        digest.update(b"d%d:" % len(value))
+        for key, item in sorted(value.items(), key=lambda kv: repr(kv[0])):
+            _update_digest(digest, key)
+            _update_digest(digest, item)
+    elif isinstance(value, (set, frozenset)):
+        digest.update(b"S%d:" % len(value))
+        for item in sorted(value, key=repr):
+            _update_digest(digest, item)
+    elif not _update_array_digest(digest, value):
+        data = pickle.dumps(value, protocol=4)
+        digest.update(b"o%d:" % len(data))
+        digest.update(data)
+
+
+def _update_array_digest(digest: Any, value: Any) -> bool:
+    """numpy/pandas 对象直接写入底层内存, 避免pickle整个对象
+
+    仅当调用方已导入numpy/pandas时才可能传入此类对象, 因此不主动导入.
+
+    Returns:
+        不是numpy/pandas对象时返回False
+    """
+    np = sys.modules.get("numpy")
+    pd = sys.modules.get("pandas")
+    if np is not None and isinstance(value, np.ndarray) and value.dtype != object:
+        header = "%s%s" % (value.dtype.str, value.shape)
+        digest.update(b"n%s:" % header.encode())
+        digest.update(np.ascontiguousarray(value).data)
+        return True
+    if np is not None and isinstance(value, np.generic):
+        digest.update(b"g%s:" % value.dtype.str.encode())
+        digest.update(value.tobytes())
+        return True
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        if isinstance(value, pd.DataFrame):
+            header = repr((list(value.columns), [str(t) for t in value.dtypes]))
+        else:
+            header = repr((value.name, str(value.dtype)))
+        digest.update(b"p%s%s:" % (type(value).__name__.encode(), header.encode()))
+        hashed = pd.util.hash_pandas_object(
+            value, index=not isinstance(value, pd.Index)
+        )
+        digest.update(np.ascontiguousarray(hashed.values).data)
+        return True
+    return False
+
+
+def hash_arguments(*args, **kwargs) -> str:
+    """不绑定函数签名时的参数摘要 关键字参数按名称排序
+
+    >>> hash_arguments(1, b=2, a=1) == hash_arguments(1, a=1, b=2)
+    True
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_digest(digest, args)
+    _update_digest(digest, kwargs)
+    return digest.hexdigest()
+
+
+def signature_key_fn(func: Callable) -> Callable[..., str]:
+    """生成按函数签名归一化参数的缓存键函数
+
+    参数先绑定到函数签名并填充默认值, 因此 f(1), f(x=1), f(1, y=默认值)
+    得到同一个缓存键; 摘要使用 blake2b(16 字节).
+
+    Args:
+        func: 被缓存的函数, 签名只解析一次
+
+    >>> def func(x, y=2, **kwargs):
+    ...     pass
+    >>> key_fn = signature_key_fn(func)
+    >>> key_fn(1) == key_fn(x=1) == key_fn(1, y=2) == key_fn(1, 2)
+    True
+    >>> key_fn(1, a=1, b=2) == key_fn(1, b=2, a=1)
+    True
+    >>> key_fn(1) == key_fn(2)
+    False
+    """
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):  # pragma: no cover  部分内置函数无签名
+        return hash_arguments
+
+    def key_fn(*args, **kwargs) -> str:
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            return hash_arguments(*args, **kwargs)
+        bound.apply_defaults()
+        digest = hashlib.blake2b(digest_size=16)
+        for name, value in bound.arguments.items():
+            _update_digest(digest, name)
+            _update_digest(digest, value)
+        return digest.hexdigest()
+
+    return key_fn
@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 10:05
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : local_cache.py
+import fnmatch
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class LocalCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        maxbytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        """进程内 LRU/TTL 缓存, 作为 RedisCache 之前的一级缓存
+
+        Args:
+            maxsize: 最大条目数
+            maxbytes: 最大字节数(按写入时给定的 size 累计), None 为不限制
+            ttl: 默认过期时间(秒), None 为不过期
+
+        >>> local = LocalCache(maxsize=2)
+        >>> local.set("a", 1)
+        >>> local.set("b", 2)
+        >>> local.get("a")
+        1
+        >>> local.set("c", 3)  # 淘汰最久未使用的 b
+        >>> local.get("b", "miss")
+        'miss'
+        >>> len(local)
+        2
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """获取缓存 过期或不存在时返回default"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expire_at, _ = item
+            if expire_at is not None and expire_at <= time.time():
+                self._pop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(  # noqa: A003
+        self, key: str, value: Any, size: int = 0, ttl: Optional[float] = None
+    ) -> None:
+        """写入缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            size: 该值占用的字节数 用于 maxbytes 限制
+            ttl: 过期时间 为None时使用默认ttl
+        """
+        if ttl is None:
+            ttl = self.ttl
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        expire_at = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expire_at, size)
+            self.nbytes += size
+            self._evict()
+
+    def delete(self, key: str) -> bool:
+        """删除缓存"""
+        with self._lock:
+            return self._pop(key)
+
+    def delete_matching(self, pattern: str) -> int:
+        """删除匹配 glob 模式的缓存 返回删除条目数
+
+        >>> local = LocalCache()
+        >>> for key in ("f:1", "f:2", "g:1"):
+        ...     local.set(key, key)
+        >>> local.delete_matching("f:*")
+        2
+        >>> len(local)
+        1
+        """
+        with self._lock:
+            keys = [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                self._pop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def _pop(self, key: str) -> bool:
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self.nbytes -= item[2]
+        return True
+
+    def _evict(self) -> None:
+        while len(self._data) > self.maxsize or (
+            self.maxbytes is not None and self.nbytes > self.maxbytes
+        ):
+            _, item = self._data.popitem(last=False)
+            self.nbytes -= item[2]
+
+
+_MISSING = object()
@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 18:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : metrics.py
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 秒
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# 字节
+SIZE_BUCKETS = tuple(64 * 4**i for i in range(12))  # 64B ~ 256MB
+# 秒
+TTL_BUCKETS = (60, 300, 900, 3600, 6 * 3600, 24 * 3600, 7 * 24 * 3600, 30 * 24 * 3600)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        """固定桶直方图 分位数按桶内线性插值估算
+
+        >>> histogram = Histogram((1, 2, 4))
+        >>> for value in (0.5, 1.5, 1.5, 3):
+        ...     histogram.observe(value)
+        >>> histogram.count, histogram.sum
+        (4, 6.5)
+        >>> histogram.percentile(0.5)
+        1.5
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> float:
+        """估算分位数 q 取值 (0, 1]"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+            max_value = self.max
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else max_value
+                upper = min(upper, max_value)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return max_value  # pragma: no cover
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        return {
+            "count": count,
+            "sum": total,
+            "avg": total / count if count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": buckets,
+        }
+
+
+class CacheMetrics:
+    def __init__(
+        self,
+        counters: Iterable[str] = (),
+        histograms: Optional[Dict[str, Sequence[float]]] = None,
+    ):
+        """线程安全的计数器与直方图
+
+        兼容原先的字典用法: metrics["hits"] 返回计数器的值,
+        metrics["avg_xxx"] 返回直方图 xxx 的平均值.
+
+        Args:
+            counters: 预先创建的计数器(导出时即使为0也会出现)
+            histograms: 直方图名称 -> 桶边界
+
+        >>> metrics = CacheMetrics(["hits"], {"hit_time": LATENCY_BUCKETS})
+        >>> metrics.incr("hits")
+        >>> metrics.observe("hit_time", 0.002)
+        >>> metrics["hits"], metrics["avg_hit_time"]
+        (1, 0.002)
+        """
+        self._counters: Dict[str, float] = {name: 0 for name in counters}
+        self._histograms: Dict[str, Histogram] = {
+            name: Histogram(buckets) for name, buckets in (histograms or {}).items()
+        }
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        histogram.observe(value)
+
+    def histogram(self, name: str) -> Histogram:
+        return self._histograms[name]
+
+    def __getitem__(self, name: str) -> float:
+        if name in self._counters:
+            return self._counters[name]
+        if name.startswith("avg_") and name[4:] in self._histograms:
+            histogram = self._histograms[name[4:]]
+            return histogram.sum / histogram.count if histogram.count else 0
+        raise KeyError(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._counters
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出为字典"""
+        return {
+            "counters": self.counters(),
+            "histograms": {
+                name: histogram.snapshot()
+                for name, histogram in list(self._histograms.items())
+            },
+        }
+
+    def to_prometheus(
+        self, prefix: str = "lk_cache", labels: Optional[Dict[str, str]] = None
+    ) -> str:
+        """导出为 Prometheus 文本格式"""
+        return render_prometheus([(self, labels or {})], prefix)
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    items = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        items.append('%s="%s"' % (key, value.replace("\n", "\\n")))
+    return "{%s}" % ",".join(items)
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def render_prometheus(
+    sources: List[Tuple[CacheMetrics, Dict[str, Any]]], prefix: str = "lk_cache"
+) -> str:
+    """将多组指标按指标名分组导出为 Prometheus 文本格式
+
+    计数器导出为 `<prefix>_<name>_total`, 直方图导出为 `<prefix>_<name>`,
+    同名指标只输出一次 TYPE.
+
+    Args:
+        sources: (指标, 标签) 列表
+        prefix: 指标名前缀
+    """
+    counters: Dict[str, List[str]] = {}
+    histograms: Dict[str, List[str]] = {}
+    for metrics, labels in sources:
+        for name, value in metrics.counters().items():
+            counters.setdefault(name, []).append(
+                "%s_%s_total%s %s" % (prefix, name, _format_labels(labels), value)
+            )
+        for name, histogram in list(metrics._histograms.items()):
+            snapshot = histogram.snapshot()
+            lines = histograms.setdefault(name, [])
+            for bound, count in snapshot["buckets"].items():
+                bucket_labels = dict(labels, le=_format_bound(bound))
+                lines.append(
+                    "%s_%s_bucket%s %s"
+                    % (prefix, name, _format_labels(bucket_labels), count)
+                )
+            lines.append(
+                "%s_%s_sum%s %s"
+                % (prefix, name, _format_labels(labels), snapshot["sum"])
+            )
+            lines.append(
+                "%s_%s_count%s %s"
+                % (prefix, name, _format_labels(labels), snapshot["count"])
+            )
+    output = []
+    for name, lines in counters.items():
+        output.append("# TYPE %s_%s_total counter" % (prefix, name))
+        output.extend(lines)
+    for name, lines in histograms.items():
+        output.append("# TYPE %s_%s histogram" % (prefix, name))
+        output.extend(lines)
+    return "\n".join(output) + "\n"
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 19:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : pool.py
+import asyncio
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import redis
+
+from lk_tool_kit.cache_utils.metrics import LATENCY_BUCKETS, CacheMetrics
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+POOL_COUNTERS = ("acquired", "waits", "wait_timeouts")
+
+
+def _safe_url(url: str) -> str:
+    """隐藏url中的密码
+
+    >>> _safe_url("redis://:secret@localhost:6379/1")
+    'redis://:***@localhost:6379/1'
+    >>> _safe_url("redis://localhost:6379/1")
+    'redis://localhost:6379/1'
+    """
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = parts.netloc.replace(":%s@" % parts.password, ":***@", 1)
+    return urlunsplit(parts._replace(netloc=netloc))
+
+
+class _PoolStatsMixin:
+    """记录连接获取次数/等待次数/等待耗时"""
+
+    def __init__(self, *args, **kwargs):
+        self.stats = CacheMetrics(
+            counters=POOL_COUNTERS, histograms={"wait_time": LATENCY_BUCKETS}
+        )
+        super().__init__(*args, **kwargs)
+
+    def _counts(self) -> Tuple[int, int]:
+        """(使用中, 空闲) 连接数"""
+        if hasattr(self, "_in_use_connections"):
+            return len(self._in_use_connections), len(self._available_connections)
+        # 同步 BlockingConnectionPool: 队列中的 None 为尚未创建的连接
+        idle = sum(1 for connection in list(self.pool.queue) if connection is not None)
+        return len(self._connections) - idle, idle
+
+    def _exhausted(self) -> bool:
+        in_use, idle = self._counts()
+        return not idle and in_use >= self.max_connections
+
+    def _before_get(self) -> Tuple[float, bool]:
+        waited = self._exhausted()
+        if waited:
+            self.stats.incr("waits")
+        return time.perf_counter(), waited
+
+    def _after_get(self, start: float, waited: bool, error: bool) -> None:
+        if waited:
+            self.stats.observe("wait_time", time.perf_counter() - start)
+        if error:
+            if waited:
+                self.stats.incr("wait_timeouts")
+        else:
+            self.stats.incr("acquired")
+
+
+class StatsConnectionPool(_PoolStatsMixin, redis.ConnectionPool):
+    def get_connection(self, *args, **kwargs):
+        start, waited = self._before_get()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except redis.ConnectionError:
+            self._after_get(start, waited, True)
+            raise
+        self._after_get(start, waited, False)
+        return connection
+
+
+class StatsBlockingConnectionPool(StatsConnectionPool, redis.BlockingConnectionPool):
+    pass
+
+
+if aioredis is not None:
+
+    class AsyncStatsConnectionPool(_PoolStatsMixin, aioredis.ConnectionPool):
+        async def get_connection(self, *args, **kwargs):
+            start, waited = self._before_get()
+            try:
+                connection = await super().get_connection(*args, **kwargs)
+            except redis.ConnectionError:
+                self._after_get(start, waited, True)
+                raise
+            self._after_get(start, waited, False)
+            return connection
+
+    class AsyncStatsBlockingConnectionPool(
+        AsyncStatsConnectionPool, aioredis.BlockingConnectionPool
+    ):
+        pass
+
+
+def pool_stats(pool: Any) -> Dict[str, Any]:
+    """连接池使用情况 in_use/idle/max_connections 以及等待次数
+
+    非 StatsConnectionPool 创建的连接池只返回连接数
+    """
+    if isinstance(pool, _PoolStatsMixin):
+        in_use, idle = pool._counts()
+        stats = dict(pool.stats.counters())
+        stats["avg_wait_time"] = pool.stats["avg_wait_time"]
+    else:
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        idle = len(getattr(pool, "_available_connections", ()))
+        stats = {}
+    stats.update(in_use=in_use, idle=idle, max_connections=pool.max_connections)
+    return stats
+
+
+class PoolRegistry:
+    def __init__(self):
+        """进程内连接池注册表 相同url与参数的缓存共用同一个连接池
+
+        redis.asyncio 的连接绑定事件循环, 异步连接池按事件循环分别共享;
+        不在事件循环中创建时返回独立的连接池.
+        """
+        self._pools: Dict[tuple, redis.ConnectionPool] = {}
+        self._async_pools: "weakref.WeakKeyDictionary[Any, Dict[tuple, Any]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _options(
+        max_connections: Optional[int] = None,
+        blocking: bool = False,
+        pool_timeout: Optional[float] = None,
+        **options,
+    ) -> Tuple[tuple, Dict[str, Any]]:
+        options = {name: value for name, value in options.items() if value is not None}
+        if max_connections is not None:
+            options["max_connections"] = max_connections
+        if blocking and pool_timeout is not None:
+            options["timeout"] = pool_timeout
+        return (blocking, tuple(sorted(options.items()))), options
+
+    def get(
+        self, url: str, blocking: bool = False, shared: bool = True, **options
+    ) -> redis.ConnectionPool:
+        """获取同步连接池
+
+        Args:
+            url: redis url
+            blocking: 使用 BlockingConnectionPool, 连接用尽时最多等待 pool_timeout 秒
+            shared: 是否与相同url及参数的缓存共用连接池
+            options: max_connections/pool_timeout/socket_connect_timeout/socket_timeout/
+                health_check_interval/socket_keepalive 等连接池参数, None 表示使用redis默认值
+        """
+        key, options = self._options(blocking=blocking, **options)
+        pool_cls = StatsBlockingConnectionPool if blocking else StatsConnectionPool
+        if not shared:
+            return pool_cls.from_url(url, **options)
+        with self._lock:
+            pool = self._pools.get((url,) + key)
+            if pool is None:
+                pool = self._pools[(url,) + key] = pool_cls.from_url(url, **options)
+            return pool
+
+    def get_async(
+        self, url: str, blocking: bool = False, shared: bool = True, **options
+    ):
+        """获取 redis.asyncio 连接池 参数同 get"""
+        if aioredis is None:  # pragma: no cover
+            raise RuntimeError("redis.asyncio is unavailable, need redis>=4.2")
+        key, options = self._options(blocking=blocking, **options)
+        pool_cls = (
+            AsyncStatsBlockingConnectionPool if blocking else AsyncStatsConnectionPool
+        )
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if not shared or loop is None:
+            return pool_cls.from_url(url, **options)
+        with self._lock:
+            pools = self._async_pools.setdefault(loop, {})
+            pool = pools.get((url,) + key)
+            if pool is None:
+                pool = pools[(url,) + key] = pool_cls.from_url(url, **options)
+            return pool
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各共享同步连接池的使用情况 以隐藏密码后的url区分"""
+        with self._lock:
+            pools = list(self._pools.items())
+        result = {}
+        for (url, blocking, options), pool in pools:
+            name = _safe_url(url)
+            if name in result:
+                name = "%s%s" % (name, dict(options, blocking=blocking))
+            result[name] = pool_stats(pool)
+        return result
+
+    def clear(self) -> None:
+        """断开并移除所有共享同步连接池"""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.disconnect()
+
+
+pool_registry = PoolRegistry()
@@ -0,0 +1,277 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/19 03:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : refresh_ahead.py
+import asyncio
+import atexit
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from lk_tool_kit.cache_utils.metrics import CacheMetrics
+
+logger = logging.getLogger(__name__)
+
+REFRESH_AHEAD_COUNTERS = (
+    "ticks",
+    "refreshed",
+    "skipped_fresh",
+    "skipped_busy",
+    "skipped_budget",
+)
+
+
+class DecayingCounter:
+    def __init__(self, half_life: float = 60.0, maxsize: int = 10000):
+        """按时间指数衰减的访问计数 用于找出近期最热的键
+
+        计数每经过 half_life 秒减半, 只在访问/查询时按时间差计算, 无需定时衰减;
+        键数量超过 maxsize 时淘汰计数最低的一半
+
+        Args:
+            half_life: 半衰期(秒)
+            maxsize: 最多跟踪的键数
+
+        >>> counter = DecayingCounter(half_life=60)
+        >>> for key in "aabac":
+        ...     counter.touch(key, key.upper(), now=0)
+        >>> [(key, payload) for key, payload, _ in counter.top(2, now=0)]
+        [('a', 'A'), ('b', 'B')]
+        >>> counter.score("a", now=60)
+        1.5
+        """
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self._items: Dict[str, List[Any]] = {}  # key -> [计数, 更新时间, payload]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _decayed(self, item: List[Any], now: float) -> float:
+        return item[0] * 0.5 ** ((now - item[1]) / self.half_life)
+
+    def touch(self, key: str, payload: Any = None, now: Optional[float] = None) -> None:
+        """计数加一 payload 为刷新时需要的数据(最近一次访问的)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                if len(self._items) >= self.maxsize:
+                    self._evict(now)
+                self._items[key] = [1.0, now, payload]
+            else:
+                item[:] = [self._decayed(item, now) + 1, now, payload]
+
+    def _evict(self, now: float) -> None:
+        ranked = sorted(
+            self._items, key=lambda key: self._decayed(self._items[key], now)
+        )
+        for key in ranked[: max(len(ranked) // 2, 1)]:
+            del self._items[key]
+
+    def score(self, key: str, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            item = self._items.get(key)
+            return self._decayed(item, now) if item is not None else 0.0
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[str, Any, float]]:
+        """计数最高的 k 个键 [(key, payload, 计数)]"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            scored = [
+                (self._decayed(item, now), key, item[2])
+                for key, item in self._items.items()
+            ]
+        return [
+            (key, payload, score)
+            for score, key, payload in heapq.nlargest(k, scored, key=lambda x: x[0])
+        ]
+
+
+class RefreshAheadScheduler:
+    def __init__(
+        self,
+        top_k: int = 100,
+        interval: float = 1.0,
+        ahead_ratio: float = 0.2,
+        half_life: float = 60.0,
+        max_concurrency: int = 4,
+        cpu_budget: float = 0.25,
+        maxsize: int = 10000,
+    ):
+        """热点缓存键的提前刷新调度器
+
+        cached(refresh_ahead=True) 的函数每次调用时记录缓存键的访问次数(按时间衰减)与调用参数.
+        后台线程每 interval 秒取最热的 top_k 个键, 通过一个pipeline查询PTTL,
+        剩余有效时间(不含stale_ttl)少于 ahead_ratio * timeout 或已过期时用记录的参数重新计算并覆盖写入.
+        刷新与缓存未命中的后台刷新共用计算锁, 多进程中同一时间只有一个调用方刷新同一个键.
+
+        同步函数在线程池中刷新, 协程函数通过 run_coroutine_threadsafe 在其调用时所在的事件循环中作为task刷新.
+
+        Args:
+            top_k: 每轮最多检查的热点键数
+            interval: 检查间隔(秒)
+            ahead_ratio: 提前刷新的比例 剩余有效时间少于 timeout * ahead_ratio 时刷新
+            half_life: 访问计数的半衰期(秒)
+            max_concurrency: 同时进行的刷新数
+            cpu_budget: 刷新可占用的CPU比例(单核) 同步函数按线程CPU时间, 协程函数按耗时计算,
+                超出后本轮剩余的刷新被跳过
+            maxsize: 最多跟踪的键数
+        """
+        self.top_k = top_k
+        self.interval = interval
+        self.ahead_ratio = ahead_ratio
+        self.max_concurrency = max_concurrency
+        self.cpu_budget = cpu_budget
+        self.counter = DecayingCounter(half_life, maxsize)
+        self.metrics = CacheMetrics(counters=REFRESH_AHEAD_COUNTERS)
+        self.redis_cache = None
+        self._spent = 0.0
+        self._in_flight = 0
+        self._guard = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def attach(self, redis_cache: Any) -> None:
+        """绑定 RedisCache 通过其 pttl_many 查询剩余过期时间"""
+        self.redis_cache = redis_cache
+
+    def touch(
+        self,
+        decorator: Any,
+        key: str,
+        args: tuple,
+        kwargs: dict,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        """记录一次访问 首次调用时启动后台线程"""
+        if self._closed.is_set():
+            return
+        self.counter.touch(key, (decorator, args, kwargs, loop))
+        if self._thread is None:
+            with self._guard:
+                if self._thread is None:
+                    atexit.register(self.close, 1)
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("refresh ahead failed")
+
+    def _is_due(self, decorator: Any, pttl: int) -> bool:
+        if pttl == -2:  # 已过期或被删除
+            return True
+        if pttl < 0 or not decorator.timeout:
+            return False
+        remaining = pttl / 1000 - (decorator.stale_ttl or 0)
+        return remaining <= decorator.timeout * self.ahead_ratio
+
+    def run_once(self) -> int:
+        """检查一轮热点键 返回本轮发起的刷新数"""
+        self.metrics.incr("ticks")
+        budget = self.cpu_budget * self.interval
+        with self._guard:
+            self._spent = max(self._spent - budget, 0.0)
+        candidates = self.counter.top(self.top_k)
+        if not candidates or self.redis_cache is None:
+            return 0
+        pttls = self.redis_cache.pttl_many([key for key, _, _ in candidates])
+        started = 0
+        for (key, (decorator, args, kwargs, loop), _), pttl in zip(candidates, pttls):
+            if decorator.make_key(*args, **kwargs) != key:  # 版本号已变化
+                self.counter.discard(key)
+                continue
+            if not self._is_due(decorator, pttl):
+                self.metrics.incr("skipped_fresh")
+                continue
+            with self._guard:
+                if self._spent >= budget:
+                    self.metrics.incr("skipped_budget")
+                    continue
+                if self._in_flight >= self.max_concurrency:
+                    self.metrics.incr("skipped_busy")
+                    continue
+                if not decorator._start_refresh(key):
+                    self.metrics.incr("skipped_busy")
+                    continue
+                self._in_flight += 1
+            if self._submit(decorator, key, args, kwargs, loop):
+                started += 1
+        return started
+
+    def _submit(
+        self,
+        decorator: Any,
+        key: str,
+        args: tuple,
+        kwargs: dict,
+        loop: Optional[asyncio.AbstractEventLoop],
+    ) -> bool:
+        if loop is None:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_concurrency)
+            self._executor.submit(self._refresh, decorator, key, args, kwargs)
+        elif loop.is_closed():
+            decorator._finish_refresh(key)
+            self.counter.discard(key)
+            self._done(0.0)
+            return False
+        else:
+            coro = self._arefresh(decorator, key, args, kwargs)
+            asyncio.run_coroutine_threadsafe(coro, loop)
+        self.metrics.incr("refreshed")
+        return True
+
+    def _done(self, spent: float) -> None:
+        with self._guard:
+            self._in_flight -= 1
+            self._spent += spent
+
+    def _refresh(self, decorator: Any, key: str, args: tuple, kwargs: dict) -> None:
+        """在线程池中刷新 decorator._refresh 负责计算锁, 失败计入其 refresh_errors"""
+        cpu_start = time.thread_time()
+        try:
+            decorator._refresh(key, args, kwargs)
+        finally:
+            self._done(time.thread_time() - cpu_start)
+
+    async def _arefresh(
+        self, decorator: Any, key: str, args: tuple, kwargs: dict
+    ) -> None:
+        perf_start = time.perf_counter()
+        try:
+            await decorator._refresh(key, args, kwargs)
+        finally:
+            self._done(time.perf_counter() - perf_start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(
+            self.metrics.counters(),
+            tracked=len(self.counter),
+            in_flight=self._in_flight,
+        )
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """停止后台线程 等待进行中的同步刷新完成"""
+        self._closed.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
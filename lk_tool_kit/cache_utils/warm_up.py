@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 23:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : warm_up.py
+import importlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CallArgs(NamedTuple):
+    """同时包含位置参数与关键字参数的参数集 用于批量调用与预热"""
+
+    args: tuple
+    kwargs: dict
+
+
+class WarmUpReport:
+    def __init__(self, max_errors: int = 100):
+        """缓存预热的进度与结果
+
+        Args:
+            max_errors: 最多保留的失败明细数
+
+        >>> report = WarmUpReport()
+        >>> report.total, report.skipped, report.computed = 3, 1, 1
+        >>> report.add_failure((1,), ValueError("bad"))
+        >>> report.failed, report.errors
+        (1, [('(1,)', "ValueError('bad')")])
+        """
+        self.max_errors = max_errors
+        self.total = 0
+        self.skipped = 0
+        self.computed = 0
+        self.failed = 0
+        self.errors: List[Tuple[str, str]] = []
+        self.started = time.time()
+        self.finished = None
+
+    def add_failure(self, call_args: Any, error: BaseException) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((repr(call_args), repr(error)))
+
+    def finish(self) -> "WarmUpReport":
+        self.finished = time.time()
+        return self
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """每秒处理的参数集数"""
+        elapsed = self.elapsed
+        return self.total / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(
+            total=self.total,
+            skipped=self.skipped,
+            computed=self.computed,
+            failed=self.failed,
+            elapsed=round(self.elapsed, 3),
+            throughput=round(self.throughput, 1),
+            errors=list(self.errors),
+        )
+
+    def __repr__(self) -> str:
+        return "WarmUpReport(total=%d, skipped=%d, computed=%d, failed=%d, %.1f/s)" % (
+            self.total,
+            self.skipped,
+            self.computed,
+            self.failed,
+            self.throughput,
+        )
+
+
+def log_progress(report: WarmUpReport) -> None:
+    """默认的进度回调 每批完成后输出一条日志"""
+    logger.info("cache warm up progress: %r", report)
+
+
+def load_arg_sets(path: str) -> Iterator[Any]:
+    """逐行读取参数集文件 (JSON Lines)
+
+    每行为一个JSON值: 数组为位置参数, 对象为关键字参数, 其他值为单个位置参数;
+    同时包含两者时写作 {"args": [...], "kwargs": {...}}. 空行与 # 开头的行被忽略
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            value = json.loads(line)
+            if isinstance(value, list):
+                yield tuple(value)
+            elif isinstance(value, dict) and set(value) == {"args", "kwargs"}:
+                yield CallArgs(tuple(value["args"]), value["kwargs"])
+            else:
+                yield value
+
+
+def import_object(path: str) -> Any:
+    """通过 `模块:属性` 或 `模块.属性` 导入对象
+
+    >>> import_object("lk_tool_kit.cache_utils.warm_up:CallArgs") is CallArgs
+    True
+    >>> import_object("json.dumps") is json.dumps
+    True
+    """
+    if ":" in path:
+        module_name, attr = path.split(":", 1)
+    else:
+        module_name, attr = path.rsplit(".", 1)
+    obj = importlib.import_module(module_name)
+    for name in attr.split("."):
+        obj = getattr(obj, name)
+    return obj
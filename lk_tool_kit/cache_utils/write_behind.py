@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 14:20
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : write_behind.py
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from lk_tool_kit.cache_utils.metrics import CacheMetrics
+
+logger = logging.getLogger(__name__)
+
+# (缓存键, 序列化数据, 过期时间, 标签)
+WriteItem = Tuple[str, bytes, Optional[int], Tuple[str, ...]]
+WRITER_COUNTERS = ("queued", "dropped", "failed", "written")
+
+
+def _coalesce(items: List[WriteItem]) -> List[WriteItem]:
+    """合并同一批次中的重复写入 只保留最后一次
+
+    >>> _coalesce([("a", b"1", None, ()), ("b", b"2", None, ()), ("a", b"3", None, ())])
+    [('a', b'3', None, ()), ('b', b'2', None, ())]
+    """
+    merged: Dict[str, WriteItem] = {}
+    for item in items:
+        merged[item[0]] = item
+    return list(merged.values())
+
+
+class _BaseWriter:
+    def __init__(self, maxsize: int = 10000, batch_size: int = 100):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.metrics = CacheMetrics(counters=WRITER_COUNTERS)
+
+    def _record_batch(self, batch: List[WriteItem], error: Optional[Exception]) -> None:
+        if error is None:
+            self.metrics.incr("written", len(batch))
+        else:
+            self.metrics.incr("failed", len(batch))
+            logger.error("write behind %s items failed: %r", len(batch), error)
+
+
+class WriteBehindWriter(_BaseWriter):
+    def __init__(
+        self,
+        write_fn: Callable[[List[WriteItem]], Any],
+        maxsize: int = 10000,
+        batch_size: int = 100,
+    ):
+        """后台线程批量写缓存
+
+        写入放入有界队列后立即返回, 由后台线程合并成pipeline写入redis;
+        队列已满时直接丢弃写入, 不阻塞调用方
+
+        Args:
+            write_fn: 批量写入函数, 接收 (key, value, timeout, tags) 列表
+            maxsize: 队列长度上限
+            batch_size: 单个pipeline最多包含的写入数
+        """
+        super().__init__(maxsize, batch_size)
+        self.write_fn = write_fn
+        self._queue: "queue.Queue[Optional[WriteItem]]" = queue.Queue(maxsize)
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._closed = False
+        self._stop = threading.Event()
+        self._thread.start()
+
+    def put(
+        self,
+        key: str,
+        value: bytes,
+        timeout: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
+    ) -> bool:
+        """加入写队列 队列已满或已关闭时丢弃并返回False"""
+        if self._closed:
+            self.metrics.incr("dropped")
+            return False
+        with self._pending_cond:
+            self._pending += 1
+        try:
+            self._queue.put_nowait((key, value, timeout, tags))
+        except queue.Full:
+            self._done(1)
+            self.metrics.incr("dropped")
+            return False
+        self.metrics.incr("queued")
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中的写入全部完成
+
+        Returns:
+            超时返回False
+        """
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """写完队列中的数据后停止后台线程 超时后后台线程写完当前批次即退出, 不阻塞调用方"""
+        if self._closed:
+            return True
+        self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        flushed = self.flush(timeout)
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)  # 唤醒等待中的后台线程
+        except queue.Full:
+            pass  # 队列已满时后台线程不会阻塞在get, 写完当前批次后检查 _stop 退出
+        if deadline is not None:
+            timeout = max(deadline - time.monotonic(), 0)
+        self._thread.join(timeout)
+        return flushed
+
+    def _done(self, count: int) -> None:
+        with self._pending_cond:
+            self._pending -= count
+            self._pending_cond.notify_all()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    break  # 已在关闭 _stop 已设置, 写完本批次后退出
+                batch.append(item)
+            error = None
+            try:
+                self.write_fn(_coalesce(batch))
+            except Exception as e:
+                error = e
+            self._record_batch(batch, error)
+            self._done(len(batch))
+
+
+class AsyncWriteBehindWriter(_BaseWriter):
+    def __init__(
+        self,
+        write_fn: Callable[[List[WriteItem]], Awaitable[Any]],
+        maxsize: int = 10000,
+        batch_size: int = 100,
+    ):
+        """WriteBehindWriter 的asyncio版本, 由当前事件循环中的task批量写入
+
+        Args:
+            write_fn: 批量写入协程函数, 接收 (key, value, timeout, tags) 列表
+            maxsize: 队列长度上限
+            batch_size: 单个pipeline最多包含的写入数
+        """
+        super().__init__(maxsize, batch_size)
+        self.write_fn = write_fn
+        self._queue: "asyncio.Queue[WriteItem]" = asyncio.Queue(maxsize)
+        self._task = asyncio.ensure_future(self._run())
+
+    def put(
+        self,
+        key: str,
+        value: bytes,
+        timeout: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
+    ) -> bool:
+        """加入写队列 队列已满时丢弃并返回False"""
+        if self._task.done():
+            self.metrics.incr("dropped")
+            return False
+        try:
+            self._queue.put_nowait((key, value, timeout, tags))
+        except asyncio.QueueFull:
+            self.metrics.incr("dropped")
+            return False
+        self.metrics.incr("queued")
+        return True
+
+    async def flush(self) -> None:
+        """等待队列中的写入全部完成"""
+        await self._queue.join()
+
+    async def close(self) -> None:
+        """写完队列中的数据后停止后台task"""
+        if not self._task.done():
+            await self.flush()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            error = None
+            try:
+                await self.write_fn(_coalesce(batch))
+            except Exception as e:
+                error = e
+            self._record_batch(batch, error)
+            for _ in batch:
+                self._queue.task_done()
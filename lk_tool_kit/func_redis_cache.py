@@ -7,18 +7,319 @@
 """
 copy from https://github.com/accaolei/func_cache/blob/master/func_cache/cache.py
 """
+import asyncio
+import atexit
 import hashlib
 import inspect
+import itertools
+import logging
+import math
 import pickle  # noqa: S403
+import random
+import threading
 import time
+import uuid
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from functools import wraps
-from typing import Any, Callable, List, Optional, TypeVar, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import redis
+from redis.commands.core import Script
+from redis.exceptions import NoScriptError
 
-from lk_tool_kit.mixins import Serializable
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # pragma: no cover  redis<4.2 不支持asyncio
+    aioredis = None
+
+from lk_tool_kit.cache_utils import (
+    AsyncWriteBehindWriter,
+    LocalCache,
+    WriteBehindWriter,
+    signature_key_fn,
+)
+from lk_tool_kit.cache_utils.admission import (
+    AdmissionOption,
+    AdmissionPolicy,
+    get_admission,
+)
+from lk_tool_kit.cache_utils.chunking import (
+    CHUNK_MAGIC,
+    DELETE_CHUNKED_SCRIPT,
+    MIN_CHUNK_SIZE,
+    SET_CHUNKED_SCRIPT,
+    ChunkManifest,
+    join_chunks,
+    split_chunks,
+)
+from lk_tool_kit.cache_utils.circuit_breaker import CircuitBreaker, RedisUnavailable
+from lk_tool_kit.cache_utils.invalidation import InvalidationBus, is_pattern
+from lk_tool_kit.cache_utils.metrics import (
+    LATENCY_BUCKETS,
+    SIZE_BUCKETS,
+    TTL_BUCKETS,
+    CacheMetrics,
+    render_prometheus,
+)
+from lk_tool_kit.cache_utils.pool import pool_registry, pool_stats
+from lk_tool_kit.cache_utils.refresh_ahead import RefreshAheadScheduler
+from lk_tool_kit.cache_utils.warm_up import (
+    CallArgs,
+    WarmUpReport,
+    import_object,
+    log_progress,
+)
+from lk_tool_kit.cache_utils.write_behind import WRITER_COUNTERS, WriteItem
+from lk_tool_kit.mixins import Codec, CompressionPolicy, Serializable, get_codec
+
+logger = logging.getLogger(__name__)
 
 RT = TypeVar("RT")  # return type
+# (函数返回值, 序列化数据, 过期时间戳(不含stale_ttl) None为不过期)
+CacheEntry = Tuple[Any, bytes, Optional[float]]
+CompressOption = Union[bool, str, CompressionPolicy]  # True 为zlib, 字符串为算法名称
+WriteEntry = Tuple[str, bytes, Tuple[str, ...], Optional[int]]  # (键, 数据, 标签, 过期时间)
+
+DECORATOR_COUNTERS = (
+    "hits",
+    "misses",
+    "local_hits",
+    "lock_waits",
+    "lock_timeouts",
+    "stale_hits",
+    "early_refreshes",
+    "refreshes",
+    "refresh_errors",
+    "bypasses",
+    "write_errors",
+    "coalesced",
+    "batches",
+    "admission_rejects",
+)
+# 命中/未命中的整体耗时, 以及 redis读取/反序列化/计算/序列化/redis写入 各阶段耗时
+DECORATOR_LATENCY_HISTOGRAMS = (
+    "hit_time",
+    "miss_time",
+    "local_hit_time",
+    "redis_get",
+    "deserialize",
+    "compute",
+    "serialize",
+    "redis_set",
+)
+_COMPRESSION_STATS = ("raw_bytes", "stored_bytes", "compress_time")
+INTERNAL_PREFIX = "\x00"  # 内部键(锁/标签/版本号等)前缀 函数名与缓存键不会以此开头
+GENERATION_KEY = INTERNAL_PREFIX + "gen"
+HITS_KEY = INTERNAL_PREFIX + "hits"
+CHUNK_KEY = INTERNAL_PREFIX + "chunk"
+_RECORD_HITS_BATCH = 100  # 命中的参数集攒够该数量后写入redis
+_RECORDED_HITS_MAXSIZE = 100000  # 进程内已写入的缓存键 超出后清空重新记录
+
+# 加入标签索引 索引为有序集合, 分值为成员的过期时间(毫秒, 永久成员为inf);
+# 写入时先清理已过期的成员, 索引的过期时间取成员中最长的, 存在永久成员时索引不过期
+_TAG_ADD_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local time = redis.call("time")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+redis.call("zremrangebyscore", KEYS[1], "-inf", now)
+local ttl = tonumber(ARGV[2])
+if ttl == 0 then
+    redis.call("zadd", KEYS[1], "inf", ARGV[1])
+else
+    redis.call("zadd", KEYS[1], now + ttl * 1000, ARGV[1])
+end
+local last = redis.call("zrange", KEYS[1], -1, -1, "withscores")[2]
+if last == "inf" then
+    redis.call("persist", KEYS[1])
+else
+    redis.call("pexpireat", KEYS[1], last)
+end
+"""
+
+# 标签索引存在时改名 之后写入的缓存键进入新的索引
+_TAG_DETACH_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 1 then
+    redis.call("rename", KEYS[1], KEYS[2])
+    return 1
+end
+return 0
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _script(source: str) -> Script:
+    """Lua脚本 以EVALSHA执行, 服务端没有缓存该脚本时先SCRIPT LOAD
+
+    同步客户端直接调用脚本对象; asyncio客户端通过 _aeval_script 执行,
+    Script 只在同步调用中捕获 NoScriptError; pipeline中通过 _pipeline_script 加入
+    """
+    return Script(None, source.encode())
+
+
+_TAG_ADD = _script(_TAG_ADD_SCRIPT)
+_TAG_DETACH = _script(_TAG_DETACH_SCRIPT)
+_RELEASE_LOCK = _script(_RELEASE_LOCK_SCRIPT)
+_SET_CHUNKED = _script(SET_CHUNKED_SCRIPT)
+_DELETE_CHUNKED = _script(DELETE_CHUNKED_SCRIPT)
+
+
+async def _aeval_script(
+    client: "aioredis.Redis", script: Script, keys: List[str], args: Iterable = ()
+) -> Any:
+    """asyncio客户端以EVALSHA执行脚本 服务端没有缓存该脚本(重启/切换/SCRIPT FLUSH)时加载后重试"""
+    try:
+        return await client.evalsha(script.sha, len(keys), *keys, *args)
+    except NoScriptError:
+        script.sha = await client.script_load(script.script)
+        return await client.evalsha(script.sha, len(keys), *keys, *args)
+
+
+def _pipeline_script(pipe: Any, script: Script, keys: tuple, args: tuple) -> None:
+    """在pipeline中以EVALSHA执行脚本 执行pipeline前检查并加载缺失的脚本"""
+    pipe.scripts.add(script)
+    pipe.evalsha(script.sha, len(keys), *keys, *args)
+
+
+def _batched(iterable: Iterable[RT], size: int) -> Iterator[List[RT]]:
+    """按固定大小分批"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _generation_prefix(values: List[Optional[bytes]]) -> str:
+    """
+    >>> _generation_prefix([None, b"3"])
+    'g0.3:'
+    """
+    return "g%d.%d:" % tuple(int(value or 0) for value in values)
+
+
+def _write_items(items: Iterable[tuple], timeout: Optional[int]) -> List[WriteItem]:
+    """(key, value[, tags[, timeout]]) -> (key, value, timeout, tags)
+
+    条目自带过期时间时优先于 timeout
+
+    >>> _write_items([("a", b"1"), ("b", b"2", ["t"], 30)], 60)
+    [('a', b'1', 60, ()), ('b', b'2', 30, ('t',))]
+    """
+    return [
+        (
+            item[0],
+            item[1],
+            item[3] if len(item) > 3 else timeout,
+            tuple(item[2]) if len(item) > 2 else (),
+        )
+        for item in items
+    ]
+
+
+def _set_results(
+    results: List[Any], items: List[WriteItem], chunk_counts: List[int]
+) -> List[Any]:
+    """去掉pipeline结果中写入分块与标签索引的部分 只保留每个SET的结果
+
+    每个条目依次为 chunk_count 个分块写入, 缓存键的SET, 每个标签一条EVALSHA
+    """
+    if not any(chunk_counts) and not any(item[3] for item in items):
+        return results
+    picked, position = [], 0
+    for item, chunk_count in zip(items, chunk_counts):
+        position += chunk_count
+        picked.append(results[position])
+        position += 1 + len(item[3])
+    return picked
+
+
+def _split_failures(
+    misses: List[str],
+    computed: List[Any],
+    pending: Dict[str, List[int]],
+    errors: Dict[int, BaseException],
+) -> Tuple[List[str], List[Any]]:
+    """去掉批量计算中失败的缓存键 其异常按结果下标写入errors
+
+    Returns:
+        (计算成功的缓存键, 对应的计算结果)
+    """
+    succeeded = []
+    for key, item in zip(misses, computed):
+        if isinstance(item, BaseException):
+            errors.update(dict.fromkeys(pending[key], item))
+        else:
+            succeeded.append((key, item))
+    return [key for key, _ in succeeded], [item for _, item in succeeded]
+
+
+def _split_call_args(call_args: Any) -> Tuple[tuple, dict]:
+    """将批量调用中的单个参数集拆分为 (args, kwargs)
+
+    CallArgs 同时包含两者, tuple 视为位置参数, dict 视为关键字参数, 其他值视为单个位置参数
+
+    >>> _split_call_args(CallArgs((1,), {"b": 2}))
+    ((1,), {'b': 2})
+    >>> _split_call_args((1, 2))
+    ((1, 2), {})
+    >>> _split_call_args({"timestamp": 1})
+    ((), {'timestamp': 1})
+    >>> _split_call_args(1)
+    ((1,), {})
+    """
+    if isinstance(call_args, CallArgs):
+        return tuple(call_args.args), dict(call_args.kwargs)
+    if isinstance(call_args, tuple):
+        return call_args, {}
+    if isinstance(call_args, dict):
+        return (), call_args
+    return (call_args,), {}
+
+
+def _warm_up_compute(
+    decorator: "FunctionDecorator", args: tuple, kwargs: dict
+) -> bytes:
+    """预热时计算并序列化 进程池中decorator按模块路径重新导入"""
+    return decorator._compute(args, kwargs)[1]
+
+
+class _LeaderCancelled(Exception):
+    """合并调用中执行调用的协程被取消 通知等待方重试"""
+
+
+def _set_future(
+    future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None
+) -> None:
+    """设置批量调用中单个调用方的结果 调用方已取消时忽略"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
 
 
 def _key_fn(*args, **kwargs) -> str:
@@ -26,6 +327,9 @@ def _key_fn(*args, **kwargs) -> str:
     return hashlib.md5(pickle.dumps((args, kwargs))).hexdigest()  # noqa: S303
 
 
+legacy_key_fn = _key_fn  # 旧版缓存键(pickle+md5), 传入 cached(key_fn=...) 兼容已有缓存
+
+
 class NoneCache:
     """无返回值时返回的对象 用于区别None"""
 
@@ -38,96 +342,1310 @@ class RedisCacheValue(Serializable):
     def is_legacy_version(cls, data: bytes) -> bool:
         return False
 
+    def _codec_value(self) -> Any:
+        return self.value
+
+    @classmethod
+    def _from_codec_value(cls, value: Any) -> "RedisCacheValue":
+        return cls(value)
+
+
+class CacheLockTimeout(TimeoutError):
+    """等待其他进程计算缓存超时"""
+
 
 class FunctionDecorator:
     def __init__(
         self,
         func: Callable[..., RT],
         redis_cache: "RedisCache",
-        key_fn: Callable[..., str] = _key_fn,
+        key_fn: Optional[Callable[..., str]] = None,
         timeout: int = None,
         metrics_enabled: bool = False,
-        compress: bool = False,
+        compress: CompressOption = False,
+        local_cache: Optional[LocalCache] = None,
+        lock: bool = False,
+        lock_timeout: float = 10,
+        lock_wait: Optional[float] = None,
+        lock_poll: float = 0.05,
+        lock_fallback: str = "compute",
+        stale_ttl: Optional[float] = None,
+        early_refresh: Union[bool, float] = False,
+        write_behind: bool = False,
+        codec: Union[str, Codec] = "pickle",
+        tags: Optional[Callable[..., Iterable[str]]] = None,
+        generation: bool = False,
+        generation_interval: float = 1.0,
+        record_hits: bool = False,
+        record_hits_ttl: Optional[int] = 7 * 24 * 3600,
+        coalesce: bool = False,
+        admission: Optional[AdmissionPolicy] = None,
+        ttl_jitter: float = 0.0,
+        ttl_fn: Optional[Callable[[Any, float], Optional[float]]] = None,
+        refresh_ahead: bool = False,
     ):
+        if lock_fallback not in ("compute", "raise"):
+            raise ValueError(f"unsupported lock_fallback: {lock_fallback}")
+        if not 0 <= ttl_jitter < 1:
+            raise ValueError("ttl_jitter must be in [0, 1)")
+        if refresh_ahead and redis_cache.refresh_scheduler is None:
+            raise ValueError("refresh_ahead requires RedisCache(refresh_ahead=...)")
+        if generation and not timeout:
+            logger.warning(
+                "%s uses generation without timeout, old keys never expire",
+                func.__name__,
+            )
         self.func = func
-        self.key_fn = key_fn
+        self.key_fn = key_fn or signature_key_fn(func)
         self.timeout = timeout
         self.metrics_enabled = metrics_enabled
         self.redis_cache = redis_cache
-        self.metrics = {"hits": 0, "misses": 0, "avg_hit_time": 0, "avg_miss_time": 0}
-        self.compress = compress
+        self.metrics = CacheMetrics(
+            counters=DECORATOR_COUNTERS + _COMPRESSION_STATS,
+            histograms=dict(
+                {name: LATENCY_BUCKETS for name in DECORATOR_LATENCY_HISTOGRAMS},
+                value_size=SIZE_BUCKETS,
+                ttl=TTL_BUCKETS,
+            ),
+        )
+        self.compress = CompressionPolicy.from_value(compress)
+        self.local_cache = local_cache
+        self.lock = lock
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_timeout if lock_wait is None else lock_wait
+        self.lock_poll = lock_poll
+        self.lock_fallback = lock_fallback
+        self.stale_ttl = stale_ttl
+        self.early_refresh = float(early_refresh)
+        self.write_behind = write_behind
+        self.codec = get_codec(codec)
+        self.tags = tags
+        self.generation = generation
+        self.generation_interval = generation_interval
+        self._generation = ""
+        self._generation_at: Optional[float] = None
+        self.record_hits = record_hits
+        self.record_hits_ttl = record_hits_ttl
+        self._hit_args: Dict[str, bytes] = {}
+        self._recorded_hits = set()
+        self._hit_guard = threading.Lock()
+        self.coalesce = coalesce
+        self._inflight: Dict[str, Any] = {}  # 缓存键 -> 进行中调用的Future
+        self._inflight_guard = threading.Lock()
+        self.admission = admission
+        self.ttl_jitter = ttl_jitter
+        self.ttl_fn = ttl_fn
+        self.refresh_ahead = refresh_ahead
+        self._compute_time = 0.0
+        self._refreshing = set()
+        self._refresh_guard = threading.Lock()
         wraps(func)(self)
 
+    def __reduce__(self):
+        """按模块路径pickle 进程池预热时子进程重新导入被装饰的函数"""
+        if "<locals>" in self.__qualname__:
+            raise pickle.PicklingError(
+                "can't pickle local cached function %s" % self.__qualname__
+            )
+        return import_object, ("%s:%s" % (self.__module__, self.__qualname__),)
+
+    @property
+    def redis_timeout(self) -> Optional[float]:
+        """redis中的实际过期时间 开启stale_ttl时保留过期数据stale_ttl秒"""
+        if self.timeout and self.stale_ttl:
+            return self.timeout + self.stale_ttl
+        return self.timeout
+
+    def _ttl_for(self, value: Any, compute_time: float) -> Optional[int]:
+        """本次计算结果的过期时间(秒, 不含stale_ttl) None为不过期
+
+        ttl_fn 的结果(未提供或返回None时为timeout)按 ttl_jitter 随机缩短;
+        结果记录在序列化头部, 一级缓存与刷新判断以此为准
+        """
+        ttl = self.timeout
+        if self.ttl_fn is not None:
+            dynamic_ttl = self.ttl_fn(value, compute_time)
+            if dynamic_ttl is not None:
+                if dynamic_ttl <= 0:
+                    raise ValueError(
+                        "ttl_fn of %s returned %r, expect None or a positive number"
+                        % (self.func.__name__, dynamic_ttl)
+                    )
+                ttl = dynamic_ttl
+        if not ttl:
+            return None
+        if self.ttl_jitter:
+            ttl *= 1 - random.uniform(0, self.ttl_jitter)  # noqa: S311
+        return max(int(ttl), 1)
+
+    def _redis_ttl(self, bytes_data: bytes) -> Optional[int]:
+        """写入redis的过期时间 头部记录的过期时间加上stale_ttl"""
+        ttl = RedisCacheValue.parse_ttl(bytes_data)
+        if not ttl:
+            return None
+        if self.metrics_enabled:
+            self.metrics.observe("ttl", ttl)
+        if self.stale_ttl:
+            ttl += int(math.ceil(self.stale_ttl))
+        return ttl
+
+    def _expiry(self, bytes_data: bytes) -> Optional[float]:
+        """缓存的过期时间戳(不含stale_ttl) V3之前的头部未记录过期时间, 按timeout计算"""
+        timestamp = RedisCacheValue.parse_version(bytes_data)
+        ttl = RedisCacheValue.parse_ttl(bytes_data)
+        if ttl is None:
+            ttl = self.timeout
+        if not ttl or not timestamp:
+            return None
+        return timestamp + ttl
+
     def make_key(self, *args, **kwargs) -> str:
-        return "%s:%s" % (self.func.__name__, self.key_fn(*args, **kwargs))
+        """缓存键 `func:hash`, 开启generation时为 `func:g<缓存版本>.<函数版本>:hash`"""
+        return "%s:%s%s" % (
+            self.func.__name__,
+            self._generation_prefix(),
+            self.key_fn(*args, **kwargs),
+        )
+
+    def _generation_stale(self) -> bool:
+        return self.generation and (
+            self._generation_at is None
+            or time.time() - self._generation_at >= self.generation_interval
+        )
+
+    def _set_generation(self, generation: str) -> None:
+        self._generation = generation
+        self._generation_at = time.time()
+
+    def _generation_prefix(self) -> str:
+        """本地缓存的版本号前缀 每generation_interval秒从redis刷新一次"""
+        if self._generation_stale():
+            cache = self.redis_cache
+            self._set_generation(cache.guard(cache.get_generation, self.func.__name__))
+        return self._generation
+
+    def expire_generation(self) -> None:
+        """下次生成缓存键时重新读取版本号"""
+        self._generation_at = None
 
     def bust(self, *args, **kwargs) -> int:
         """删除对应缓存"""
         key = self.make_key(*args, **kwargs)
+        if self.local_cache is not None:
+            self.local_cache.delete(key)
         return self.redis_cache.delete(key)
 
     def bust_all(self) -> int:
-        """删除该函数所有缓存"""
+        """删除该函数所有缓存
+
+        开启generation时只递增函数版本号(O(1)), 旧缓存不再被读取并随过期时间淘汰, 返回0
+        """
         key = "%s:*" % self.func.__name__
+        if self.local_cache is not None:
+            self.local_cache.clear()
+        if self.generation:
+            self.redis_cache.bump_generation(self.func.__name__)
+            return 0
         return self.redis_cache.delete_all(key)
 
     def redis_keys(self) -> List[str]:
         key = "%s:*" % self.func.__name__
         return self.redis_cache.keys(key)
 
-    def _record_metrics(self, is_cache_hit: bool, start: float) -> None:
+    def iter_redis_keys(self) -> Iterator[str]:
+        """逐个遍历该函数的缓存键, 不在内存中构建完整列表"""
+        key = "%s:*" % self.func.__name__
+        return self.redis_cache.iter_keys(key)
+
+    @property
+    def compression_stats(self) -> Dict[str, float]:
+        """压缩前后字节数与压缩耗时 不受metrics开关影响"""
+        return {name: self.metrics[name] for name in _COMPRESSION_STATS}
+
+    def _incr_metric(self, name: str, value: int = 1) -> None:
+        if self.metrics_enabled:
+            self.metrics.incr(name, value)
+
+    def _observe(self, name: str, perf_start: float) -> None:
+        """记录某个阶段的耗时 perf_start 为 time.perf_counter()"""
+        if self.metrics_enabled:
+            self.metrics.observe(name, time.perf_counter() - perf_start)
+
+    def _record_metrics(
+        self, is_cache_hit: bool, start: float, is_local_hit: bool = False
+    ) -> None:
         if self.metrics_enabled:
             dur = time.time() - start
-            if is_cache_hit:
-                self.metrics["hits"] += 1
-                self.metrics["avg_hit_time"] += dur / self.metrics["hits"]
+            if is_local_hit:
+                counter, histogram = "local_hits", "local_hit_time"
+            elif is_cache_hit:
+                counter, histogram = "hits", "hit_time"
             else:
-                self.metrics["misses"] += 1
-                self.metrics["avg_miss_time"] += dur / self.metrics["misses"]
+                counter, histogram = "misses", "miss_time"
+            self.metrics.incr(counter)
+            self.metrics.observe(histogram, dur)
+
+    def _redis_get(self, key: str) -> Any:
+        perf_start = time.perf_counter()
+        bytes_data = self.redis_cache.guard(self.redis_cache.get, key)
+        self._observe("redis_get", perf_start)
+        return bytes_data
+
+    def _redis_get_many(self, keys: List[str]) -> List[Any]:
+        perf_start = time.perf_counter()
+        values = self.redis_cache.guard(self.redis_cache.get_many, keys)
+        self._observe("redis_get", perf_start)
+        return values
+
+    def _local_get(self, key: str, start: float) -> Any:
+        """查询进程内一级缓存"""
+        if self.local_cache is None:
+            return NoneCache
+        value = self.local_cache.get(key, NoneCache)
+        if value is not NoneCache:
+            self._record_metrics(True, start, is_local_hit=True)
+        return value
+
+    def _local_set(
+        self, key: str, value: Any, size: int, expiry: Optional[float]
+    ) -> None:
+        """写入进程内一级缓存 过期时间不超过redis中的剩余过期时间"""
+        if self.local_cache is None:
+            return
+        ttl = self.local_cache.ttl
+        fallback_ttl = self.redis_cache.local_fallback_ttl()
+        if fallback_ttl is not None:
+            ttl = fallback_ttl if ttl is None else min(ttl, fallback_ttl)
+        if expiry is not None:
+            remaining = expiry - time.time()
+            if remaining <= 0:
+                return
+            ttl = remaining if ttl is None else min(ttl, remaining)
+        self.local_cache.set(key, value, size=size, ttl=ttl)
+
+    def _observe_compute_time(self, duration: float) -> None:
+        """记录函数计算耗时(指数滑动平均) 用于提前刷新"""
+        if self._compute_time:
+            duration = 0.8 * self._compute_time + 0.2 * duration
+        self._compute_time = duration
+
+    def _needs_refresh(self, expiry: Optional[float]) -> bool:
+        """根据缓存头部的写入时间与过期时间判断是否需要后台刷新, 无需反序列化数据
+
+        - 已过期但在stale_ttl内: 返回旧值并刷新
+        - early_refresh: XFetch 算法, 计算越慢、越接近过期, 越可能提前刷新
+        """
+        if expiry is None:
+            return False
+        now = time.time()
+        if now >= expiry:
+            if self.stale_ttl:
+                self._incr_metric("stale_hits")
+                return True
+            return False
+        if self.early_refresh and self._compute_time:
+            rand = 1.0 - random.random()  # noqa: S311  (0, 1]
+            if now - self._compute_time * self.early_refresh * math.log(rand) >= expiry:
+                self._incr_metric("early_refreshes")
+                return True
+        return False
+
+    def _start_refresh(self, key: str) -> bool:
+        """标记进程内正在刷新的缓存, 已在刷新时返回False"""
+        with self._refresh_guard:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _finish_refresh(self, key: str) -> None:
+        with self._refresh_guard:
+            self._refreshing.discard(key)
+
+    def _refresh_in_background(self, key: str, args: tuple, kwargs: dict) -> None:
+        """在后台线程中刷新缓存"""
+        if self._start_refresh(key):
+            thread = threading.Thread(
+                target=self._refresh, args=(key, args, kwargs), daemon=True
+            )
+            thread.start()
+
+    def _refresh(self, key: str, args: tuple, kwargs: dict) -> None:
+        """刷新缓存 借助缓存计算锁保证多进程中只有一个调用方刷新"""
+        try:
+            token = self.redis_cache.acquire_lock(key, self.lock_timeout)
+            if token is None:
+                return
+            try:
+                value, bytes_data, expiry = self._store(key, args, kwargs)
+                self._local_set(key, value, len(bytes_data), expiry)
+                self._incr_metric("refreshes")
+            finally:
+                self.redis_cache.release_lock(key, token)
+        except Exception:
+            self._incr_metric("refresh_errors")
+            logger.exception("refresh cache %s failed", key)
+        finally:
+            self._finish_refresh(key)
+
+    def _load(self, bytes_data: bytes, expiry: Any = NoneCache) -> CacheEntry:
+        """反序列化redis中的缓存"""
+        perf_start = time.perf_counter()
+        if expiry is NoneCache:
+            expiry = self._expiry(bytes_data)
+        res: RedisCacheValue = RedisCacheValue.deserialize(
+            bytes_data, compress=self.compress
+        )
+        self._observe("deserialize", perf_start)
+        return res.value, bytes_data, expiry
+
+    def _dump(self, value: Any, ttl: Optional[int]) -> CacheEntry:
+        """序列化函数返回值 过期时间记录在头部"""
+        perf_start = time.perf_counter()
+        timestamp = time.time()
+        stats = dict.fromkeys(_COMPRESSION_STATS, 0)
+        bytes_data: bytes = RedisCacheValue.serialize(
+            timestamp,
+            RedisCacheValue(value),
+            compress=self.compress,
+            codec=self.codec,
+            stats=stats,
+            ttl=ttl,
+        )
+        self._observe("serialize", perf_start)
+        for name, stat in stats.items():
+            self.metrics.incr(name, stat)
+        if self.metrics_enabled:
+            self.metrics.observe("value_size", len(bytes_data))
+        return value, bytes_data, (timestamp + ttl if ttl else None)
+
+    def _compute(self, args: tuple, kwargs: dict) -> CacheEntry:
+        """调用函数并序列化返回值"""
+        perf_start = time.perf_counter()
+        value = self.func(*args, **kwargs)
+        compute_time = time.perf_counter() - perf_start
+        self._observe_compute_time(compute_time)
+        self._observe("compute", perf_start)
+        return self._dump(value, self._ttl_for(value, compute_time))
+
+    def _tags_for(self, args: tuple, kwargs: dict) -> Tuple[str, ...]:
+        """由调用参数得到缓存标签"""
+        if self.tags is None:
+            return ()
+        return tuple(self.tags(*args, **kwargs) or ())
+
+    def _write(
+        self, key: str, bytes_data: bytes, tags: Tuple[str, ...], ttl: Optional[int]
+    ) -> None:
+        """写入redis 开启write_behind时交给后台线程写入
+
+        redis不可用时只计入 write_errors, 已计算的结果照常返回
+        """
+        perf_start = time.perf_counter()
+        if self.write_behind:
+            self.redis_cache.enqueue_response(key, bytes_data, ttl, tags)
+        else:
+            try:
+                self.redis_cache.guard(
+                    self.redis_cache.set_response, key, bytes_data, ttl, tags
+                )
+            except RedisUnavailable as e:
+                self._write_failed(e)
+        self._observe("redis_set", perf_start)
+
+    def _write_failed(self, error: RedisUnavailable) -> None:
+        self._incr_metric("write_errors")
+        logger.debug("skip writing cache of %s: %r", self.func.__name__, error)
+
+    def _write_many(self, items: List[WriteEntry]) -> None:
+        perf_start = time.perf_counter()
+        if self.write_behind:
+            for key, bytes_data, tags, ttl in items:
+                self.redis_cache.enqueue_response(key, bytes_data, ttl, tags)
+        else:
+            try:
+                self.redis_cache.guard(self.redis_cache.set_many, items)
+            except RedisUnavailable as e:
+                self._write_failed(e)
+        self._observe("redis_set", perf_start)
+
+    def _timed_compute(self, args: tuple, kwargs: dict) -> Tuple[CacheEntry, float]:
+        """计算并序列化 同时返回耗时(秒) 用于准入判断"""
+        perf_start = time.perf_counter()
+        entry = self._compute(args, kwargs)
+        return entry, time.perf_counter() - perf_start
+
+    def _admit(self, key: str, entry: CacheEntry, compute_time: float) -> bool:
+        """准入策略是否允许写入redis 拒绝时计入 admission_rejects"""
+        if self.admission is None:
+            return True
+        if self.admission.admit(key, len(entry[1]), compute_time):
+            return True
+        self._incr_metric("admission_rejects")
+        return False
+
+    def _admitted_items(
+        self,
+        misses: List[str],
+        computed: List[Tuple[CacheEntry, float]],
+        calls: List[Tuple[tuple, dict]],
+        pending: Dict[str, List[int]],
+    ) -> List[WriteEntry]:
+        """批量调用中通过准入的写入条目"""
+        return [
+            (
+                key,
+                entry[1],
+                self._tags_for(*calls[pending[key][0]]),
+                self._redis_ttl(entry[1]),
+            )
+            for key, (entry, compute_time) in zip(misses, computed)
+            if self._admit(key, entry, compute_time)
+        ]
+
+    def _store(self, key: str, args: tuple, kwargs: dict) -> CacheEntry:
+        """计算并写入缓存"""
+        entry, compute_time = self._timed_compute(args, kwargs)
+        if self._admit(key, entry, compute_time):
+            ttl = self._redis_ttl(entry[1])
+            self._write(key, entry[1], self._tags_for(args, kwargs), ttl)
+        return entry
+
+    def _single_flight(
+        self, key: str, args: tuple, kwargs: dict
+    ) -> Tuple[CacheEntry, bool]:
+        """分布式锁保护下的缓存计算, 同一时间只有一个调用方计算
+
+        未抢到锁的调用方轮询缓存直到 lock_wait 超时,
+        期间锁被释放(持有者异常退出)则重新抢锁计算.
+
+        Returns:
+            (缓存条目, 是否为缓存命中)
+        """
+        deadline = time.time() + self.lock_wait
+        waited = False
+        while True:
+            cache = self.redis_cache
+            token = cache.guard(cache.acquire_lock, key, self.lock_timeout)
+            if token is not None:
+                try:
+                    bytes_data = self._redis_get(key)  # 双重检查
+                    if bytes_data is not NoneCache:
+                        return self._load(bytes_data), True
+                    return self._store(key, args, kwargs), False
+                finally:
+                    self._release_lock(key, token)
+            if not waited:
+                waited = True
+                self._incr_metric("lock_waits")
+            if time.time() >= deadline:
+                break
+            time.sleep(self.lock_poll)
+            bytes_data = self._redis_get(key)
+            if bytes_data is not NoneCache:
+                return self._load(bytes_data), True
+        self._incr_metric("lock_timeouts")
+        if self.lock_fallback == "raise":
+            raise CacheLockTimeout(f"wait for cache {key} timeout")
+        return self._store(key, args, kwargs), False
+
+    def _record_hit(self, key: str, args: tuple, kwargs: dict) -> None:
+        """记录命中缓存的参数集 攒够一批后写入redis, 之后可通过 warm_up 重放"""
+        if not self.record_hits or key in self._recorded_hits:
+            return
+        try:
+            data = pickle.dumps(CallArgs(args, kwargs))
+        except Exception as e:
+            logger.debug("skip recording arguments of %s: %r", key, e)
+            return
+        with self._hit_guard:
+            self._hit_args[key] = data
+            if len(self._hit_args) < _RECORD_HITS_BATCH:
+                return
+        self.flush_recorded_hits()
+
+    def flush_recorded_hits(self) -> int:
+        """将进程内记录的命中参数集写入redis
+
+        Returns:
+            写入的参数集数
+        """
+        with self._hit_guard:
+            hits, self._hit_args = self._hit_args, {}
+            if len(self._recorded_hits) + len(hits) > _RECORDED_HITS_MAXSIZE:
+                self._recorded_hits.clear()
+            self._recorded_hits.update(hits)
+        if not hits:
+            return 0
+        try:
+            self.redis_cache.record_hits(self.func.__name__, hits, self.record_hits_ttl)
+        except redis.RedisError as e:
+            logger.warning("record cache hits of %s failed: %r", self.func.__name__, e)
+            return 0
+        return len(hits)
+
+    def recorded_arg_sets(self) -> Iterator[CallArgs]:
+        """遍历 record_hits 记录的参数集 可直接传给 warm_up"""
+        self.flush_recorded_hits()
+        for data in self.redis_cache.iter_recorded_hits(self.func.__name__):
+            yield pickle.loads(data)  # noqa: S301
+
+    def _warm_up_pending(
+        self, batch: List[Any], report: WarmUpReport
+    ) -> Dict[str, Any]:
+        """生成一批参数集的缓存键并去重 返回 缓存键->参数集"""
+        pending = {}
+        for call_args in batch:
+            report.total += 1
+            try:
+                args, kwargs = _split_call_args(call_args)
+                key = self.make_key(*args, **kwargs)
+            except Exception as e:
+                report.add_failure(call_args, e)
+                continue
+            if key in pending:
+                report.skipped += 1
+            else:
+                pending[key] = call_args
+        return pending
+
+    @staticmethod
+    def _warm_up_missing(
+        pending: Dict[str, Any], exists: List[bool], report: WarmUpReport
+    ) -> Dict[str, Any]:
+        """去掉redis中已存在的缓存键"""
+        missing = {}
+        for (key, call_args), exist in zip(pending.items(), exists):
+            if exist:
+                report.skipped += 1
+            else:
+                missing[key] = call_args
+        return missing
+
+    def _warm_up_items(
+        self, missing: Dict[str, Any], results: List[Any], report: WarmUpReport
+    ) -> List[WriteEntry]:
+        """计算结果转为待写入条目 计算失败的参数集计入report"""
+        items = []
+        for (key, call_args), result in zip(missing.items(), results):
+            if isinstance(result, BaseException):
+                report.add_failure(call_args, result)
+                continue
+            report.computed += 1
+            tags = self._tags_for(*_split_call_args(call_args))
+            items.append((key, result, tags, self._redis_ttl(result)))
+        return items
+
+    def warm_up(
+        self,
+        arg_sets: Iterable[Any],
+        concurrency: int = 4,
+        executor: str = "thread",
+        batch_size: int = 100,
+        progress: Optional[Callable[[WarmUpReport], None]] = log_progress,
+    ) -> WarmUpReport:
+        """预热缓存 只计算redis中不存在的参数集
+
+        每batch_size个参数集通过一个pipeline检查是否存在, 缺失的并发计算后在一个pipeline中写入
+
+        Args:
+            arg_sets: 参数集 格式同 many, 也可以是 load_arg_sets(文件) 或 recorded_arg_sets()
+            concurrency: 同时计算的最大数量
+            executor: "thread" 线程池, "process" 进程池(被装饰的函数需可通过模块路径导入)
+            batch_size: 每批参数集数量
+            progress: 每批完成后的回调 参数为 WarmUpReport
+
+        Returns:
+            WarmUpReport 总数/跳过/计算/失败数 以及吞吐量
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"unsupported executor: {executor}")
+        pool_cls = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        report = WarmUpReport()
+        with pool_cls(concurrency) as pool:
+            for batch in _batched(arg_sets, batch_size):
+                pending = self._warm_up_pending(batch, report)
+                exists = self.redis_cache.exists_many(list(pending))
+                missing = self._warm_up_missing(pending, exists, report)
+                futures = [
+                    pool.submit(_warm_up_compute, self, *_split_call_args(call_args))
+                    for call_args in missing.values()
+                ]
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(e)
+                items = self._warm_up_items(missing, results, report)
+                self.redis_cache.set_many(items)
+                if progress is not None:
+                    progress(report)
+        return report.finish()
+
+    def _touch(self, key: str, args: tuple, kwargs: dict) -> None:
+        """开启 refresh_ahead 时记录访问 用于找出需要提前刷新的热点键"""
+        if self.refresh_ahead:
+            self.redis_cache.refresh_scheduler.touch(self, key, args, kwargs)
+
+    def _release_lock(self, key: str, token: str) -> None:
+        """释放计算锁 失败时等待锁自动过期"""
+        try:
+            self.redis_cache.guard(self.redis_cache.release_lock, key, token)
+        except RedisUnavailable as e:
+            logger.debug("release lock of %s failed: %r", key, e)
+
+    def _bypass(self, args: tuple, kwargs: dict, error: RedisUnavailable) -> RT:
+        """redis不可用时绕过缓存直接调用函数"""
+        self._incr_metric("bypasses")
+        logger.debug("bypass cache of %s: %r", self.func.__name__, error)
+        return self.func(*args, **kwargs)
+
+    def _prepare_many(
+        self, arg_sets: Iterable[Any], start: float
+    ) -> Tuple[List[Any], Dict[str, List[int]], List[Tuple[tuple, dict]]]:
+        """批量调用的准备工作: 拆分参数, 生成缓存键, 查询一级缓存
+
+        Returns:
+            (结果列表, 未命中一级缓存的 缓存键->结果下标, 参数列表)
+        """
+        calls = [_split_call_args(call_args) for call_args in arg_sets]
+        results = [NoneCache] * len(calls)
+        pending: Dict[str, List[int]] = {}
+        for index, (args, kwargs) in enumerate(calls):
+            key = self.make_key(*args, **kwargs)
+            self._touch(key, args, kwargs)
+            value = self._local_get(key, start)
+            if value is not NoneCache:
+                results[index] = value
+                self._record_hit(key, args, kwargs)
+            else:
+                pending.setdefault(key, []).append(index)
+        return results, pending, calls
+
+    def _resolve_many(
+        self,
+        results: List[Any],
+        indexes: List[int],
+        key: str,
+        entry: CacheEntry,
+        is_cache_hit: bool,
+        start: float,
+    ) -> None:
+        """将批量调用中某个缓存键的结果填回结果列表"""
+        value, bytes_data, expiry = entry
+        self._local_set(key, value, len(bytes_data), expiry)
+        for index in indexes:
+            results[index] = value
+            self._record_metrics(is_cache_hit, start)
+
+    def many(
+        self, arg_sets: Iterable[Any], max_workers: Optional[int] = None
+    ) -> List[RT]:
+        """批量调用缓存函数 redis不可用时逐个直接调用函数"""
+        arg_sets = list(arg_sets)
+        try:
+            return self._cached_many(arg_sets, max_workers)
+        except RedisUnavailable as e:
+            return [
+                self._bypass(*_split_call_args(call_args), e) for call_args in arg_sets
+            ]
+
+    def _cached_many(
+        self, arg_sets: Iterable[Any], max_workers: Optional[int] = None
+    ) -> List[RT]:
+        """批量调用缓存函数
+
+        一次MGET读取全部缓存, 仅计算未命中的参数, 并在一个pipeline中写回
+
+        Args:
+            arg_sets: 参数集列表, tuple 为位置参数, dict 为关键字参数, 其他值为单个位置参数
+            max_workers: 大于1时使用线程池并发计算未命中的参数
+
+        Returns:
+            与 arg_sets 顺序一致的结果列表
+        """
+        start = time.time()
+        results, pending, calls = self._prepare_many(arg_sets, start)
+        keys = list(pending)
+        misses = []
+        for key, bytes_data in zip(keys, self._redis_get_many(keys)):
+            if bytes_data is NoneCache:
+                misses.append(key)
+                continue
+            expiry = self._expiry(bytes_data)
+            args, kwargs = calls[pending[key][0]]
+            self._record_hit(key, args, kwargs)
+            if self._needs_refresh(expiry):
+                self._refresh_in_background(key, args, kwargs)
+            entry = self._load(bytes_data, expiry)
+            self._resolve_many(results, pending[key], key, entry, True, start)
+
+        miss_calls = [calls[pending[key][0]] for key in misses]
+        if max_workers and max_workers > 1 and len(miss_calls) > 1:
+            with ThreadPoolExecutor(max_workers) as pool:
+                computed = list(
+                    pool.map(lambda call: self._timed_compute(*call), miss_calls)
+                )
+        else:
+            computed = [self._timed_compute(*call) for call in miss_calls]
+        self._write_many(self._admitted_items(misses, computed, calls, pending))
+        for key, (entry, _) in zip(misses, computed):
+            self._resolve_many(results, pending[key], key, entry, False, start)
+        return results
 
     def __call__(self, *args, **kwargs) -> RT:
+        try:
+            return self._cached_call(args, kwargs)
+        except RedisUnavailable as e:
+            return self._bypass(args, kwargs, e)
+
+    def _fetch(self, key: str, args: tuple, kwargs: dict) -> Tuple[CacheEntry, bool]:
+        """读取redis缓存 未命中时计算并写入
+
+        Returns:
+            (缓存条目, 是否为缓存命中)
+        """
+        bytes_data = self._redis_get(key)
+        if bytes_data is not NoneCache:
+            expiry = self._expiry(bytes_data)
+            if self._needs_refresh(expiry):
+                self._refresh_in_background(key, args, kwargs)
+            return self._load(bytes_data, expiry), True
+        if self.lock:
+            return self._single_flight(key, args, kwargs)
+        return self._store(key, args, kwargs), False
+
+    def _join_inflight(self, key: str, create: Callable[[], Any]) -> Tuple[Any, bool]:
+        """取得缓存键对应的进行中调用 不存在时创建
+
+        Returns:
+            (Future, 是否由本次调用创建)
+        """
+        with self._inflight_guard:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = create()
+            return future, True
+
+    def _leave_inflight(self, key: str) -> None:
+        with self._inflight_guard:
+            self._inflight.pop(key, None)
+
+    def _coalesced_fetch(
+        self, key: str, args: tuple, kwargs: dict
+    ) -> Tuple[Optional[Tuple[CacheEntry, bool]], Any]:
+        """进程内合并相同缓存键的并发调用
+
+        第一个调用方执行 _fetch, 其余线程等待同一个Future, 得到其结果或异常
+
+        Returns:
+            (_fetch的结果, 合并到其他调用时为None; 合并得到的函数返回值)
+        """
+        future, leader = self._join_inflight(key, Future)
+        if not leader:
+            self._incr_metric("coalesced")
+            return None, future.result()[0][0]
+        try:
+            result = self._fetch(key, args, kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave_inflight(key)
+        future.set_result(result)
+        return result, None
+
+    def _cached_call(self, args: tuple, kwargs: dict) -> RT:
         start = time.time()
-        is_cache_hit = True
         key = self.make_key(*args, **kwargs)
-        res = self.redis_cache.get(key)
-        if res is NoneCache:
-            res: Any = self.func(*args, **kwargs)
-            res: RedisCacheValue = RedisCacheValue(res)
-            bytes_data: bytes = RedisCacheValue.serialize(
-                time.time(), res, compress=self.compress
-            )
-            self.redis_cache.set_response(key, bytes_data, self.timeout)
-            is_cache_hit = False
+        self._touch(key, args, kwargs)
+        local_value = self._local_get(key, start)
+        if local_value is not NoneCache:
+            self._record_hit(key, args, kwargs)
+            return local_value
+        if not self.coalesce:
+            entry, is_cache_hit = self._fetch(key, args, kwargs)
         else:
-            res: RedisCacheValue = RedisCacheValue.deserialize(
-                res, compress=self.compress
-            )
+            result, value = self._coalesced_fetch(key, args, kwargs)
+            if result is None:
+                return value
+            entry, is_cache_hit = result
 
+        value, bytes_data, expiry = entry
+        self._local_set(key, value, len(bytes_data), expiry)
         self._record_metrics(is_cache_hit, start)
-        return res.value
+        if is_cache_hit:
+            self._record_hit(key, args, kwargs)
+        return value
 
 
 class AsyncFunctionDecorator(FunctionDecorator):
-    async def __call__(self, *args, **kwargs) -> RT:
-        start = time.time()
-        is_cache_hit = True
+    def __init__(
+        self,
+        *args,
+        batch: Union[bool, float] = False,
+        batch_max_size: int = 1000,
+        batch_loader: Optional[Callable[[List[CallArgs]], Awaitable[List[Any]]]] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self._refresh_tasks = set()
+        self.batch_window: Optional[float] = None
+        if batch is True:
+            self.batch_window = 0.0
+        elif batch is not False and batch is not None:
+            self.batch_window = float(batch)
+        self.batch_max_size = batch_max_size
+        self.batch_loader = batch_loader
+        self._batch_queue: List[Tuple[Tuple[tuple, dict], asyncio.Future]] = []
+        self._batch_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_handle: Optional[asyncio.Handle] = None
+
+    async def _arefresh_generation(self) -> None:
+        """在事件循环中刷新版本号 避免 make_key 中的同步请求"""
+        if self._generation_stale():
+            cache = self.redis_cache
+            generation = await cache.aguard(cache.aget_generation, self.func.__name__)
+            self._set_generation(generation)
+
+    async def abust(self, *args, **kwargs) -> int:
+        """删除对应缓存 (asyncio)"""
+        await self._arefresh_generation()
         key = self.make_key(*args, **kwargs)
-        res = self.redis_cache.get(key)
-        if res is NoneCache:
-            res: Any = await self.func(*args, **kwargs)
-            res: RedisCacheValue = RedisCacheValue(res)
-            bytes_data: bytes = RedisCacheValue.serialize(
-                time.time(), res, compress=self.compress
+        if self.local_cache is not None:
+            self.local_cache.delete(key)
+        return await self.redis_cache.adelete(key)
+
+    async def abust_all(self) -> int:
+        """删除该函数所有缓存 (asyncio)"""
+        key = "%s:*" % self.func.__name__
+        if self.local_cache is not None:
+            self.local_cache.clear()
+        if self.generation:
+            await self.redis_cache.abump_generation(self.func.__name__)
+            return 0
+        return await self.redis_cache.adelete_all(key)
+
+    async def aredis_keys(self) -> List[str]:
+        key = "%s:*" % self.func.__name__
+        return await self.redis_cache.akeys(key)
+
+    async def _redis_get(self, key: str) -> Any:
+        perf_start = time.perf_counter()
+        bytes_data = await self.redis_cache.aguard(self.redis_cache.aget, key)
+        self._observe("redis_get", perf_start)
+        return bytes_data
+
+    async def _redis_get_many(self, keys: List[str]) -> List[Any]:
+        perf_start = time.perf_counter()
+        values = await self.redis_cache.aguard(self.redis_cache.aget_many, keys)
+        self._observe("redis_get", perf_start)
+        return values
+
+    async def _compute(self, args: tuple, kwargs: dict) -> CacheEntry:
+        """调用函数并序列化返回值"""
+        perf_start = time.perf_counter()
+        value = await self.func(*args, **kwargs)
+        compute_time = time.perf_counter() - perf_start
+        self._observe_compute_time(compute_time)
+        self._observe("compute", perf_start)
+        return self._dump(value, self._ttl_for(value, compute_time))
+
+    async def _write(
+        self, key: str, bytes_data: bytes, tags: Tuple[str, ...], ttl: Optional[int]
+    ) -> None:
+        """写入redis 开启write_behind时交给后台task写入"""
+        perf_start = time.perf_counter()
+        if self.write_behind:
+            await self.redis_cache.aenqueue_response(key, bytes_data, ttl, tags)
+        else:
+            try:
+                await self.redis_cache.aguard(
+                    self.redis_cache.aset_response, key, bytes_data, ttl, tags
+                )
+            except RedisUnavailable as e:
+                self._write_failed(e)
+        self._observe("redis_set", perf_start)
+
+    async def _write_many(self, items: List[WriteEntry]) -> None:
+        perf_start = time.perf_counter()
+        if self.write_behind:
+            for key, bytes_data, tags, ttl in items:
+                await self.redis_cache.aenqueue_response(key, bytes_data, ttl, tags)
+        else:
+            try:
+                await self.redis_cache.aguard(self.redis_cache.aset_many, items)
+            except RedisUnavailable as e:
+                self._write_failed(e)
+        self._observe("redis_set", perf_start)
+
+    async def _timed_compute(
+        self, args: tuple, kwargs: dict
+    ) -> Tuple[CacheEntry, float]:
+        perf_start = time.perf_counter()
+        entry = await self._compute(args, kwargs)
+        return entry, time.perf_counter() - perf_start
+
+    async def _store(self, key: str, args: tuple, kwargs: dict) -> CacheEntry:
+        """计算并写入缓存"""
+        entry, compute_time = await self._timed_compute(args, kwargs)
+        if self._admit(key, entry, compute_time):
+            ttl = self._redis_ttl(entry[1])
+            await self._write(key, entry[1], self._tags_for(args, kwargs), ttl)
+        return entry
+
+    def _refresh_in_background(self, key: str, args: tuple, kwargs: dict) -> None:
+        """在后台task中刷新缓存"""
+        if self._start_refresh(key):
+            task = asyncio.ensure_future(self._refresh(key, args, kwargs))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, key: str, args: tuple, kwargs: dict) -> None:
+        """FunctionDecorator._refresh 的asyncio版本"""
+        try:
+            token = await self.redis_cache.aacquire_lock(key, self.lock_timeout)
+            if token is None:
+                return
+            try:
+                value, bytes_data, expiry = await self._store(key, args, kwargs)
+                self._local_set(key, value, len(bytes_data), expiry)
+                self._incr_metric("refreshes")
+            finally:
+                await self.redis_cache.arelease_lock(key, token)
+        except Exception:
+            self._incr_metric("refresh_errors")
+            logger.exception("refresh cache %s failed", key)
+        finally:
+            self._finish_refresh(key)
+
+    async def _single_flight(
+        self, key: str, args: tuple, kwargs: dict
+    ) -> Tuple[CacheEntry, bool]:
+        """FunctionDecorator._single_flight 的asyncio版本"""
+        deadline = time.time() + self.lock_wait
+        waited = False
+        while True:
+            cache = self.redis_cache
+            token = await cache.aguard(cache.aacquire_lock, key, self.lock_timeout)
+            if token is not None:
+                try:
+                    bytes_data = await self._redis_get(key)  # 双重检查
+                    if bytes_data is not NoneCache:
+                        return self._load(bytes_data), True
+                    return await self._store(key, args, kwargs), False
+                finally:
+                    try:
+                        await cache.aguard(cache.arelease_lock, key, token)
+                    except RedisUnavailable as e:
+                        logger.debug("release lock of %s failed: %r", key, e)
+            if not waited:
+                waited = True
+                self._incr_metric("lock_waits")
+            if time.time() >= deadline:
+                break
+            await asyncio.sleep(self.lock_poll)
+            bytes_data = await self._redis_get(key)
+            if bytes_data is not NoneCache:
+                return self._load(bytes_data), True
+        self._incr_metric("lock_timeouts")
+        if self.lock_fallback == "raise":
+            raise CacheLockTimeout(f"wait for cache {key} timeout")
+        return await self._store(key, args, kwargs), False
+
+    def warm_up(
+        self,
+        arg_sets: Iterable[Any],
+        concurrency: int = 4,
+        executor: str = "asyncio",
+        batch_size: int = 100,
+        progress: Optional[Callable[[WarmUpReport], None]] = log_progress,
+    ) -> WarmUpReport:
+        """在新的事件循环中运行 awarm_up 不能在事件循环中调用"""
+        if executor != "asyncio":
+            raise ValueError(f"unsupported executor for coroutine: {executor}")
+        return asyncio.run(self.awarm_up(arg_sets, concurrency, batch_size, progress))
+
+    async def awarm_up(
+        self,
+        arg_sets: Iterable[Any],
+        concurrency: int = 4,
+        batch_size: int = 100,
+        progress: Optional[Callable[[WarmUpReport], None]] = log_progress,
+    ) -> WarmUpReport:
+        """FunctionDecorator.warm_up 的asyncio版本 最多concurrency个协程同时计算"""
+        report = WarmUpReport()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _compute(call_args: Any) -> bytes:
+            async with semaphore:
+                return (await self._compute(*_split_call_args(call_args)))[1]
+
+        for batch in _batched(arg_sets, batch_size):
+            await self._arefresh_generation()
+            pending = self._warm_up_pending(batch, report)
+            exists = await self.redis_cache.aexists_many(list(pending))
+            missing = self._warm_up_missing(pending, exists, report)
+            results = await asyncio.gather(
+                *(_compute(call_args) for call_args in missing.values()),
+                return_exceptions=True,
+            )
+            items = self._warm_up_items(missing, results, report)
+            await self.redis_cache.aset_many(items)
+            if progress is not None:
+                progress(report)
+        return report.finish()
+
+    def _touch(self, key: str, args: tuple, kwargs: dict) -> None:
+        """记录访问及所在的事件循环 提前刷新在该事件循环中执行"""
+        if self.refresh_ahead:
+            scheduler = self.redis_cache.refresh_scheduler
+            scheduler.touch(self, key, args, kwargs, asyncio.get_running_loop())
+
+    async def _bypass(self, args: tuple, kwargs: dict, error: RedisUnavailable) -> RT:
+        """redis不可用时绕过缓存直接调用函数"""
+        self._incr_metric("bypasses")
+        logger.debug("bypass cache of %s: %r", self.func.__name__, error)
+        return await self.func(*args, **kwargs)
+
+    async def many(
+        self, arg_sets: Iterable[Any], max_workers: Optional[int] = None
+    ) -> List[RT]:
+        """FunctionDecorator.many 的asyncio版本"""
+        arg_sets = list(arg_sets)
+        try:
+            return await self._cached_many(arg_sets, max_workers)
+        except RedisUnavailable as e:
+            return await asyncio.gather(
+                *(
+                    self._bypass(*_split_call_args(call_args), e)
+                    for call_args in arg_sets
+                )
+            )
+
+    async def _cached_many(
+        self,
+        arg_sets: Iterable[Any],
+        max_workers: Optional[int] = None,
+        errors: Optional[Dict[int, BaseException]] = None,
+    ) -> List[RT]:
+        """FunctionDecorator.many 的asyncio版本
+
+        Args:
+            arg_sets: 参数集列表, tuple 为位置参数, dict 为关键字参数, 其他值为单个位置参数
+            max_workers: 同时计算的最大协程数 默认不限制
+            errors: 传入时逐个计算失败的参数集不中断整个批次, 其异常按结果下标写入该字典,
+                其余参数集照常写入缓存并返回
+        """
+        start = time.time()
+        await self._arefresh_generation()
+        results, pending, calls = self._prepare_many(arg_sets, start)
+        keys = list(pending)
+        misses = []
+        for key, bytes_data in zip(keys, await self._redis_get_many(keys)):
+            if bytes_data is NoneCache:
+                misses.append(key)
+                continue
+            expiry = self._expiry(bytes_data)
+            args, kwargs = calls[pending[key][0]]
+            self._record_hit(key, args, kwargs)
+            if self._needs_refresh(expiry):
+                self._refresh_in_background(key, args, kwargs)
+            entry = self._load(bytes_data, expiry)
+            self._resolve_many(results, pending[key], key, entry, True, start)
+
+        semaphore = asyncio.Semaphore(max_workers) if max_workers else None
+
+        async def _compute(args: tuple, kwargs: dict) -> Tuple[CacheEntry, float]:
+            if semaphore is None:
+                return await self._timed_compute(args, kwargs)
+            async with semaphore:
+                return await self._timed_compute(args, kwargs)
+
+        if self.batch_loader is not None and misses:
+            computed = await self._compute_batch(
+                [calls[pending[key][0]] for key in misses]
             )
-            self.redis_cache.set_response(key, bytes_data, self.timeout)
-            is_cache_hit = False
         else:
-            res: RedisCacheValue = RedisCacheValue.deserialize(
-                res, compress=self.compress
+            computed = await asyncio.gather(
+                *(_compute(*calls[pending[key][0]]) for key in misses),
+                return_exceptions=errors is not None,
             )
+        if errors is not None:
+            misses, computed = _split_failures(misses, computed, pending, errors)
+        await self._write_many(self._admitted_items(misses, computed, calls, pending))
+        for key, (entry, _) in zip(misses, computed):
+            self._resolve_many(results, pending[key], key, entry, False, start)
+        return results
+
+    async def _compute_batch(
+        self, calls: List[Tuple[tuple, dict]]
+    ) -> List[Tuple[CacheEntry, float]]:
+        """通过 batch_loader 一次计算全部未命中的参数集并序列化 耗时按参数集平均分摊"""
+        perf_start = time.perf_counter()
+        values = list(
+            await self.batch_loader([CallArgs(args, kwargs) for args, kwargs in calls])
+        )
+        self._observe("compute", perf_start)
+        if len(values) != len(calls):
+            raise ValueError(
+                "batch_loader of %s returned %d values for %d calls"
+                % (self.func.__name__, len(values), len(calls))
+            )
+        compute_time = (time.perf_counter() - perf_start) / max(len(calls), 1)
+        return [
+            (self._dump(value, self._ttl_for(value, compute_time)), compute_time)
+            for value in values
+        ]
+
+    def _enqueue_batch(self, args: tuple, kwargs: dict) -> asyncio.Future:
+        """加入当前批次 批次在本轮事件循环结束(或 batch_window 秒)后统一读取"""
+        loop = asyncio.get_running_loop()
+        if self._batch_loop is not loop:  # 事件循环变化时丢弃旧批次
+            self._batch_loop, self._batch_queue, self._batch_handle = loop, [], None
+        future = loop.create_future()
+        self._batch_queue.append(((args, kwargs), future))
+        if len(self._batch_queue) >= self.batch_max_size:
+            self._dispatch_batch()
+        elif self._batch_handle is None:
+            if self.batch_window:
+                self._batch_handle = loop.call_later(
+                    self.batch_window, self._dispatch_batch
+                )
+            else:
+                self._batch_handle = loop.call_soon(self._dispatch_batch)
+        return future
+
+    def _dispatch_batch(self) -> None:
+        if self._batch_handle is not None:
+            self._batch_handle.cancel()
+            self._batch_handle = None
+        queue, self._batch_queue = self._batch_queue, []
+        if queue:
+            task = asyncio.ensure_future(self._run_batch(queue))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _run_batch(
+        self, queue: List[Tuple[Tuple[tuple, dict], asyncio.Future]]
+    ) -> None:
+        """一次MGET读取整个批次 并将结果分发给各调用方
+
+        单个参数集计算失败时只有对应的调用方收到异常, 其余结果照常写入缓存;
+        读写redis或 batch_loader 失败时整个批次收到同一个异常, 不逐个重新计算
+        """
+        self._incr_metric("batches")
+        errors: Dict[int, BaseException] = {}
+        try:
+            results = await self._cached_many(
+                [CallArgs(*call) for call, _ in queue], errors=errors
+            )
+        except RedisUnavailable:
+            await asyncio.gather(
+                *(self._settle(call, future) for call, future in queue)
+            )
+            return
+        except Exception as e:
+            for _, future in queue:
+                _set_future(future, error=e)
+            return
+        for index, ((_, future), result) in enumerate(zip(queue, results)):
+            _set_future(future, result, errors.get(index))
+
+    async def _settle(self, call: Tuple[tuple, dict], future: asyncio.Future) -> None:
+        try:
+            result = await self._call(*call)
+        except Exception as e:
+            _set_future(future, error=e)
+        else:
+            _set_future(future, result)
 
+    async def __call__(self, *args, **kwargs) -> RT:
+        if self.batch_window is not None:
+            return await self._enqueue_batch(args, kwargs)
+        return await self._call(args, kwargs)
+
+    async def _call(self, args: tuple, kwargs: dict) -> RT:
+        try:
+            return await self._cached_call(args, kwargs)
+        except RedisUnavailable as e:
+            return await self._bypass(args, kwargs, e)
+
+    async def _fetch(
+        self, key: str, args: tuple, kwargs: dict
+    ) -> Tuple[CacheEntry, bool]:
+        """FunctionDecorator._fetch 的asyncio版本"""
+        bytes_data = await self._redis_get(key)
+        if bytes_data is not NoneCache:
+            expiry = self._expiry(bytes_data)
+            if self._needs_refresh(expiry):
+                self._refresh_in_background(key, args, kwargs)
+            return self._load(bytes_data, expiry), True
+        if self.lock:
+            return await self._single_flight(key, args, kwargs)
+        return await self._store(key, args, kwargs), False
+
+    async def _coalesced_fetch(
+        self, key: str, args: tuple, kwargs: dict
+    ) -> Tuple[Optional[Tuple[CacheEntry, bool]], Any]:
+        """FunctionDecorator._coalesced_fetch 的asyncio版本
+
+        其余协程等待同一个 asyncio.Future; 等待方被取消时不影响正在执行的调用,
+        执行调用的协程被取消时等待方重新加入, 由其中一个接替执行
+        """
+        loop = asyncio.get_running_loop()
+        coalesced = False
+        while True:
+            future, leader = self._join_inflight(key, loop.create_future)
+            if leader:
+                break
+            if not coalesced:
+                coalesced = True
+                self._incr_metric("coalesced")
+            try:
+                return None, (await asyncio.shield(future))[0][0]
+            except _LeaderCancelled:
+                continue
+        try:
+            result = await self._fetch(key, args, kwargs)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有等待方时不记录 "exception was never retrieved"
+            raise
+        finally:
+            self._leave_inflight(key)
+        future.set_result(result)
+        return result, None
+
+    async def _cached_call(self, args: tuple, kwargs: dict) -> RT:
+        start = time.time()
+        await self._arefresh_generation()
+        key = self.make_key(*args, **kwargs)
+        self._touch(key, args, kwargs)
+        local_value = self._local_get(key, start)
+        if local_value is not NoneCache:
+            self._record_hit(key, args, kwargs)
+            return local_value
+        if not self.coalesce:
+            entry, is_cache_hit = await self._fetch(key, args, kwargs)
+        else:
+            result, value = await self._coalesced_fetch(key, args, kwargs)
+            if result is None:
+                return value
+            entry, is_cache_hit = result
+
+        value, bytes_data, expiry = entry
+        self._local_set(key, value, len(bytes_data), expiry)
         self._record_metrics(is_cache_hit, start)
-        return res.value
+        if is_cache_hit:
+            self._record_hit(key, args, kwargs)
+        return value
 
 
 class RedisCache(object):
@@ -137,7 +1655,22 @@ class RedisCache(object):
         name: str = "cache",
         default_timeout: int = None,
         debug: bool = False,
-        compress: bool = False,
+        compress: CompressOption = False,
+        async_database: "aioredis.Redis" = None,
+        scan_count: int = 1000,
+        delete_batch_size: int = 500,
+        write_behind_maxsize: int = 10000,
+        write_behind_batch_size: int = 100,
+        codec: Union[str, Codec] = "pickle",
+        invalidation: bool = False,
+        invalidation_fallback_ttl: float = 1.0,
+        invalidation_batch_interval: float = 0.01,
+        chunk_threshold: Optional[int] = None,
+        chunk_size: int = 1024 * 1024,
+        circuit_breaker: Union[bool, CircuitBreaker, None] = None,
+        call_budget: Optional[float] = None,
+        ttl_jitter: float = 0.0,
+        refresh_ahead: Union[bool, RefreshAheadScheduler, None] = None,
     ):
         """基于redis的函数缓存工具
 
@@ -146,7 +1679,34 @@ class RedisCache(object):
             name: Namespace for this cache.
             default_timeout: Default cache timeout.
             debug: Disable cache for debugging purposes. Cache will no-op.
-            compress: Compress cache values using zlib.
+            compress: Compress cache values. True 为zlib, 也可以是算法名称
+                (zlib/bz2/lzma/lz4/zstd) 或 CompressionPolicy(算法, 级别, 最小压缩字节数).
+            async_database: :py:class:`redis.asyncio.Redis` instance,
+                协程函数的缓存读写使用该连接, 为None时退化为同步调用.
+            scan_count: 遍历缓存时每次SCAN的COUNT
+            delete_batch_size: 批量删除时每条UNLINK包含的键数量
+            write_behind_maxsize: 后台写队列长度上限, 超出时丢弃写入
+            write_behind_batch_size: 后台写入时单个pipeline最多包含的写入数
+            codec: 默认编解码器 pickle/json/raw/numpy/pandas 或自定义Codec,
+                codec_id 记录在数据头部, 读取时自动选择解码器
+            invalidation: 写入/删除缓存时通过 `name:__invalidate__` 频道广播失效,
+                其他进程的后台线程收到后删除一级缓存中的对应条目
+            invalidation_fallback_ttl: 失效订阅断开时一级缓存的最长过期时间(秒)
+            invalidation_batch_interval: 合并广播失效的时间窗口(秒)
+            chunk_threshold: 超过该字节数的缓存值分块写入, 原缓存键保存分块清单,
+                各块保存在 `name:\\x00chunk:缓存键:` 下, 与清单在同一pipeline中写入且过期时间相同;
+                覆盖写入与删除(含 delete_all/invalidate_tags)时同时删除原清单的各块;
+                读取时MGET各块并校验大小与摘要, 不一致时视为未命中. 默认不分块
+            chunk_size: 每块的字节数 不小于1024
+            circuit_breaker: True 或 CircuitBreaker 实例, 缓存函数的redis调用连续失败/超时后打开熔断,
+                打开期间绕过缓存直接调用函数, recovery_timeout 后放行探测调用恢复
+            call_budget: 单次redis调用的耗时预算(秒), 超出时计为失败;
+                asyncio调用超时即取消; 同步调用在返回后才计为超时, 需要中断慢调用时
+                另外设置 from_url(socket_timeout=...), 超时的连接会被断开重建
+            ttl_jitter: 缓存函数的默认过期时间抖动比例 [0, 1), 写入时过期时间在
+                [timeout * (1 - ttl_jitter), timeout] 内随机, 避免同时写入的缓存同时过期
+            refresh_ahead: True 或 RefreshAheadScheduler 实例, 后台按访问频率找出
+                cached(refresh_ahead=True) 函数的热点键, 在过期前用记录的参数提前刷新
 
         >>> r_cache = RedisCache.from_url("redis://localhost:6379")
         >>> @r_cache.cached(timeout=3, metrics=True, compress=True)
@@ -174,12 +1734,50 @@ class RedisCache(object):
         >>> assert get_obj_str_wo_compress.bust_all() == 0 # 删除所有缓存
         """
         self.database = database
+        self.async_database = async_database
         self.name = name
         self.prefix_len = len(self.name) + 1
         self.default_timeout = default_timeout
-        self.metrics = {"hits": 0, "misses": 0, "writes": 0}
+        self.metrics = CacheMetrics(
+            counters=("hits", "misses", "writes", "chunk_errors")
+        )
         self.debug = debug
         self.compress = compress
+        self.scan_count = scan_count
+        self.delete_batch_size = delete_batch_size
+        self.write_behind_maxsize = write_behind_maxsize
+        self.write_behind_batch_size = write_behind_batch_size
+        self.codec = get_codec(codec)
+        if chunk_threshold and chunk_size < MIN_CHUNK_SIZE:
+            raise ValueError("chunk_size must be at least %d" % MIN_CHUNK_SIZE)
+        self.chunk_threshold = chunk_threshold
+        self.chunk_size = chunk_size
+        if circuit_breaker is True:
+            circuit_breaker = CircuitBreaker()
+        self.breaker: Optional[CircuitBreaker] = circuit_breaker or None
+        self.call_budget = call_budget
+        self.ttl_jitter = ttl_jitter
+        if refresh_ahead is True:
+            refresh_ahead = RefreshAheadScheduler()
+        self.refresh_scheduler: Optional[RefreshAheadScheduler] = refresh_ahead or None
+        if self.refresh_scheduler is not None:
+            self.refresh_scheduler.attach(self)
+        self._write_behind: Optional[WriteBehindWriter] = None
+        self._async_write_behind: (
+            "weakref.WeakKeyDictionary[Any, AsyncWriteBehindWriter]"
+        ) = weakref.WeakKeyDictionary()
+        self._write_behind_guard = threading.Lock()
+        self._decorators: "weakref.WeakSet[FunctionDecorator]" = weakref.WeakSet()
+        self.invalidation: Optional[InvalidationBus] = None
+        if invalidation:
+            self.invalidation = InvalidationBus(
+                database,
+                ":".join((name, "__invalidate__")),
+                on_invalidate=self._invalidate_local,
+                on_reset=self._reset_local,
+                batch_interval=invalidation_batch_interval,
+                fallback_ttl=invalidation_fallback_ttl,
+            )
 
     @classmethod
     def from_url(
@@ -188,38 +1786,372 @@ class RedisCache(object):
         name: str = "cache",
         default_timeout: int = None,
         debug: bool = False,
+        max_connections: Optional[int] = None,
+        blocking: bool = False,
+        pool_timeout: Optional[float] = None,
+        socket_connect_timeout: Optional[float] = None,
+        socket_timeout: Optional[float] = None,
+        health_check_interval: Optional[int] = None,
+        socket_keepalive: Optional[bool] = None,
+        shared_pool: bool = True,
+        **kwargs,
     ) -> "RedisCache":
         """通过redis url创建Redis Cache
 
+        相同url与连接池参数的缓存默认共用进程内同一个连接池, 见 pool_registry
+
         Args:
             url: redis url eg."redis://localhost:6379/1"
             name: Namespace for this cache.
             default_timeout: Default cache timeout.
             debug: Disable cache for debugging purposes. Cache will no-op.
+            max_connections: 连接池最大连接数
+            blocking: 连接用尽时等待而不是报错, 最多等待 pool_timeout 秒
+            pool_timeout: 阻塞连接池获取连接的超时时间
+            socket_connect_timeout: 建立连接超时时间
+            socket_timeout: 读写超时时间
+            health_check_interval: 连接空闲超过该秒数后使用前先PING
+            socket_keepalive: 开启TCP keepalive
+            shared_pool: 是否使用共享连接池
+            kwargs: 其他 RedisCache 参数
 
         Returns:
             RedisCache
         """
-        r_db = redis.from_url(url)
+        pool_options = dict(
+            max_connections=max_connections,
+            blocking=blocking,
+            pool_timeout=pool_timeout,
+            socket_connect_timeout=socket_connect_timeout,
+            socket_timeout=socket_timeout,
+            health_check_interval=health_check_interval,
+            socket_keepalive=socket_keepalive,
+            shared=shared_pool,
+        )
+        r_db = redis.Redis(connection_pool=pool_registry.get(url, **pool_options))
+        # from_url_async 同时创建 redis.asyncio 客户端
+        if kwargs.pop("_with_async", False) and "async_database" not in kwargs:
+            kwargs["async_database"] = aioredis.Redis(
+                connection_pool=pool_registry.get_async(url, **pool_options)
+            )
         func_cache = cls(
             database=r_db,
             name=name,
             default_timeout=default_timeout,
             debug=debug,
+            **kwargs,
         )
         return func_cache
 
+    @classmethod
+    def from_url_async(
+        cls,
+        url: str,
+        name: str = "cache",
+        default_timeout: int = None,
+        debug: bool = False,
+        **kwargs,
+    ) -> "RedisCache":
+        """通过redis url创建同时支持asyncio的Redis Cache
+
+        协程函数通过 redis.asyncio 读写缓存, 不阻塞事件循环;
+        同步函数仍使用同步连接, 两者共用同一命名空间与数据格式.
+        异步连接池只在同一事件循环内共享.
+
+        Args:
+            url: redis url eg."redis://localhost:6379/1"
+            name: Namespace for this cache.
+            default_timeout: Default cache timeout.
+            debug: Disable cache for debugging purposes. Cache will no-op.
+            kwargs: 连接池参数(同 from_url)与其他 RedisCache 参数
+
+        Returns:
+            RedisCache
+        """
+        if aioredis is None:  # pragma: no cover
+            raise RuntimeError("redis.asyncio is unavailable, need redis>=4.2")
+        return cls.from_url(
+            url,
+            name=name,
+            default_timeout=default_timeout,
+            debug=debug,
+            _with_async=True,
+            **kwargs,
+        )
+
+    def _record_call(self, perf_start: float) -> None:
+        slow = bool(self.call_budget) and (
+            time.perf_counter() - perf_start > self.call_budget
+        )
+        if self.breaker is not None:
+            if slow:
+                self.breaker.record_failure(slow=True)
+            else:
+                self.breaker.record_success()
+
+    def _record_unavailable(self, error: BaseException) -> RedisUnavailable:
+        if self.breaker is not None:
+            self.breaker.record_failure()
+        return RedisUnavailable(repr(error))
+
+    def _check_breaker(self) -> None:
+        if self.breaker is not None and not self.breaker.allow():
+            raise RedisUnavailable("redis circuit breaker is open")
+
+    def _release_probe(self) -> None:
+        if self.breaker is not None:
+            self.breaker.release()
+
+    def guard(self, fn: Callable[..., RT], *args, **kwargs) -> RT:
+        """经过熔断器与耗时预算调用redis
+
+        未开启熔断器与耗时预算时直接调用; 否则连接错误/超时以及熔断打开时抛出 RedisUnavailable
+        """
+        if self.breaker is None and not self.call_budget:
+            return fn(*args, **kwargs)
+        self._check_breaker()
+        perf_start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            raise self._record_unavailable(e) from e
+        except Exception:
+            # redis已响应(如 ResponseError) 按一次正常调用记录
+            self._record_call(perf_start)
+            raise
+        except BaseException:
+            self._release_probe()
+            raise
+        self._record_call(perf_start)
+        return result
+
+    async def aguard(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """guard 的asyncio版本 超出耗时预算时取消调用"""
+        if self.breaker is None and not self.call_budget:
+            return await fn(*args, **kwargs)
+        self._check_breaker()
+        perf_start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), self.call_budget)
+        except (redis.ConnectionError, redis.TimeoutError, asyncio.TimeoutError) as e:
+            raise self._record_unavailable(e) from e
+        except Exception:
+            self._record_call(perf_start)
+            raise
+        except BaseException:  # 调用方被取消
+            self._release_probe()
+            raise
+        self._record_call(perf_start)
+        return result
+
     def make_key(self, string: str) -> str:
         """生成redis key"""
         return ":".join((self.name, string))
 
+    def make_generation_key(self) -> str:
+        """版本号hash的redis key `name:\\x00gen` 字段 "*" 为整个缓存的版本号, 其他字段为函数名"""
+        return ":".join((self.name, GENERATION_KEY))
+
+    def get_generation(self, func_name: str) -> str:
+        """一次HMGET读取缓存与函数的版本号 返回缓存键前缀 `g<缓存版本>.<函数版本>:`"""
+        client = self._client_for(GENERATION_KEY)
+        values = client.hmget(self.make_generation_key(), "*", func_name)
+        return _generation_prefix(values)
+
+    async def aget_generation(self, func_name: str) -> str:
+        """get_generation 的asyncio版本"""
+        if self.async_database is None:
+            return self.get_generation(func_name)
+        client = self._aclient_for(GENERATION_KEY)
+        values = await client.hmget(self.make_generation_key(), "*", func_name)
+        return _generation_prefix(values)
+
+    def bump_generation(self, func_name: Optional[str] = None) -> int:
+        """递增版本号 使开启generation的函数(func_name为None时为全部函数)的缓存整体失效
+
+        旧缓存不会被删除, 随过期时间淘汰; 其他进程最迟在 generation_interval 秒后读到新版本号
+
+        Returns:
+            新的版本号
+        """
+        field = func_name or "*"
+        client = self._client_for(GENERATION_KEY)
+        generation = client.hincrby(self.make_generation_key(), field, 1)
+        self._after_bump_generation(func_name)
+        return generation
+
+    async def abump_generation(self, func_name: Optional[str] = None) -> int:
+        """bump_generation 的asyncio版本"""
+        if self.async_database is None:
+            return self.bump_generation(func_name)
+        client = self._aclient_for(GENERATION_KEY)
+        field = func_name or "*"
+        generation = await client.hincrby(self.make_generation_key(), field, 1)
+        self._after_bump_generation(func_name)
+        return generation
+
+    def _after_bump_generation(self, func_name: Optional[str]) -> None:
+        """本进程立即使用新版本号, 并清理各进程一级缓存中的旧版本条目"""
+        for decorator in list(self._decorators):
+            if func_name is None or decorator.func.__name__ == func_name:
+                decorator.expire_generation()
+        self._invalidate_keys(["%s:*" % func_name if func_name else "*"])
+
+    def make_tag_key(self, tag: str) -> str:
+        """标签索引(有序集合)的redis key `name:\\x00tag:标签`"""
+        return ":".join((self.name, INTERNAL_PREFIX + "tag", tag))
+
+    def make_hits_key(self, func_name: str) -> str:
+        """record_hits 记录的参数集hash `name:\\x00hits:func` 字段为缓存键"""
+        return ":".join((self.name, HITS_KEY, func_name))
+
+    def record_hits(
+        self, func_name: str, hits: Dict[str, bytes], ttl: Optional[int] = None
+    ) -> None:
+        """写入命中缓存的参数集 每次写入刷新hash的过期时间"""
+        hits_key = self.make_hits_key(func_name)
+        pipe = self._client_for(HITS_KEY + ":" + func_name).pipeline(transaction=False)
+        pipe.hset(hits_key, mapping=hits)
+        if ttl:
+            pipe.expire(hits_key, int(ttl))
+        pipe.execute()
+
+    def iter_recorded_hits(self, func_name: str) -> Iterator[bytes]:
+        """通过HSCAN遍历记录的参数集"""
+        client = self._client_for(HITS_KEY + ":" + func_name)
+        for _, data in client.hscan_iter(
+            self.make_hits_key(func_name), count=self.scan_count
+        ):
+            yield data
+
+    def exists_many(self, keys: List[str]) -> List[bool]:
+        """通过一个pipeline批量检查缓存是否存在"""
+        return self._exists_many_on(self.database, keys)
+
+    def _exists_many_on(self, client: redis.Redis, keys: List[str]) -> List[bool]:
+        if not keys:
+            return []
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(self.make_key(key))
+        return [bool(exists) for exists in pipe.execute()]
+
+    def pttl_many(self, keys: List[str]) -> List[int]:
+        """在一个pipeline中查询剩余过期时间(毫秒) -1 为不过期, -2 为不存在"""
+        return self._pttl_many_on(self.database, keys)
+
+    def _pttl_many_on(self, client: redis.Redis, keys: List[str]) -> List[int]:
+        if not keys:
+            return []
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.pttl(self.make_key(key))
+        return pipe.execute()
+
+    async def aexists_many(self, keys: List[str]) -> List[bool]:
+        """exists_many 的asyncio版本"""
+        if self.async_database is None:
+            return self.exists_many(keys)
+        return await self._aexists_many_on(self.async_database, keys)
+
+    async def _aexists_many_on(
+        self, client: "aioredis.Redis", keys: List[str]
+    ) -> List[bool]:
+        if not keys:
+            return []
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(self.make_key(key))
+        return [bool(exists) for exists in await pipe.execute()]
+
+    def make_chunk_prefix(self, string: str) -> str:
+        """分块的redis key前缀 `name:\\x00chunk:func:hash:` 之后为 `chunk_id:序号`"""
+        return ":".join((self.name, CHUNK_KEY, string, ""))
+
+    def _should_chunk(self, value: bytes) -> bool:
+        return bool(self.chunk_threshold) and len(value) > self.chunk_threshold
+
+    def _join_chunks(
+        self, key: str, manifest: ChunkManifest, chunks: List[Optional[bytes]]
+    ) -> Any:
+        value = join_chunks(manifest, chunks)
+        if value is None:
+            self.metrics.incr("chunk_errors")
+            logger.warning("chunks of cache %s are missing or corrupted", key)
+        return value
+
+    def _unchunk(self, key: str, value: Optional[bytes]) -> Any:
+        """缓存值为分块清单时读取各块 返回 ChunkedValue, 校验失败时返回None"""
+        manifest = ChunkManifest.loads(value)
+        if manifest is None:
+            return value
+        chunk_keys = manifest.keys(self.make_chunk_prefix(key))
+        return self._join_chunks(key, manifest, self._client_for(key).mget(chunk_keys))
+
+    async def _aunchunk(self, key: str, value: Optional[bytes]) -> Any:
+        """_unchunk 的asyncio版本"""
+        manifest = ChunkManifest.loads(value)
+        if manifest is None:
+            return value
+        chunk_keys = manifest.keys(self.make_chunk_prefix(key))
+        chunks = await self._aclient_for(key).mget(chunk_keys)
+        return self._join_chunks(key, manifest, chunks)
+
+    def make_lock_key(self, string: str) -> str:
+        """生成缓存计算锁的redis key `name:\\x00lock:func:hash`"""
+        return ":".join((self.name, INTERNAL_PREFIX + "lock", string))
+
     def unmake_key(self, key: str) -> str:
         """还原redis key至函数签名"""
         return key[self.prefix_len :]  # noqa: E203
 
+    def _client_for(self, key: str) -> redis.Redis:
+        """缓存键(不含命名空间前缀)所在的redis连接 分片缓存按键路由"""
+        return self.database
+
+    def _aclient_for(self, key: str) -> "aioredis.Redis":
+        """_client_for 的asyncio版本"""
+        return self.async_database
+
+    def _publish_invalidation(self, key: str) -> None:
+        if self.invalidation is not None:
+            self.invalidation.publish(key)
+
+    def _local_caches(self) -> List[LocalCache]:
+        return [
+            decorator.local_cache
+            for decorator in list(self._decorators)
+            if decorator.local_cache is not None
+        ]
+
+    def _invalidate_local(self, keys: List[str]) -> None:
+        """删除其他进程广播的失效键对应的一级缓存"""
+        for local_cache in self._local_caches():
+            for key in keys:
+                if is_pattern(key):
+                    local_cache.delete_matching(key)
+                else:
+                    local_cache.delete(key)
+
+    def _reset_local(self) -> None:
+        """失效订阅断开及(重新)建立时清空一级缓存 断线期间可能错过了失效消息"""
+        for local_cache in self._local_caches():
+            local_cache.clear()
+
+    def local_fallback_ttl(self) -> Optional[float]:
+        """失效订阅断开时一级缓存的最长过期时间 未开启广播或订阅正常时为None"""
+        if self.invalidation is None or self.invalidation.connected:
+            return None
+        return self.invalidation.fallback_ttl
+
     def delete(self, key: str) -> int:
-        """删除缓存"""
-        return self.database.delete(self.make_key(key))
+        """删除缓存 开启分块时同时删除各块"""
+        self._publish_invalidation(key)
+        client = self._client_for(key)
+        if self.chunk_threshold:
+            args = (CHUNK_MAGIC, self.make_chunk_prefix(key))
+            return _DELETE_CHUNKED([self.make_key(key)], args, client)
+        return client.delete(self.make_key(key))
 
     def delete_all(self, key: str = "*") -> int:
         """删除全部缓存
@@ -231,47 +2163,614 @@ class RedisCache(object):
             删除条目
 
         默认删除RedisCache生成的全部函数缓存
-            redis中,以RedisCache.name开头的函数 `name:*`
+            redis中,以RedisCache.name开头的函数 `name:*`, 包括锁/标签/版本号等内部键
+        通过SCAN游标遍历, 每delete_batch_size个键发送一次UNLINK, 不阻塞redis
         """
-        keys = [key.decode() for key in self.database.keys(self.make_key(key))]
-        if not keys:
-            return 0
-        return self.database.delete(*keys)
+        return self._delete_all_on(self.database, key)
+
+    def _delete_all_on(self, client: redis.Redis, key: str = "*") -> int:
+        self._publish_invalidation(key)
+        deleted = 0
+        keys = self._iter_keys_on(client, key, internal=key == "*")
+        for batch in _batched(keys, self.delete_batch_size):
+            deleted += client.unlink(*batch)
+        if self.chunk_threshold and key != "*":
+            # 各块在 `\x00chunk:` 下, 不匹配函数的模式, 按分块前缀另行删除
+            chunk_keys = self._iter_keys_on(client, "%s:%s" % (CHUNK_KEY, key))
+            for batch in _batched(chunk_keys, self.delete_batch_size):
+                client.unlink(*batch)
+        return deleted
 
     def keys(self, key: str = "*") -> List[str]:
         """获取所有缓存
 
-        默认RedisCache的所有缓存
+        默认RedisCache的所有缓存, 不含锁/标签/版本号等内部键
+        """
+        return list(self.iter_keys(key))
+
+    def iter_keys(self, key: str = "*", count: Optional[int] = None) -> Iterator[str]:
+        """通过SCAN游标逐个遍历缓存
+
+        Args:
+            key: 匹配模式 默认RedisCache的所有缓存
+            count: 每次SCAN的COUNT 默认为scan_count
         """
-        keys = [key.decode() for key in self.database.keys(self.make_key(key))]
-        return keys
+        return self._iter_keys_on(self.database, key, count)
+
+    def _is_visible(self, redis_key: str, key: str, internal: bool) -> bool:
+        """模式本身不以内部前缀开头时跳过锁/标签/版本号等内部键"""
+        return (
+            internal
+            or key.startswith(INTERNAL_PREFIX)
+            or not redis_key.startswith(INTERNAL_PREFIX, self.prefix_len)
+        )
+
+    def _iter_keys_on(
+        self,
+        client: redis.Redis,
+        key: str = "*",
+        count: Optional[int] = None,
+        internal: bool = False,
+    ) -> Iterator[str]:
+        for redis_key in client.scan_iter(
+            match=self.make_key(key), count=count or self.scan_count
+        ):
+            redis_key = redis_key.decode()
+            if self._is_visible(redis_key, key, internal):
+                yield redis_key
 
     def get(self, key: str, default: Any = NoneCache) -> Any:
-        key = self.make_key(key)
-        value = self.database.get(key)
+        value = self._client_for(key).get(self.make_key(key))
+        return self._record_get(self._unchunk(key, value), default, key)
+
+    def _record_get(
+        self, value: Optional[bytes], default: Any, key: Optional[str] = None
+    ) -> Any:
         if not value:
-            self.metrics["misses"] += 1
+            self.metrics.incr("misses")
             return default
         else:
-            self.metrics["hits"] += 1
+            self.metrics.incr("hits")
             return value
 
+    def _record_write(self, key: Optional[str] = None, count: int = 1) -> None:
+        self.metrics.incr("writes", count)
+
     def set_response(
-        self, key: str, value: bytes, timeout: Optional[int] = None
+        self,
+        key: str,
+        value: bytes,
+        timeout: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
+    ) -> bool:
+        """写入缓存 有标签或开启分块时在同一pipeline中写入标签索引与各块
+
+        开启分块时不超过阈值的值同样经由 _pipeline_set 写入, 覆盖时删除旧清单指向的各块
+        """
+        client = self._client_for(key)
+        self._record_write(key)
+        self._publish_invalidation(key)
+        if tags or self.chunk_threshold:
+            pipe = client.pipeline(transaction=False)
+            chunk_count = self._pipeline_set(pipe, key, value, timeout, tags)
+            return pipe.execute()[chunk_count]
+        key = self.make_key(key)
+        if timeout:
+            return client.setex(key, int(timeout), value)
+        else:
+            return client.set(key, value)
+
+    def acquire_lock(self, key: str, timeout: float) -> Optional[str]:
+        """获取缓存计算锁 (SET NX PX)
+
+        Args:
+            key: 缓存键
+            timeout: 锁过期时间(秒) 防止持有者异常退出后死锁
+
+        Returns:
+            锁令牌 用于安全释放; 未获取到锁时返回None
+        """
+        token = uuid.uuid4().hex
+        lock_key = self.make_lock_key(key)
+        client = self._client_for(key)
+        if client.set(lock_key, token, nx=True, px=int(timeout * 1000)):
+            return token
+        return None
+
+    def release_lock(self, key: str, token: str) -> bool:
+        """释放缓存计算锁 仅当令牌一致时删除, 避免误删他人的锁"""
+        lock_key = self.make_lock_key(key)
+        client = self._client_for(key)
+        return bool(_RELEASE_LOCK([lock_key], [token], client))
+
+    def get_many(self, keys: List[str], default: Any = NoneCache) -> List[Any]:
+        """通过一次MGET批量获取缓存 未命中的位置为default"""
+        if not keys:
+            return []
+        values = self.database.mget([self.make_key(key) for key in keys])
+        values = [self._unchunk(k, v) for k, v in zip(keys, values)]
+        return [self._record_get(v, default, k) for k, v in zip(keys, values)]
+
+    def set_many(
+        self, items: Iterable[tuple], timeout: Optional[int] = None
+    ) -> List[bool]:
+        """在一个pipeline中批量写入缓存
+
+        Args:
+            items: (缓存键, 序列化数据[, 标签[, 过期时间]]) 列表 条目的过期时间优先于timeout
+            timeout: 过期时间
+        """
+        return self._write_batch(_write_items(items, timeout))
+
+    def _write_batch(self, items: List[WriteItem]) -> List[bool]:
+        """在一个pipeline中写入 (key, value, timeout) 列表"""
+        return self._write_batch_on(self.database, items)
+
+    def _write_batch_on(
+        self, client: redis.Redis, items: List[WriteItem]
+    ) -> List[bool]:
+        if not items:
+            return []
+        pipe = client.pipeline(transaction=False)
+        chunk_counts = []
+        for key, value, timeout, tags in items:
+            chunk_counts.append(self._pipeline_set(pipe, key, value, timeout, tags))
+            self._record_write(key)
+            self._publish_invalidation(key)
+        return _set_results(pipe.execute(), items, chunk_counts)
+
+    def _pipeline_set(
+        self,
+        pipe: Any,
+        key: str,
+        value: bytes,
+        timeout: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
+    ) -> int:
+        """在pipeline中写入缓存/各块/标签索引
+
+        分块写入时先写各块再写清单, 读取方看到新清单时各块已存在;
+        每次写入使用新的chunk_id, 开启分块时写入清单的同时删除原清单指向的各块,
+        此时正在读取旧块的调用方校验失败, 视为未命中
+
+        Returns:
+            写入的块数 即缓存键SET之前的命令数
+        """
+        chunk_count = 0
+        if self._should_chunk(value):
+            manifest, chunks = split_chunks(value, self.chunk_size)
+            chunk_keys = manifest.keys(self.make_chunk_prefix(key))
+            for chunk_key, chunk in zip(chunk_keys, chunks):
+                if timeout:
+                    pipe.setex(chunk_key, int(timeout), chunk)
+                else:
+                    pipe.set(chunk_key, chunk)
+            value, chunk_count = manifest.dumps(), manifest.count
+        chunk_prefix = self.make_chunk_prefix(key)
+        key = self.make_key(key)
+        if self.chunk_threshold:
+            ttl = int(timeout) if timeout else 0
+            args = (CHUNK_MAGIC, chunk_prefix, value, ttl)
+            _pipeline_script(pipe, _SET_CHUNKED, (key,), args)
+        elif timeout:
+            pipe.setex(key, int(timeout), value)
+        else:
+            pipe.set(key, value)
+        for tag in tags:
+            ttl = int(math.ceil(timeout)) if timeout else 0
+            _pipeline_script(pipe, _TAG_ADD, (self.make_tag_key(tag),), (key, ttl))
+        return chunk_count
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """删除带有任一标签的全部缓存 耗时与受影响的缓存数成正比, 不遍历整个keyspace
+
+        Returns:
+            删除的缓存条目数
+        """
+        return self._invalidate_tags_on(self.database, tags)
+
+    def _invalidate_tags_on(self, client: redis.Redis, tags: Iterable[str]) -> int:
+        deleted = 0
+        for tag in tags:
+            # 先原子地改名, 之后写入的缓存键进入新的标签集合, 不会被误删索引
+            tag_key = self.make_tag_key(tag)
+            detached = "%s:%s" % (tag_key, uuid.uuid4().hex)
+            if not _TAG_DETACH([tag_key, detached], client=client):
+                continue
+            members = client.zscan_iter(detached, count=self.scan_count)
+            for batch in _batched(members, self.delete_batch_size):
+                keys = [self.unmake_key(key.decode()) for key, _ in batch]
+                deleted += self._unlink_on(client, keys)
+                self._invalidate_keys(keys)
+            client.unlink(detached)
+        return deleted
+
+    def _unlink_on(self, client: redis.Redis, keys: List[str]) -> int:
+        """批量删除缓存 开启分块时在一个pipeline中同时删除各块"""
+        if not self.chunk_threshold:
+            return client.unlink(*[self.make_key(key) for key in keys])
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            args = (CHUNK_MAGIC, self.make_chunk_prefix(key))
+            _pipeline_script(pipe, _DELETE_CHUNKED, (self.make_key(key),), args)
+        return sum(pipe.execute())
+
+    def _invalidate_keys(self, keys: List[str]) -> None:
+        """删除本进程一级缓存并广播失效"""
+        self._invalidate_local(keys)
+        for key in keys:
+            self._publish_invalidation(key)
+
+    async def aget(self, key: str, default: Any = NoneCache) -> Any:
+        """get 的asyncio版本"""
+        if self.async_database is None:
+            return self.get(key, default)
+        value = await self._aclient_for(key).get(self.make_key(key))
+        return self._record_get(await self._aunchunk(key, value), default, key)
+
+    async def aset_response(
+        self,
+        key: str,
+        value: bytes,
+        timeout: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
     ) -> bool:
+        """set_response 的asyncio版本"""
+        if self.async_database is None:
+            return self.set_response(key, value, timeout, tags)
+        client = self._aclient_for(key)
+        self._record_write(key)
+        self._publish_invalidation(key)
+        if tags or self.chunk_threshold:
+            pipe = client.pipeline(transaction=False)
+            chunk_count = self._pipeline_set(pipe, key, value, timeout, tags)
+            return (await pipe.execute())[chunk_count]
         key = self.make_key(key)
-        self.metrics["writes"] += 1
         if timeout:
-            return self.database.setex(key, int(timeout), value)
+            return await client.setex(key, int(timeout), value)
         else:
-            return self.database.set(key, value)
+            return await client.set(key, value)
+
+    async def aget_many(self, keys: List[str], default: Any = NoneCache) -> List[Any]:
+        """get_many 的asyncio版本"""
+        if self.async_database is None:
+            return self.get_many(keys, default)
+        if not keys:
+            return []
+        values = await self.async_database.mget([self.make_key(key) for key in keys])
+        values = [await self._aunchunk(k, v) for k, v in zip(keys, values)]
+        return [self._record_get(v, default, k) for k, v in zip(keys, values)]
+
+    async def aset_many(
+        self, items: Iterable[tuple], timeout: Optional[int] = None
+    ) -> List[bool]:
+        """set_many 的asyncio版本"""
+        return await self._awrite_batch(_write_items(items, timeout))
+
+    async def ainvalidate_tags(self, *tags: str) -> int:
+        """invalidate_tags 的asyncio版本"""
+        if self.async_database is None:
+            return self.invalidate_tags(*tags)
+        return await self._ainvalidate_tags_on(self.async_database, tags)
+
+    async def _ainvalidate_tags_on(
+        self, client: "aioredis.Redis", tags: Iterable[str]
+    ) -> int:
+        deleted = 0
+        for tag in tags:
+            tag_key = self.make_tag_key(tag)
+            detached = "%s:%s" % (tag_key, uuid.uuid4().hex)
+            if not await _aeval_script(client, _TAG_DETACH, [tag_key, detached]):
+                continue
+            batch = []
+            async for key, _ in client.zscan_iter(detached, count=self.scan_count):
+                batch.append(self.unmake_key(key.decode()))
+                if len(batch) >= self.delete_batch_size:
+                    deleted += await self._aunlink_on(client, batch)
+                    self._invalidate_keys(batch)
+                    batch = []
+            if batch:
+                deleted += await self._aunlink_on(client, batch)
+                self._invalidate_keys(batch)
+            await client.unlink(detached)
+        return deleted
+
+    async def _aunlink_on(self, client: "aioredis.Redis", keys: List[str]) -> int:
+        """_unlink_on 的asyncio版本"""
+        if not self.chunk_threshold:
+            return await client.unlink(*[self.make_key(key) for key in keys])
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            args = (CHUNK_MAGIC, self.make_chunk_prefix(key))
+            _pipeline_script(pipe, _DELETE_CHUNKED, (self.make_key(key),), args)
+        return sum(await pipe.execute())
+
+    async def _awrite_batch(self, items: List[WriteItem]) -> List[bool]:
+        if self.async_database is None:
+            return self._write_batch(items)
+        return await self._awrite_batch_on(self.async_database, items)
+
+    async def _awrite_batch_on(
+        self, client: "aioredis.Redis", items: List[WriteItem]
+    ) -> List[bool]:
+        if not items:
+            return []
+        pipe = client.pipeline(transaction=False)
+        chunk_counts = []
+        for key, value, timeout, tags in items:
+            chunk_counts.append(self._pipeline_set(pipe, key, value, timeout, tags))
+            self._record_write(key)
+            self._publish_invalidation(key)
+        return _set_results(await pipe.execute(), items, chunk_counts)
+
+    @property
+    def write_behind(self) -> WriteBehindWriter:
+        """后台写线程 首次使用时创建, 进程退出前写完队列"""
+        if self._write_behind is None:
+            with self._write_behind_guard:
+                if self._write_behind is None:
+                    self._write_behind = WriteBehindWriter(
+                        self._write_batch,
+                        maxsize=self.write_behind_maxsize,
+                        batch_size=self.write_behind_batch_size,
+                    )
+                    atexit.register(self._write_behind.close, 5)
+        return self._write_behind
+
+    def _async_write_behind_writer(self) -> AsyncWriteBehindWriter:
+        """当前事件循环的后台写task"""
+        loop = asyncio.get_running_loop()
+        writer = self._async_write_behind.get(loop)
+        if writer is None:
+            writer = AsyncWriteBehindWriter(
+                self._awrite_batch,
+                maxsize=self.write_behind_maxsize,
+                batch_size=self.write_behind_batch_size,
+            )
+            self._async_write_behind[loop] = writer
+        return writer
+
+    def enqueue_response(
+        self,
+        key: str,
+        value: bytes,
+        timeout: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
+    ) -> bool:
+        """将写入交给后台线程 队列已满时丢弃并返回False"""
+        return self.write_behind.put(key, value, timeout, tags)
+
+    async def aenqueue_response(
+        self,
+        key: str,
+        value: bytes,
+        timeout: Optional[int] = None,
+        tags: Tuple[str, ...] = (),
+    ) -> bool:
+        """将写入交给当前事件循环的后台task 队列已满时丢弃并返回False"""
+        if self.async_database is None:
+            return self.enqueue_response(key, value, timeout, tags)
+        return self._async_write_behind_writer().put(key, value, timeout, tags)
+
+    @property
+    def write_behind_metrics(self) -> Dict[str, int]:
+        """后台写入计数 queued/dropped/failed/written"""
+        writers = list(self._async_write_behind.values())
+        if self._write_behind is not None:
+            writers.append(self._write_behind)
+        metrics = dict.fromkeys(WRITER_COUNTERS, 0)
+        for writer in writers:
+            for name, value in writer.metrics.counters().items():
+                metrics[name] += value
+        return metrics
+
+    def _metric_sources(self) -> List[Tuple[CacheMetrics, Dict[str, str]]]:
+        sources = [(self.metrics, {"cache": self.name})]
+        for decorator in sorted(self._decorators, key=lambda d: d.func.__qualname__):
+            labels = {"cache": self.name, "func": decorator.func.__qualname__}
+            sources.append((decorator.metrics, labels))
+        writers = list(self._async_write_behind.values())
+        if self._write_behind is not None:
+            writers.append(self._write_behind)
+        for writer in writers:
+            sources.append(
+                (writer.metrics, {"cache": self.name, "writer": "write_behind"})
+            )
+        if self.invalidation is not None:
+            labels = {"cache": self.name, "component": "invalidation"}
+            sources.append((self.invalidation.metrics, labels))
+        if self.breaker is not None:
+            labels = {"cache": self.name, "component": "circuit_breaker"}
+            sources.append((self.breaker.metrics, labels))
+        if self.refresh_scheduler is not None:
+            labels = {"cache": self.name, "component": "refresh_ahead"}
+            sources.append((self.refresh_scheduler.metrics, labels))
+        return sources
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """同步/异步连接池的 in_use/idle/waits 等使用情况"""
+        stats = {"sync": pool_stats(self.database.connection_pool)}
+        if self.async_database is not None:
+            stats["async"] = pool_stats(self.async_database.connection_pool)
+        return stats
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """导出本缓存及其装饰的所有函数的计数器与直方图(p50/p95/p99)"""
+        return {
+            "cache": self.metrics.snapshot(),
+            "pool": self.pool_stats(),
+            "functions": {
+                decorator.func.__qualname__: decorator.metrics.snapshot()
+                for decorator in list(self._decorators)
+            },
+            "write_behind": self.write_behind_metrics,
+            "circuit_breaker": self.breaker.snapshot() if self.breaker else None,
+            "refresh_ahead": (
+                self.refresh_scheduler.snapshot() if self.refresh_scheduler else None
+            ),
+        }
+
+    def to_prometheus(self, prefix: str = "lk_cache") -> str:
+        """导出为 Prometheus 文本格式 以 cache/func 标签区分"""
+        return render_prometheus(self._metric_sources(), prefix)
+
+    def _flush_recorded_hits(self) -> None:
+        for decorator in list(self._decorators):
+            decorator.flush_recorded_hits()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待后台线程写完队列 并写入记录的命中参数集"""
+        self._flush_recorded_hits()
+        if self._write_behind is None:
+            return True
+        return self._write_behind.flush(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """写完队列并停止后台线程"""
+        self._flush_recorded_hits()
+        if self.refresh_scheduler is not None:
+            self.refresh_scheduler.close(timeout)
+        if self.invalidation is not None:
+            self.invalidation.close(timeout)
+        if self._write_behind is None:
+            return True
+        return self._write_behind.close(timeout)
+
+    async def aflush(self) -> None:
+        """等待当前事件循环的后台task写完队列"""
+        writer = self._async_write_behind.get(asyncio.get_event_loop())
+        if writer is not None:
+            await writer.flush()
+        self.flush()
+
+    async def aclose(self) -> None:
+        """写完队列并停止当前事件循环的后台task"""
+        writer = self._async_write_behind.pop(asyncio.get_event_loop(), None)
+        if writer is not None:
+            await writer.close()
+
+    async def aacquire_lock(self, key: str, timeout: float) -> Optional[str]:
+        """acquire_lock 的asyncio版本"""
+        if self.async_database is None:
+            return self.acquire_lock(key, timeout)
+        token = uuid.uuid4().hex
+        lock_key = self.make_lock_key(key)
+        if await self._aclient_for(key).set(
+            lock_key, token, nx=True, px=int(timeout * 1000)
+        ):
+            return token
+        return None
+
+    async def arelease_lock(self, key: str, token: str) -> bool:
+        """release_lock 的asyncio版本"""
+        if self.async_database is None:
+            return self.release_lock(key, token)
+        lock_key = self.make_lock_key(key)
+        client = self._aclient_for(key)
+        return bool(await _aeval_script(client, _RELEASE_LOCK, [lock_key], [token]))
+
+    async def adelete(self, key: str) -> int:
+        """delete 的asyncio版本"""
+        if self.async_database is None:
+            return self.delete(key)
+        self._publish_invalidation(key)
+        client = self._aclient_for(key)
+        if self.chunk_threshold:
+            args = (CHUNK_MAGIC, self.make_chunk_prefix(key))
+            return await _aeval_script(
+                client, _DELETE_CHUNKED, [self.make_key(key)], args
+            )
+        return await client.delete(self.make_key(key))
+
+    async def akeys(self, key: str = "*") -> List[str]:
+        """keys 的asyncio版本"""
+        return [redis_key async for redis_key in self.aiter_keys(key)]
+
+    async def aiter_keys(
+        self, key: str = "*", count: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """iter_keys 的asyncio版本"""
+        if self.async_database is None:
+            for redis_key in self.iter_keys(key, count):
+                yield redis_key
+            return
+        async for redis_key in self._aiter_keys_on(self.async_database, key, count):
+            yield redis_key
+
+    async def _aiter_keys_on(
+        self,
+        client: "aioredis.Redis",
+        key: str = "*",
+        count: Optional[int] = None,
+        internal: bool = False,
+    ) -> AsyncIterator[str]:
+        async for redis_key in client.scan_iter(
+            match=self.make_key(key), count=count or self.scan_count
+        ):
+            redis_key = redis_key.decode()
+            if self._is_visible(redis_key, key, internal):
+                yield redis_key
+
+    async def adelete_all(self, key: str = "*") -> int:
+        """delete_all 的asyncio版本"""
+        if self.async_database is None:
+            return self.delete_all(key)
+        return await self._adelete_all_on(self.async_database, key)
+
+    async def _adelete_all_on(self, client: "aioredis.Redis", key: str = "*") -> int:
+        self._publish_invalidation(key)
+        deleted = 0
+        keys = []
+        async for redis_key in self._aiter_keys_on(client, key, internal=key == "*"):
+            keys.append(redis_key)
+            if len(keys) >= self.delete_batch_size:
+                deleted += await client.unlink(*keys)
+                keys = []
+        if keys:
+            deleted += await client.unlink(*keys)
+        if self.chunk_threshold and key != "*":
+            keys = []
+            chunk_pattern = "%s:%s" % (CHUNK_KEY, key)
+            async for redis_key in self._aiter_keys_on(client, chunk_pattern):
+                keys.append(redis_key)
+                if len(keys) >= self.delete_batch_size:
+                    await client.unlink(*keys)
+                    keys = []
+            if keys:
+                await client.unlink(*keys)
+        return deleted
 
     def cached(
         self,
-        key_fn: Callable[..., str] = _key_fn,
+        key_fn: Optional[Callable[..., str]] = None,
         timeout: int = None,
         metrics: bool = False,
-        compress: bool = None,
+        compress: Optional[CompressOption] = None,
+        local_maxsize: Optional[int] = None,
+        local_maxbytes: Optional[int] = None,
+        local_ttl: Optional[float] = None,
+        lock: bool = False,
+        lock_timeout: float = 10,
+        lock_wait: Optional[float] = None,
+        lock_poll: float = 0.05,
+        lock_fallback: str = "compute",
+        stale_ttl: Optional[float] = None,
+        early_refresh: Union[bool, float] = False,
+        write_behind: bool = False,
+        codec: Union[str, Codec, None] = None,
+        tags: Optional[Callable[..., Iterable[str]]] = None,
+        generation: bool = False,
+        generation_interval: float = 1.0,
+        record_hits: bool = False,
+        record_hits_ttl: Optional[int] = 7 * 24 * 3600,
+        coalesce: bool = False,
+        batch: Union[bool, float] = False,
+        batch_max_size: int = 1000,
+        batch_loader: Optional[Callable[[List[CallArgs]], Awaitable[List[Any]]]] = None,
+        admission: AdmissionOption = None,
+        ttl_jitter: Optional[float] = None,
+        ttl_fn: Optional[Callable[[Any, float], Optional[float]]] = None,
+        refresh_ahead: bool = False,
     ) -> Callable[
         [Callable[..., RT]],
         Union[Callable[..., RT], AsyncFunctionDecorator, FunctionDecorator],
@@ -279,29 +2778,131 @@ class RedisCache(object):
         """缓存函数
 
         Args:
-            key_fn: redis中的缓存名获取器 默认md5
+            key_fn: redis中的缓存名获取器 默认按函数签名绑定参数后取blake2b摘要,
+                f(1)/f(x=1)/f(1, y=默认值) 共用缓存; 传入legacy_key_fn兼容旧版md5缓存键
             timeout: 缓存过期时间 优先级大于RedisCache
             metrics: 是否开启计数指标
+            compress: 压缩策略 默认与RedisCache一致, 压缩前后字节数与耗时记录在
+                compression_stats 中; 使用的算法记录在数据头部, 不同策略的缓存可混合读取
+            local_maxsize: 进程内一级缓存最大条目数 默认1024
+            local_maxbytes: 进程内一级缓存最大字节数
+            local_ttl: 进程内一级缓存过期时间 不超过redis中的剩余过期时间
+            lock: 缓存未命中时使用redis锁, 同一时间只有一个调用方计算, 防止缓存击穿
+            lock_timeout: 锁过期时间(秒)
+            lock_wait: 未抢到锁时等待缓存的最长时间(秒) 默认与lock_timeout一致
+            lock_poll: 等待缓存时的轮询间隔(秒)
+            lock_fallback: 等待超时后的策略 "compute" 直接计算, "raise" 抛出CacheLockTimeout
+            stale_ttl: 缓存过期后仍可返回旧值的时间(秒), 返回旧值的同时后台刷新
+            early_refresh: XFetch 提前刷新系数(beta) True 等同于1.0, 越大越早刷新
+            write_behind: 未命中时将写入交给后台线程/task批量写入, 不等待redis写入完成
+            codec: 编解码器 默认与RedisCache一致, 返回值不被支持时退回pickle
+            tags: 由调用参数得到缓存标签的函数 eg. lambda customer_id: [f"customer:{customer_id}"],
+                写入缓存时在同一pipeline中把缓存键加入 `name:\\x00tag:<标签>` 索引,
+                索引为按过期时间排序的有序集合, 写入时清理已过期的成员,
+                之后可通过 RedisCache.invalidate_tags 删除带有该标签的全部缓存
+            generation: 缓存键中加入redis中的版本号, bust_all 与 RedisCache.bump_generation
+                只需递增版本号即可使全部缓存失效(O(1)), 旧缓存随timeout过期
+            generation_interval: 版本号在本地缓存的时间(秒), 其他进程递增版本号后最迟该时间后生效
+            record_hits: 将命中缓存的参数集记录到 `name:\\x00hits:func`, 之后可通过
+                warm_up(recorded_arg_sets()) 或命令行 warm_up --recorded 重放预热
+            record_hits_ttl: 记录的参数集的过期时间(秒) 每次写入时刷新
+            coalesce: 合并进程内相同参数的并发调用, 只有第一个调用读取redis/计算,
+                其余线程/协程等待并共享其结果或异常, 合并次数计入 metrics["coalesced"];
+                共享的返回值为同一对象, 调用方不应修改
+            batch: 仅协程函数, 合并同一轮事件循环中的调用, 通过 many 一次MGET读取并批量写回;
+                数值为收集调用的时间窗口(秒), True 为本轮事件循环, 批次数计入 metrics["batches"]
+            batch_max_size: 批次达到该数量时立即读取
+            batch_loader: 仅协程函数, 批量计算未命中参数的协程函数, 接收 CallArgs 列表,
+                返回顺序一致的结果列表; 批量调用(batch/many)时代替逐个调用函数
+            admission: 写入准入策略 AdmissionPolicy 或其列表(全部准入才写入), 按缓存键、
+                序列化后的字节数与计算耗时决定未命中的结果是否写入redis, eg.
+                [MaxSize(1 << 20), MinComputeTime(0.005), FrequencyAdmission()];
+                被拒绝的结果照常返回(仍可进入一级缓存), 次数计入 metrics["admission_rejects"],
+                warm_up 不经过准入
+            ttl_jitter: 过期时间抖动比例 [0, 1) 默认与RedisCache一致, 每次写入时在
+                [timeout * (1 - ttl_jitter), timeout] 内随机, 避免批量写入的缓存同时过期
+            ttl_fn: 动态过期时间 f(返回值, 函数计算耗时秒) -> 正数秒, 返回None时使用timeout,
+                返回0或负数时抛出ValueError; 结果同样按 ttl_jitter 抖动,
+                实际写入的过期时间分布记录在 metrics 的 ttl 直方图中
+            refresh_ahead: 由 RedisCache(refresh_ahead=...) 的调度器跟踪访问频率,
+                热点键过期前在后台用最近一次调用的参数重新计算并覆盖写入, 需要设置timeout
+
+        local_maxsize/local_maxbytes/local_ttl 任一不为None时开启进程内一级缓存,
+        命中一级缓存时跳过redis请求与反序列化, 命中次数单独计入 metrics["local_hits"]
+
+        RedisCache 开启 invalidation 时, 其他进程写入/删除缓存后会删除本进程一级缓存中的对应条目
+
+        stale_ttl/early_refresh 是否刷新仅通过缓存头部的写入时间与过期时间判断;
+        后台刷新借助缓存计算锁, 多进程中同一时间只有一个调用方刷新;
+        ttl_jitter/ttl_fn 得到的过期时间记录在缓存头部, 刷新判断与一级缓存过期均以此为准
         """
         if timeout is None:
             timeout = self.default_timeout
         if compress is None:
             compress = self.compress
+        if codec is None:
+            codec = self.codec
+        if ttl_jitter is None:
+            ttl_jitter = self.ttl_jitter
 
         def decorator(
             func: Callable[..., RT]
         ) -> Union[Callable[..., RT], AsyncFunctionDecorator, FunctionDecorator]:
+            local_cache = None
+            if any(
+                option is not None
+                for option in (local_maxsize, local_maxbytes, local_ttl)
+            ):
+                local_cache = LocalCache(
+                    maxsize=local_maxsize or 1024,
+                    maxbytes=local_maxbytes,
+                    ttl=local_ttl,
+                )
 
+            options = dict(
+                local_cache=local_cache,
+                lock=lock,
+                lock_timeout=lock_timeout,
+                lock_wait=lock_wait,
+                lock_poll=lock_poll,
+                lock_fallback=lock_fallback,
+                stale_ttl=stale_ttl,
+                early_refresh=early_refresh,
+                write_behind=write_behind,
+                codec=codec,
+                tags=tags,
+                generation=generation,
+                generation_interval=generation_interval,
+                record_hits=record_hits,
+                record_hits_ttl=record_hits_ttl,
+                coalesce=coalesce,
+                admission=get_admission(admission),
+                ttl_jitter=ttl_jitter,
+                ttl_fn=ttl_fn,
+                refresh_ahead=refresh_ahead,
+            )
             if inspect.iscoroutinefunction(func):
                 inner = AsyncFunctionDecorator(
-                    func, self, key_fn, timeout, metrics, compress
+                    func,
+                    self,
+                    key_fn,
+                    timeout,
+                    metrics,
+                    compress,
+                    batch=batch,
+                    batch_max_size=batch_max_size,
+                    batch_loader=batch_loader,
+                    **options,
                 )
-
+            elif batch or batch_loader is not None:
+                raise ValueError("batch only supports coroutine functions")
             else:
                 inner = FunctionDecorator(
-                    func, self, key_fn, timeout, metrics, compress
+                    func, self, key_fn, timeout, metrics, compress, **options
                 )
-
+            self._decorators.add(inner)
+            if local_cache is not None and self.invalidation is not None:
+                self.invalidation.start()
             return inner
 
         return decorator
@@ -0,0 +1,302 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/19 00:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : keyspace_analyzer.py
+import logging
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import redis
+
+from lk_tool_kit.cache_utils.chunking import CHUNK_MAGIC
+from lk_tool_kit.cache_utils.metrics import SIZE_BUCKETS, TTL_BUCKETS, Histogram
+from lk_tool_kit.func_redis_cache import (
+    INTERNAL_PREFIX,
+    RedisCache,
+    RedisCacheValue,
+    _batched,
+)
+from lk_tool_kit.mixins.compression import get_compressor
+from lk_tool_kit.mixins.serializable import V2_HEADER_SIZE
+from lk_tool_kit.sharded_redis_cache import ShardedRedisCache
+
+logger = logging.getLogger(__name__)
+
+
+def _encoding(header: bytes) -> str:
+    """由缓存头部得到压缩算法名称
+
+    >>> _encoding(RedisCacheValue.version_header_generator(0, 0, 1))
+    'zlib'
+    >>> _encoding(RedisCacheValue.version_header_generator(0, 0, 0))
+    'none'
+    >>> _encoding(b"plain value")
+    'unknown'
+    """
+    if header.startswith(CHUNK_MAGIC):
+        return "chunked"
+    try:
+        _, version, _, compression_id = RedisCacheValue.parse_header(header)
+    except Exception:
+        return "unknown"
+    if version is None or compression_id < 0:
+        return "unknown"
+    try:
+        return get_compressor(compression_id).name
+    except ValueError:
+        return "compression_%d" % compression_id
+
+
+def _distribution(histogram: Histogram) -> Dict[str, int]:
+    """各桶(非累计)的数量 键为桶上界"""
+    bounds = ["<=%g" % bound for bound in histogram.buckets] + ["+Inf"]
+    return {bound: count for bound, count in zip(bounds, histogram.counts) if count}
+
+
+def _percentiles(histogram: Histogram) -> Dict[str, float]:
+    return {
+        "avg": round(histogram.sum / histogram.count, 1) if histogram.count else 0.0,
+        "p50": round(histogram.percentile(0.5), 1),
+        "p90": round(histogram.percentile(0.9), 1),
+        "p99": round(histogram.percentile(0.99), 1),
+        "max": histogram.max,
+    }
+
+
+class PrefixStats:
+    def __init__(self):
+        """同一函数前缀下缓存键的统计 大小/TTL/压缩情况只统计抽样的键"""
+        self.keys = 0
+        self.sampled = 0
+        self.total_bytes = 0
+        self.no_ttl = 0
+        self.sizes = Histogram(SIZE_BUCKETS)
+        self.ttls = Histogram(TTL_BUCKETS)
+        self.encodings: Dict[str, int] = {}
+
+    def observe(self, size: Optional[int], pttl: int, header: bytes) -> None:
+        if size is None:  # 抽样期间已被删除
+            return
+        self.sampled += 1
+        self.total_bytes += size
+        self.sizes.observe(size)
+        if pttl == -1:
+            self.no_ttl += 1
+        elif pttl >= 0:
+            self.ttls.observe(pttl / 1000)
+        encoding = _encoding(header or b"")
+        self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        compressed = sum(
+            count
+            for encoding, count in self.encodings.items()
+            if encoding not in ("none", "unknown", "chunked")
+        )
+        return {
+            "keys": self.keys,
+            "sampled": self.sampled,
+            "total_bytes": self.total_bytes,
+            "estimated_total_bytes": (
+                int(self.total_bytes * self.keys / self.sampled) if self.sampled else 0
+            ),
+            "size": _percentiles(self.sizes),
+            "ttl": dict(_percentiles(self.ttls), buckets=_distribution(self.ttls)),
+            "no_ttl": self.no_ttl,
+            "encodings": dict(sorted(self.encodings.items())),
+            "compressed_ratio": (
+                round(compressed / self.sampled, 3) if self.sampled else 0.0
+            ),
+        }
+
+
+class KeyspaceAnalyzer:
+    def __init__(
+        self,
+        redis_cache: RedisCache,
+        sample_rate: float = 1.0,
+        batch_size: int = 100,
+        max_keys_per_second: Optional[float] = 1000,
+        memory_usage: Optional[bool] = None,
+        limit: Optional[int] = None,
+    ):
+        """分析RedisCache命名空间下的内存占用 按函数前缀(make_key中':'之前的部分)汇总
+
+        SCAN遍历 `name:*` 下的字符串键, 对抽样的键在一个pipeline中读取
+        MEMORY USAGE(不支持时退回STRLEN)/PTTL/缓存头部, 统计键数量、大小与TTL分布、
+        未设置TTL的键数, 以及由 Serializable 头部解析出的压缩算法占比.
+        标签/版本号等非字符串键不计入.
+
+        Args:
+            redis_cache: RedisCache 或 ShardedRedisCache(依次分析各分片)
+            sample_rate: 抽样比例 (0, 1], 键数量总是完整统计
+            batch_size: 每次SCAN的COUNT与每个pipeline的键数
+            max_keys_per_second: 每秒最多遍历的键数 None 为不限速
+            memory_usage: 是否使用 MEMORY USAGE, None 为自动检测
+            limit: 每个节点最多遍历的键数
+        """
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        self.redis_cache = redis_cache
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.max_keys_per_second = max_keys_per_second
+        self.memory_usage = memory_usage
+        self.limit = limit
+
+    def _databases(self) -> Dict[str, redis.Redis]:
+        if isinstance(self.redis_cache, ShardedRedisCache):
+            return {
+                name: shard.database for name, shard in self.redis_cache.shards.items()
+            }
+        return {"": self.redis_cache.database}
+
+    def _supports_memory_usage(self, client: redis.Redis, key: str) -> bool:
+        if self.memory_usage is not None:
+            return self.memory_usage
+        try:
+            client.memory_usage(key)
+            return True
+        except redis.ResponseError:
+            logger.info("MEMORY USAGE is unavailable, use STRLEN instead")
+            return False
+
+    def _iter_keys(self, client: redis.Redis, pattern: str) -> Iterator[str]:
+        keys = client.scan_iter(
+            match=self.redis_cache.make_key(pattern),
+            count=self.batch_size,
+            _type="string",
+        )
+        for index, key in enumerate(keys):
+            if self.limit is not None and index >= self.limit:
+                return
+            yield key.decode()
+
+    def _sample(
+        self, client: redis.Redis, keys: List[str], memory_usage: bool
+    ) -> List[Tuple[Optional[int], int, bytes]]:
+        """在一个pipeline中读取 (大小, PTTL, 头部)"""
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            if memory_usage:
+                pipe.memory_usage(key, samples=0)
+            else:
+                pipe.strlen(key)
+            pipe.pttl(key)
+            pipe.getrange(key, 0, V2_HEADER_SIZE - 1)
+        results = pipe.execute()
+        samples = []
+        for index in range(0, len(results), 3):
+            size, pttl, header = results[index : index + 3]  # noqa: E203
+            if pttl == -2:  # 已被删除
+                size = None
+            samples.append((size, pttl, header))
+        return samples
+
+    def _throttle(self, started: float, scanned: int) -> None:
+        if self.max_keys_per_second:
+            delay = started + scanned / self.max_keys_per_second - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+    def analyze(self, pattern: str = "*") -> Dict[str, Any]:
+        """遍历并汇总 返回可JSON序列化的报告
+
+        Args:
+            pattern: 匹配模式(不含命名空间前缀) 默认全部缓存
+        """
+        started = time.time()
+        stats: Dict[str, PrefixStats] = {}
+        scanned = 0
+        memory_usage = None
+        for client in self._databases().values():
+            for batch in _batched(self._iter_keys(client, pattern), self.batch_size):
+                if memory_usage is None:
+                    memory_usage = self._supports_memory_usage(client, batch[0])
+                sampled = []
+                for key in batch:
+                    prefix = self.redis_cache.unmake_key(key).split(":", 1)[0]
+                    # 分块/锁等内部键 以可打印的形式显示
+                    prefix = prefix.replace(INTERNAL_PREFIX, "\\x00")
+                    prefix_stats = stats.setdefault(prefix, PrefixStats())
+                    prefix_stats.keys += 1
+                    if (
+                        self.sample_rate >= 1 or random.random() < self.sample_rate
+                    ):  # noqa: S311
+                        sampled.append((key, prefix_stats))
+                if sampled:
+                    samples = self._sample(
+                        client, [key for key, _ in sampled], memory_usage
+                    )
+                    for (_, prefix_stats), sample in zip(sampled, samples):
+                        prefix_stats.observe(*sample)
+                scanned += len(batch)
+                self._throttle(started, scanned)
+        prefixes = {
+            prefix: stats[prefix].as_dict()
+            for prefix in sorted(stats, key=lambda p: -stats[p].total_bytes)
+        }
+        return {
+            "namespace": self.redis_cache.name,
+            "scanned": scanned,
+            "sampled": sum(prefix["sampled"] for prefix in prefixes.values()),
+            "size_source": "memory_usage" if memory_usage else "strlen",
+            "elapsed": round(time.time() - started, 3),
+            "prefixes": prefixes,
+        }
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    """将 analyze 的结果格式化为文本表格"""
+    header = (
+        "prefix",
+        "keys",
+        "sampled",
+        "est_bytes",
+        "size_p50",
+        "size_p99",
+        "size_max",
+        "ttl_p50",
+        "no_ttl",
+        "compressed",
+    )
+    rows = [header]
+    for prefix, stats in report["prefixes"].items():
+        rows.append(
+            (
+                prefix,
+                stats["keys"],
+                stats["sampled"],
+                stats["estimated_total_bytes"],
+                stats["size"]["p50"],
+                stats["size"]["p99"],
+                stats["size"]["max"],
+                stats["ttl"]["p50"],
+                stats["no_ttl"],
+                "%.1f%%" % (stats["compressed_ratio"] * 100),
+            )
+        )
+    rows = [tuple(str(cell) for cell in row) for row in rows]
+    widths = [max(len(row[index]) for row in rows) for index in range(len(header))]
+    lines = [
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    lines.append(
+        "namespace=%s scanned=%s sampled=%s size_source=%s elapsed=%ss"
+        % (
+            report["namespace"],
+            report["scanned"],
+            report["sampled"],
+            report["size_source"],
+            report["elapsed"],
+        )
+    )
+    return "\n".join(lines)
+
+
+__all__ = [KeyspaceAnalyzer, PrefixStats, format_table]
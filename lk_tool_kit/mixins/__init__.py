@@ -1 +1,8 @@
+from .codecs import Codec, get_codec, register_codec
+from .compression import (
+    CompressionPolicy,
+    Compressor,
+    get_compressor,
+    register_compressor,
+)
 from .serializable import Serializable
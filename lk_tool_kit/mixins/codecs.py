@@ -0,0 +1,293 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 16:05
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : codecs.py
+import json
+import pickle  # noqa: S403
+import struct
+from typing import Any, Dict, List, Tuple, Union
+
+
+class Codec:
+    """值编解码器
+
+    codec_id 写入序列化头部(1字节), 读取时据此选择解码器;
+    encode 不支持该值时应抛出 TypeError/ValueError, 由调用方退回pickle.
+    """
+
+    codec_id: int = -1
+    name: str = ""
+
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        raise NotImplementedError
+
+
+class PickleCodec(Codec):
+    """任意可pickle对象"""
+
+    codec_id = 0
+    name = "pickle"
+
+    def encode(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        return pickle.loads(data)  # noqa: S301
+
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _check_json_native(value: Any) -> None:
+    """JSON往返后类型不变的数据才能用JSON编码, 否则抛出TypeError
+
+    tuple/set、非str的字典键以及dict/list/str等的子类解码后类型会改变
+
+    >>> _check_json_native({"a": [1, "b", None]})
+    >>> _check_json_native({1: (1, 2)})
+    Traceback (most recent call last):
+    ...
+    TypeError: json codec does not keep <class 'int'> dict keys
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        item_type = type(item)
+        if item_type in _JSON_SCALARS:
+            continue
+        if item_type is list:
+            stack.extend(item)
+        elif item_type is dict:
+            for key in item:
+                if type(key) is not str:
+                    raise TypeError(f"json codec does not keep {type(key)} dict keys")
+            stack.extend(item.values())
+        else:
+            raise TypeError(f"json codec does not keep {item_type}")
+
+
+class JsonCodec(Codec):
+    """JSON原生数据 (dict(键为str)/list/str/数字/bool/None)
+
+    其他类型(如tuple、int键)JSON往返后类型会改变, encode 时抛出 TypeError 退回pickle
+
+    >>> codec = JsonCodec()
+    >>> codec.decode(codec.encode({"a": [1, 2.5, None]}))
+    {'a': [1, 2.5, None]}
+    """
+
+    codec_id = 1
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        _check_json_native(value)
+        return json.dumps(
+            value, ensure_ascii=False, separators=(",", ":"), allow_nan=False
+        ).encode("utf-8")
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        return json.loads(bytes(data))
+
+
+class RawCodec(Codec):
+    """bytes/str 原样存储, 不做序列化
+
+    >>> codec = RawCodec()
+    >>> codec.decode(codec.encode("你好")), codec.decode(codec.encode(b"hi"))
+    ('你好', b'hi')
+    """
+
+    codec_id = 2
+    name = "raw"
+
+    def encode(self, value: Any) -> bytes:
+        if isinstance(value, bytes):
+            return b"b" + value
+        if isinstance(value, str):
+            return b"s" + value.encode("utf-8")
+        raise TypeError(f"raw codec only supports bytes/str, got {type(value)}")
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        data = bytes(data)
+        if data[:1] == b"s":
+            return data[1:].decode("utf-8")
+        return data[1:]
+
+
+def _pack_meta(meta: Any) -> bytes:
+    data = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    return struct.pack("<I", len(data)) + data
+
+
+def _unpack_meta(data: memoryview) -> Tuple[Any, memoryview]:
+    (size,) = struct.unpack("<I", data[:4])
+    return json.loads(bytes(data[4 : 4 + size])), data[4 + size :]  # noqa: E203
+
+
+def _array_to_buffer(array: Any) -> Tuple[Dict[str, Any], bytes]:
+    """非object类型的numpy数组转为 (dtype+shape, 连续内存)"""
+    import numpy as np
+
+    if not isinstance(array, np.ndarray) or array.dtype.hasobject:
+        raise TypeError(f"unsupported array: {type(array)}")
+    array = np.ascontiguousarray(array)
+    return {"dtype": array.dtype.str, "shape": list(array.shape)}, array.tobytes()
+
+
+def _buffer_to_array(meta: Dict[str, Any], data: memoryview) -> Any:
+    import numpy as np
+
+    array = np.frombuffer(bytearray(data), dtype=np.dtype(meta["dtype"]))
+    return array.reshape(meta["shape"])
+
+
+class NumpyCodec(Codec):
+    """numpy数组 存储为 dtype + shape + 连续内存
+
+    >>> import numpy as np
+    >>> codec = NumpyCodec()
+    >>> codec.decode(codec.encode(np.arange(6).reshape(2, 3))).tolist()
+    [[0, 1, 2], [3, 4, 5]]
+    """
+
+    codec_id = 3
+    name = "numpy"
+
+    def encode(self, value: Any) -> bytes:
+        meta, buffer = _array_to_buffer(value)
+        return _pack_meta(meta) + buffer
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        meta, data = _unpack_meta(memoryview(data))
+        return _buffer_to_array(meta, data)
+
+
+class PandasCodec(Codec):
+    """pandas DataFrame 按列存储
+
+    数值/时间列直接存储底层内存, object/category等列单独pickle;
+    列名与索引名需为 str/int.
+
+    >>> import pandas as pd
+    >>> codec = PandasCodec()
+    >>> df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}, index=[3, 4])
+    >>> codec.decode(codec.encode(df)).equals(df)
+    True
+    """
+
+    codec_id = 4
+    name = "pandas"
+
+    @staticmethod
+    def _check_labels(labels: List[Any]) -> None:
+        for label in labels:
+            if label is not None and not isinstance(label, (str, int)):
+                raise TypeError(f"unsupported label for pandas codec: {label!r}")
+
+    @staticmethod
+    def _encode_column(values: Any) -> Tuple[Dict[str, Any], bytes]:
+        """Series/Index 编码 numpy类型直接存储内存, 其他类型pickle"""
+        import numpy as np
+
+        if isinstance(values.dtype, np.dtype) and not values.dtype.hasobject:
+            meta, buffer = _array_to_buffer(values.to_numpy())
+            meta["kind"] = "array"
+        else:
+            buffer = pickle.dumps(values.array, protocol=pickle.HIGHEST_PROTOCOL)
+            meta = {"kind": "pickle"}
+        meta["size"] = len(buffer)
+        return meta, buffer
+
+    @staticmethod
+    def _decode_column(meta: Dict[str, Any], data: memoryview) -> Any:
+        if meta["kind"] == "array":
+            return _buffer_to_array(meta, data)
+        return pickle.loads(data)  # noqa: S301
+
+    def encode(self, value: Any) -> bytes:
+        import pandas as pd
+
+        if not isinstance(value, pd.DataFrame):
+            raise TypeError(f"pandas codec only supports DataFrame, got {type(value)}")
+        columns = list(value.columns)
+        self._check_labels(columns + [value.index.name, value.columns.name])
+        buffers = []
+        column_metas = []
+        for position in range(value.shape[1]):
+            meta, buffer = self._encode_column(value.iloc[:, position])
+            column_metas.append(meta)
+            buffers.append(buffer)
+        index = value.index
+        if isinstance(index, pd.RangeIndex):
+            index_meta = {"range": [index.start, index.stop, index.step]}
+        else:
+            index_meta, buffer = self._encode_column(index)
+            buffers.append(buffer)
+        index_meta["name"] = index.name
+        meta = {
+            "columns": columns,
+            "columns_name": value.columns.name,
+            "column_metas": column_metas,
+            "index": index_meta,
+        }
+        return _pack_meta(meta) + b"".join(buffers)
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        import pandas as pd
+
+        meta, data = _unpack_meta(memoryview(data))
+        arrays = []
+        offset = 0
+        for column_meta in meta["column_metas"]:
+            size = column_meta["size"]
+            arrays.append(
+                self._decode_column(column_meta, data[offset : offset + size])  # noqa
+            )
+            offset += size
+        index_meta = meta["index"]
+        if "range" in index_meta:
+            index = pd.RangeIndex(*index_meta["range"], name=index_meta["name"])
+        else:
+            values = self._decode_column(index_meta, data[offset:])
+            index = pd.Index(values, name=index_meta["name"])
+        df = pd.DataFrame(dict(enumerate(arrays)), index=index)
+        df.columns = pd.Index(meta["columns"], name=meta["columns_name"])
+        return df
+
+
+_CODECS: Dict[Union[int, str], Codec] = {}
+
+
+def register_codec(codec: Codec) -> Codec:
+    """注册编解码器 codec_id 取值 0-255 且不可重复"""
+    if not 0 <= codec.codec_id <= 255:
+        raise ValueError(f"codec_id must be in [0, 255]: {codec.codec_id}")
+    exists = _CODECS.get(codec.codec_id)
+    if exists is not None and exists.name != codec.name:
+        raise ValueError(f"codec_id {codec.codec_id} is used by {exists.name}")
+    _CODECS[codec.codec_id] = codec
+    _CODECS[codec.name] = codec
+    return codec
+
+
+def get_codec(codec: Union[int, str, Codec]) -> Codec:
+    """通过 codec_id/名称 获取编解码器
+
+    >>> get_codec("json").codec_id
+    1
+    """
+    if isinstance(codec, Codec):
+        return codec
+    try:
+        return _CODECS[codec]
+    except KeyError:
+        raise ValueError(f"unknown codec: {codec!r}") from None
+
+
+for _codec in (PickleCodec(), JsonCodec(), RawCodec(), NumpyCodec(), PandasCodec()):
+    register_codec(_codec)
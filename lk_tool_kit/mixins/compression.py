@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 17:20
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : compression.py
+import bz2
+import lzma
+import zlib
+from typing import Any, Dict, Optional, Union
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class Compressor:
+    """压缩算法 compression_id 写入序列化头部(1字节)"""
+
+    compression_id: int = -1
+    name: str = ""
+    default_level: Optional[int] = None
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+        raise NotImplementedError
+
+    def decompressobj(self) -> Any:
+        """流式解压对象 需提供 decompress(chunk) 方法"""
+        raise NotImplementedError
+
+
+class _NoneCompressor(Compressor):
+    compression_id = 0
+    name = "none"
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return data
+
+    def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+        return data
+
+    def decompressobj(self) -> Any:
+        return _PassThrough()
+
+
+class _PassThrough:
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return data
+
+
+class ZlibCompressor(Compressor):
+    compression_id = 1
+    name = "zlib"
+    default_level = -1
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return zlib.compress(data, self.default_level if level is None else level)
+
+    def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+        return zlib.decompress(data)
+
+    def decompressobj(self) -> Any:
+        return zlib.decompressobj()
+
+
+class Bz2Compressor(Compressor):
+    compression_id = 2
+    name = "bz2"
+    default_level = 9
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return bz2.compress(data, self.default_level if level is None else level)
+
+    def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+        return bz2.decompress(data)
+
+    def decompressobj(self) -> Any:
+        return bz2.BZ2Decompressor()
+
+
+class LzmaCompressor(Compressor):
+    compression_id = 3
+    name = "lzma"
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return lzma.compress(data, preset=level)
+
+    def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+        return lzma.decompress(data)
+
+    def decompressobj(self) -> Any:
+        return lzma.LZMADecompressor()
+
+
+class Lz4Compressor(Compressor):
+    compression_id = 4
+    name = "lz4"
+    default_level = 0
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        level = self.default_level if level is None else level
+        return lz4_frame.compress(data, compression_level=level)
+
+    def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+        return lz4_frame.decompress(data)
+
+    def decompressobj(self) -> Any:
+        return lz4_frame.LZ4FrameDecompressor()
+
+
+class ZstdCompressor(Compressor):
+    compression_id = 5
+    name = "zstd"
+    default_level = 3
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        level = self.default_level if level is None else level
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def decompress(self, data: Union[bytes, memoryview]) -> bytes:
+        # 流式写入的帧头中可能没有原始大小, 统一使用流式解压
+        return self.decompressobj().decompress(data)
+
+    def decompressobj(self) -> Any:
+        return zstandard.ZstdDecompressor().decompressobj()
+
+
+_COMPRESSORS: Dict[Union[int, str], Compressor] = {}
+# 已知但当前环境未安装依赖的算法, 读取时给出明确错误
+_UNAVAILABLE = {
+    Lz4Compressor.compression_id: "lz4",
+    ZstdCompressor.compression_id: "zstd",
+}
+
+
+def register_compressor(compressor: Compressor) -> Compressor:
+    """注册压缩算法 compression_id 取值 0-255 且不可重复"""
+    if not 0 <= compressor.compression_id <= 255:
+        raise ValueError(
+            f"compression_id must be in [0, 255]: {compressor.compression_id}"
+        )
+    exists = _COMPRESSORS.get(compressor.compression_id)
+    if exists is not None and exists.name != compressor.name:
+        raise ValueError(
+            f"compression_id {compressor.compression_id} is used by {exists.name}"
+        )
+    _COMPRESSORS[compressor.compression_id] = compressor
+    _COMPRESSORS[compressor.name] = compressor
+    _UNAVAILABLE.pop(compressor.compression_id, None)
+    return compressor
+
+
+def get_compressor(compressor: Union[int, str, Compressor]) -> Compressor:
+    """通过 compression_id/名称 获取压缩算法
+
+    >>> get_compressor("zlib").compression_id
+    1
+    """
+    if isinstance(compressor, Compressor):
+        return compressor
+    try:
+        return _COMPRESSORS[compressor]
+    except KeyError:
+        pass
+    if compressor in _UNAVAILABLE or compressor in _UNAVAILABLE.values():
+        raise ValueError(f"compression {compressor!r} requires an extra package")
+    raise ValueError(f"unknown compression: {compressor!r}")
+
+
+class CompressionPolicy:
+    def __init__(
+        self,
+        algorithm: Union[str, Compressor] = "zlib",
+        level: Optional[int] = None,
+        min_size: int = 0,
+    ):
+        """压缩策略
+
+        Args:
+            algorithm: 压缩算法 zlib/bz2/lzma, 安装对应依赖后可用 lz4/zstd
+            level: 压缩级别 默认使用各算法的默认级别
+            min_size: 小于该字节数的数据不压缩
+
+        压缩后体积没有变小时保留原始数据, 头部记录实际使用的算法
+
+        >>> policy = CompressionPolicy("zlib", min_size=100)
+        >>> policy.compress(b"a" * 10) is None
+        True
+        >>> len(policy.compress(b"a" * 1000)) < 1000
+        True
+        """
+        self.compressor = get_compressor(algorithm)
+        self.level = level
+        self.min_size = min_size
+
+    def __repr__(self) -> str:
+        return "CompressionPolicy(%r, level=%r, min_size=%r)" % (
+            self.compressor.name,
+            self.level,
+            self.min_size,
+        )
+
+    @classmethod
+    def from_value(
+        cls, compress: Union[None, bool, str, "CompressionPolicy"]
+    ) -> Optional["CompressionPolicy"]:
+        """将 cached(compress=...) 的取值转为压缩策略
+
+        False/None 不压缩, True 使用zlib, 字符串为算法名称
+        """
+        if isinstance(compress, cls):
+            return compress
+        if not compress:
+            return None
+        if compress is True:
+            return cls("zlib")
+        return cls(compress)
+
+    def compress(self, data: bytes) -> Optional[bytes]:
+        """压缩数据 不满足大小阈值或压缩无收益时返回None"""
+        if len(data) < self.min_size:
+            return None
+        compressed = self.compressor.compress(data, self.level)
+        if len(compressed) >= len(data):
+            return None
+        return compressed
+
+
+for _compressor in (
+    _NoneCompressor(),
+    ZlibCompressor(),
+    Bz2Compressor(),
+    LzmaCompressor(),
+):
+    register_compressor(_compressor)
+if lz4_frame is not None:  # pragma: no cover
+    register_compressor(Lz4Compressor())
+if zstandard is not None:  # pragma: no cover
+    register_compressor(ZstdCompressor())
@@ -1,15 +1,26 @@
 import pickle  # noqa: S403
 import struct
+import time
 import zlib
 from enum import Enum
-from typing import Callable, Dict, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from .codecs import Codec, get_codec
+from .compression import CompressionPolicy, get_compressor
 
 
 class Version(bytes, Enum):
     V1 = b"V1"
     OLD = b"OLD"
+    V2 = b"V2"  # 头部增加 codec_id + compression_id 各1字节
+    V3 = b"V3"  # 头部增加写入时的过期时间(秒) 4字节
+
+    CURRENT = V3
+
 
-    CURRENT = V1
+V1_HEADER_SIZE = 15  # 版本(7) + 时间戳(8)
+V2_HEADER_SIZE = 17  # 版本(7) + 时间戳(8) + codec_id(1) + compression_id(1)
+V3_HEADER_SIZE = 21  # V2头部 + 过期时间(4) 0为不过期
 
 
 class Serializable:
@@ -19,6 +30,10 @@ class Serializable:
         Version.V1: lambda cls, data, compress, timestamp: pickle.loads(  # noqa: S301
             zlib.decompress(data[15:]) if compress else data[15:]
         ),
+        Version.V2: lambda cls, data, compress, timestamp: cls._deserialize_v2(data),
+        Version.V3: lambda cls, data, compress, timestamp: cls._deserialize_v2(
+            data, V3_HEADER_SIZE
+        ),
     }
     _VERSION_PREFIX: bytes = b"version"
     _serialization_version: Optional[Version] = None
@@ -33,6 +48,15 @@ class Serializable:
     def is_legacy_version(cls, data: bytes) -> bool:
         raise NotImplementedError
 
+    def _codec_value(self) -> Any:
+        """交给编解码器的值 默认为对象本身"""
+        return self
+
+    @classmethod
+    def _from_codec_value(cls, value: Any) -> "Serializable":
+        """由编解码器解码出的值还原对象"""
+        return value
+
     @classmethod
     def _version_encoder(cls, bytes_data: bytes) -> bytes:
         """
@@ -94,33 +118,123 @@ class Serializable:
         return timestamp
 
     @classmethod
-    def version_header_generator(cls, timestamp: float) -> bytes:
+    def parse_header(cls, buf: bytes) -> Tuple[float, Optional[Version], int, int]:
+        """解析头部 不反序列化数据
+
+        Returns:
+            (时间戳, 版本, codec_id, compression_id); V2之前的版本 codec_id 为pickle,
+            压缩算法未记录在头部, compression_id 返回 -1
         """
-        打包新的版本 + 时间戳(旧的版本)
+        timestamp, version = cls.parse_version(buf, need_version=True)
+        if version in (Version.V2, Version.V3) and len(buf) >= V2_HEADER_SIZE:
+            return timestamp, version, buf[15], buf[16]
+        return timestamp, version, 0, -1
+
+    @classmethod
+    def parse_ttl(cls, buf: bytes) -> Optional[int]:
+        """解析头部中写入时的过期时间(秒) 0为不过期; V3之前的版本未记录, 返回None"""
+        if len(buf) < V3_HEADER_SIZE or cls._version_decoder(buf) != Version.V3:
+            return None
+        return struct.unpack("I", buf[V2_HEADER_SIZE:V3_HEADER_SIZE])[0]
+
+    @classmethod
+    def version_header_generator(
+        cls,
+        timestamp: float,
+        codec_id: int = 0,
+        compression_id: int = 0,
+        ttl: Optional[int] = None,
+    ) -> bytes:
+        """
+        打包新的版本 + 时间戳 + codec_id + compression_id + 过期时间
 
         Args:
-            timestamp (float): _description_
+            timestamp (float): 写入时间
+            codec_id (int): 编解码器id
+            compression_id (int): 压缩算法id 0为不压缩
+            ttl (int): 过期时间(秒) None为不过期
 
         Returns:
-            bytes: _description_
+            bytes: V3头部
         """
-        return cls._version_encoder(cls._VERSION_PREFIX) + struct.pack("d", timestamp)
+        return (
+            cls._version_encoder(cls._VERSION_PREFIX)
+            + struct.pack("d", timestamp)
+            + bytes((codec_id, compression_id))
+            + struct.pack("I", ttl or 0)
+        )
 
     @classmethod
-    def serialize(cls, timestamp: float, data: object, compress: bool) -> bytes:
+    def serialize(
+        cls,
+        timestamp: float,
+        data: "Serializable",
+        compress: Union[bool, str, CompressionPolicy],
+        codec: Union[int, str, Codec] = "pickle",
+        stats: Optional[Dict[str, float]] = None,
+        ttl: Optional[int] = None,
+    ) -> bytes:
         """
         serialize data(Latest version)
 
         Args:
             data (object): data to serialize
-            compress (bool): compress data or not
+            compress: 是否压缩, True 为zlib, 也可以是算法名称或 CompressionPolicy
+            codec: 编解码器 值不被支持时退回pickle; codec_id 记录在头部
+            stats: 传入时累加 raw_bytes/stored_bytes/compress_time
+            ttl: 写入时的过期时间(秒) 记录在头部, 读取方据此判断过期, None为不过期
 
         Returns:
             bytes: serialized data
         """
-        res = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
-        res = zlib.compress(res) if compress else res
-        return cls.version_header_generator(timestamp) + res
+        codec = get_codec(codec)
+        value = data._codec_value()
+        try:
+            res = codec.encode(value)
+        except (TypeError, ValueError):
+            codec = get_codec("pickle")
+            res = codec.encode(value)
+        raw_size = len(res)
+        compression_id = 0
+        policy = CompressionPolicy.from_value(compress)
+        if policy is not None:
+            start = time.perf_counter()
+            compressed = policy.compress(res)
+            if stats is not None:
+                stats["compress_time"] += time.perf_counter() - start
+            if compressed is not None:
+                res = compressed
+                compression_id = policy.compressor.compression_id
+        if stats is not None:
+            stats["raw_bytes"] += raw_size
+            stats["stored_bytes"] += len(res)
+        header = cls.version_header_generator(
+            timestamp, codec.codec_id, compression_id, ttl
+        )
+        return header + res
+
+    @classmethod
+    def _deserialize_v2(
+        cls, data: bytes, header_size: int = V2_HEADER_SIZE
+    ) -> "Serializable":
+        """V2/V3 根据头部中的 codec_id 与 compression_id 解码, 不依赖调用方的compress参数
+
+        data 也可以是提供 iter_from(offset) 的分块数据, 此时逐块流式解压, 不拼接压缩数据
+        """
+        codec_id, compression_id = data[15], data[16]
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            payload = memoryview(data)[header_size:]
+            if compression_id:
+                payload = get_compressor(compression_id).decompress(payload)
+        else:
+            decompressor = get_compressor(compression_id).decompressobj()
+            parts = [
+                decompressor.decompress(chunk) for chunk in data.iter_from(header_size)
+            ]
+            if hasattr(decompressor, "flush"):
+                parts.append(decompressor.flush())
+            payload = b"".join(parts)
+        return cls._from_codec_value(get_codec(codec_id).decode(payload))
 
     @classmethod
     def deserialize(cls, package: bytes, compress: bool) -> "Serializable":
@@ -0,0 +1,468 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 20:10
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : sharded_redis_cache.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import redis
+
+from lk_tool_kit.cache_utils import CacheMetrics, HashRing, pool_registry, pool_stats
+from lk_tool_kit.cache_utils.pool import _safe_url
+from lk_tool_kit.cache_utils.write_behind import WriteItem
+from lk_tool_kit.func_redis_cache import NoneCache, RedisCache, aioredis
+
+T = TypeVar("T")
+Databases = Union[Sequence[Any], Dict[str, Any]]
+
+
+def _client_name(client: Any) -> str:
+    """以 host:port/db 作为分片名称"""
+    kwargs = client.connection_pool.connection_kwargs
+    if "path" in kwargs:
+        return "%s/%s" % (kwargs["path"], kwargs.get("db", 0))
+    return "%s:%s/%s" % (
+        kwargs.get("host", "localhost"),
+        kwargs.get("port", 6379),
+        kwargs.get("db", 0),
+    )
+
+
+def _named(databases: Databases) -> Dict[str, Any]:
+    if isinstance(databases, dict):
+        return dict(databases)
+    named = {}
+    for database in databases:
+        name = _client_name(database)
+        if name in named:
+            raise ValueError("duplicate shard %r, pass a dict to name shards" % name)
+        named[name] = database
+    return named
+
+
+class Shard:
+    def __init__(
+        self, name: str, database: redis.Redis, async_database: "aioredis.Redis" = None
+    ):
+        """分片 同一节点的同步/异步连接与该节点的 hits/misses/writes 计数"""
+        self.name = name
+        self.database = database
+        self.async_database = async_database
+        self.metrics = CacheMetrics(counters=("hits", "misses", "writes"))
+
+    def __repr__(self) -> str:
+        return "Shard(%r)" % self.name
+
+
+class ShardedRedisCache(RedisCache):
+    def __init__(
+        self,
+        databases: Databases,
+        name: str = "cache",
+        async_databases: Optional[Databases] = None,
+        replicas: int = 160,
+        max_workers: Optional[int] = None,
+        **kwargs,
+    ):
+        """客户端分片的RedisCache 按一致性哈希把缓存键分布到多个redis节点
+
+        单键读写/锁按缓存键路由到所在节点; get_many/set_many 按节点分组后并行执行,
+        delete_all/keys 在所有节点上并行执行后合并结果.
+        节点在哈希环上的位置只由分片名称决定, 增删节点只迁移约 1/节点数 的键.
+
+        Args:
+            databases: redis连接列表(以 host:port/db 命名) 或 分片名称 -> 连接
+            name: Namespace for this cache.
+            async_databases: 与 databases 对应的 redis.asyncio 连接
+            replicas: 每个节点的虚拟节点数
+            max_workers: 并行访问各节点的线程数 默认为节点数
+            kwargs: 其他 RedisCache 参数
+
+        >>> r_cache = ShardedRedisCache.from_urls(
+        ...     ["redis://localhost:6379/1", "redis://localhost:6379/2"]
+        ... )
+        >>> @r_cache.cached(timeout=3, metrics=True)
+        ... def get_obj_str(string: int) -> str:
+        ...     return str(string)
+        >>> assert get_obj_str.many(range(10)) == get_obj_str.many(range(10))
+        >>> assert get_obj_str.metrics["hits"] == 10
+        >>> assert sum(s.metrics["writes"] for s in r_cache.shards.values()) == 10
+        >>> assert get_obj_str.bust_all() == 10
+        """
+        shards = _named(databases)
+        if not shards:
+            raise ValueError("ShardedRedisCache needs at least one database")
+        async_shards = _named(async_databases) if async_databases else {}
+        if async_shards and set(async_shards) != set(shards):
+            raise ValueError("async_databases must match databases")
+        first = next(iter(shards))
+        # 默认分片 仅用于判断是否支持asyncio
+        super().__init__(
+            database=shards[first],
+            name=name,
+            async_database=async_shards.get(first),
+            **kwargs,
+        )
+        self.shards: Dict[str, Shard] = {
+            shard_name: Shard(shard_name, database, async_shards.get(shard_name))
+            for shard_name, database in shards.items()
+        }
+        self.ring = HashRing(self.shards, replicas)
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_guard = threading.Lock()
+
+    @classmethod
+    def from_urls(
+        cls,
+        urls: Sequence[str],
+        name: str = "cache",
+        default_timeout: int = None,
+        debug: bool = False,
+        with_async: bool = False,
+        pool_options: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> "ShardedRedisCache":
+        """通过多个redis url创建分片缓存 分片以隐藏密码后的url命名
+
+        Args:
+            urls: 各节点的redis url
+            with_async: 同时创建 redis.asyncio 连接
+            pool_options: 连接池参数 同 RedisCache.from_url
+            kwargs: 其他 ShardedRedisCache 参数
+        """
+        pool_options = pool_options or {}
+        databases = {
+            _safe_url(url): redis.Redis(
+                connection_pool=pool_registry.get(url, **pool_options)
+            )
+            for url in urls
+        }
+        async_databases = None
+        if with_async:
+            if aioredis is None:  # pragma: no cover
+                raise RuntimeError("redis.asyncio is unavailable, need redis>=4.2")
+            async_databases = {
+                _safe_url(url): aioredis.Redis(
+                    connection_pool=pool_registry.get_async(url, **pool_options)
+                )
+                for url in urls
+            }
+        return cls(
+            databases,
+            name=name,
+            default_timeout=default_timeout,
+            debug=debug,
+            async_databases=async_databases,
+            **kwargs,
+        )
+
+    def add_shard(
+        self, name: str, database: redis.Redis, async_database: "aioredis.Redis" = None
+    ) -> None:
+        """加入节点 约 1/节点数 的键会路由到新节点(旧值在原节点上自然过期)"""
+        if (async_database is None) != (self.async_database is None):
+            raise ValueError("async_database must be given iff the cache is async")
+        shards = dict(self.shards)
+        shards[name] = Shard(name, database, async_database)
+        self.shards = shards  # 先注册分片再加入哈希环, 路由时分片总是存在
+        self.ring.add_node(name)
+
+    def remove_shard(self, name: str) -> Shard:
+        """移除节点 其上的键重新分布到其余节点"""
+        if len(self.shards) == 1:
+            raise ValueError("can not remove the last shard")
+        self.ring.remove_node(name)
+        shards = dict(self.shards)
+        shard = shards.pop(name)
+        self.shards = shards
+        if self.database is shard.database:
+            other = next(iter(shards.values()))
+            self.database, self.async_database = other.database, other.async_database
+        return shard
+
+    def shard_for(self, key: str) -> Shard:
+        """缓存键(不含命名空间前缀)所在的分片"""
+        return self.shards[self.ring.get_node(key)]
+
+    def _client_for(self, key: str) -> redis.Redis:
+        return self.shard_for(key).database
+
+    def _aclient_for(self, key: str) -> "aioredis.Redis":
+        return self.shard_for(key).async_database
+
+    def _record_get(
+        self, value: Optional[bytes], default: Any, key: Optional[str] = None
+    ) -> Any:
+        if key is not None:
+            self.shard_for(key).metrics.incr("hits" if value else "misses")
+        return super()._record_get(value, default, key)
+
+    def _record_write(self, key: Optional[str] = None, count: int = 1) -> None:
+        if key is not None:
+            self.shard_for(key).metrics.incr("writes", count)
+        super()._record_write(key, count)
+
+    def _group(self, keys: Sequence[str]) -> Dict[Shard, List[int]]:
+        """按分片分组 返回 分片 -> 键在原列表中的下标"""
+        groups: Dict[Shard, List[int]] = {}
+        for index, key in enumerate(keys):
+            groups.setdefault(self.shard_for(key), []).append(index)
+        return groups
+
+    def _map(self, fn: Callable[..., T], args: List[tuple]) -> List[T]:
+        """在线程池中并行执行 只有一个任务时直接在当前线程执行"""
+        if len(args) <= 1:
+            return [fn(*arg) for arg in args]
+        if self._executor is None:
+            with self._executor_guard:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.max_workers or len(self.shards),
+                        thread_name_prefix="sharded-redis-cache",
+                    )
+        futures = [self._executor.submit(fn, *arg) for arg in args]
+        return [future.result() for future in futures]
+
+    def delete_all(self, key: str = "*") -> int:
+        """在所有分片上并行删除缓存"""
+        shards = list(self.shards.values())
+        args = [(shard.database, key) for shard in shards]
+        return sum(self._map(self._delete_all_on, args))
+
+    def keys(self, key: str = "*") -> List[str]:
+        """并行遍历所有分片后合并"""
+        shards = list(self.shards.values())
+        args = [(shard.database, key) for shard in shards]
+        return [
+            redis_key
+            for keys in self._map(lambda *arg: list(self._iter_keys_on(*arg)), args)
+            for redis_key in keys
+        ]
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """标签索引与缓存位于同一分片 在所有分片上并行删除"""
+        shards = list(self.shards.values())
+        args = [(shard.database, tags) for shard in shards]
+        return sum(self._map(self._invalidate_tags_on, args))
+
+    def iter_keys(self, key: str = "*", count: Optional[int] = None) -> Iterator[str]:
+        """依次遍历各分片"""
+        for shard in list(self.shards.values()):
+            yield from self._iter_keys_on(shard.database, key, count)
+
+    def get_many(self, keys: List[str], default: Any = NoneCache) -> List[Any]:
+        """按分片分组后并行MGET 结果顺序与keys一致"""
+        if not keys:
+            return []
+        groups = list(self._group(keys).items())
+        args = [
+            (shard.database, [self.make_key(keys[i]) for i in indexes])
+            for shard, indexes in groups
+        ]
+        values = [None] * len(keys)
+        for (_, indexes), shard_values in zip(
+            groups, self._map(lambda client, redis_keys: client.mget(redis_keys), args)
+        ):
+            for index, value in zip(indexes, shard_values):
+                values[index] = value
+        values = [self._unchunk(k, v) for k, v in zip(keys, values)]
+        return [self._record_get(v, default, k) for k, v in zip(keys, values)]
+
+    def _scatter(
+        self,
+        fn: Callable[[redis.Redis, List[str]], List[T]],
+        keys: List[str],
+        default: T,
+    ) -> List[T]:
+        """按分片分组后并行执行 fn(client, keys) 结果按keys的顺序合并"""
+        groups = list(self._group(keys).items())
+        args = [
+            (shard.database, [keys[i] for i in indexes]) for shard, indexes in groups
+        ]
+        merged = [default] * len(keys)
+        for (_, indexes), shard_results in zip(groups, self._map(fn, args)):
+            for index, result in zip(indexes, shard_results):
+                merged[index] = result
+        return merged
+
+    def exists_many(self, keys: List[str]) -> List[bool]:
+        """按分片分组后并行检查"""
+        return self._scatter(self._exists_many_on, keys, False)
+
+    def pttl_many(self, keys: List[str]) -> List[int]:
+        """按分片分组后并行查询"""
+        return self._scatter(self._pttl_many_on, keys, -2)
+
+    async def aexists_many(self, keys: List[str]) -> List[bool]:
+        """exists_many 的asyncio版本"""
+        if self.async_database is None:
+            return self.exists_many(keys)
+        groups = list(self._group(keys).items())
+        shard_exists = await asyncio.gather(
+            *(
+                self._aexists_many_on(shard.async_database, [keys[i] for i in indexes])
+                for shard, indexes in groups
+            )
+        )
+        exists = [False] * len(keys)
+        for (_, indexes), group_exists in zip(groups, shard_exists):
+            for index, exist in zip(indexes, group_exists):
+                exists[index] = exist
+        return exists
+
+    def _write_batch(self, items: List[WriteItem]) -> List[bool]:
+        """按分片分组后并行执行pipeline"""
+        if not items:
+            return []
+        groups = list(self._group([item[0] for item in items]).items())
+        args = [
+            (shard.database, [items[i] for i in indexes]) for shard, indexes in groups
+        ]
+        results = [None] * len(items)
+        for (_, indexes), shard_results in zip(
+            groups, self._map(self._write_batch_on, args)
+        ):
+            for index, result in zip(indexes, shard_results):
+                results[index] = result
+        return results
+
+    async def aget_many(self, keys: List[str], default: Any = NoneCache) -> List[Any]:
+        """get_many 的asyncio版本"""
+        if self.async_database is None:
+            return self.get_many(keys, default)
+        if not keys:
+            return []
+        groups = list(self._group(keys).items())
+        shard_values = await asyncio.gather(
+            *(
+                shard.async_database.mget([self.make_key(keys[i]) for i in indexes])
+                for shard, indexes in groups
+            )
+        )
+        values = [None] * len(keys)
+        for (_, indexes), group_values in zip(groups, shard_values):
+            for index, value in zip(indexes, group_values):
+                values[index] = value
+        values = [await self._aunchunk(k, v) for k, v in zip(keys, values)]
+        return [self._record_get(v, default, k) for k, v in zip(keys, values)]
+
+    async def _awrite_batch(self, items: List[WriteItem]) -> List[bool]:
+        if self.async_database is None:
+            return self._write_batch(items)
+        if not items:
+            return []
+        groups = list(self._group([item[0] for item in items]).items())
+        shard_results = await asyncio.gather(
+            *(
+                self._awrite_batch_on(shard.async_database, [items[i] for i in indexes])
+                for shard, indexes in groups
+            )
+        )
+        results = [None] * len(items)
+        for (_, indexes), group_results in zip(groups, shard_results):
+            for index, result in zip(indexes, group_results):
+                results[index] = result
+        return results
+
+    async def aiter_keys(
+        self, key: str = "*", count: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """依次遍历各分片"""
+        if self.async_database is None:
+            for redis_key in self.iter_keys(key, count):
+                yield redis_key
+            return
+        for shard in list(self.shards.values()):
+            async for redis_key in self._aiter_keys_on(
+                shard.async_database, key, count
+            ):
+                yield redis_key
+
+    async def akeys(self, key: str = "*") -> List[str]:
+        """并行遍历所有分片后合并"""
+        if self.async_database is None:
+            return self.keys(key)
+
+        async def _keys(client: "aioredis.Redis") -> List[str]:
+            return [redis_key async for redis_key in self._aiter_keys_on(client, key)]
+
+        shard_keys = await asyncio.gather(
+            *(_keys(shard.async_database) for shard in list(self.shards.values()))
+        )
+        return [redis_key for keys in shard_keys for redis_key in keys]
+
+    async def adelete_all(self, key: str = "*") -> int:
+        """在所有分片上并行删除缓存"""
+        if self.async_database is None:
+            return self.delete_all(key)
+        deleted = await asyncio.gather(
+            *(
+                self._adelete_all_on(shard.async_database, key)
+                for shard in list(self.shards.values())
+            )
+        )
+        return sum(deleted)
+
+    async def ainvalidate_tags(self, *tags: str) -> int:
+        """invalidate_tags 的asyncio版本"""
+        if self.async_database is None:
+            return self.invalidate_tags(*tags)
+        deleted = await asyncio.gather(
+            *(
+                self._ainvalidate_tags_on(shard.async_database, tags)
+                for shard in list(self.shards.values())
+            )
+        )
+        return sum(deleted)
+
+    def _metric_sources(self) -> List[Tuple[CacheMetrics, Dict[str, str]]]:
+        sources = super()._metric_sources()
+        for shard in list(self.shards.values()):
+            sources.append((shard.metrics, {"cache": self.name, "shard": shard.name}))
+        return sources
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各分片连接池的使用情况"""
+        stats = {}
+        for shard in list(self.shards.values()):
+            stats[shard.name] = {"sync": pool_stats(shard.database.connection_pool)}
+            if shard.async_database is not None:
+                pool = shard.async_database.connection_pool
+                stats[shard.name]["async"] = pool_stats(pool)
+        return stats
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        snapshot = super().metrics_snapshot()
+        snapshot["shards"] = {
+            shard.name: shard.metrics.counters() for shard in list(self.shards.values())
+        }
+        return snapshot
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """写完后台写队列并关闭访问分片的线程池"""
+        closed = super().close(timeout)
+        with self._executor_guard:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        return closed
+
+
+__all__ = [ShardedRedisCache, Shard]
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 18:40
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : test_cache_metrics.py
+from concurrent.futures import ThreadPoolExecutor
+
+from lk_tool_kit.cache_utils import CacheMetrics, Histogram, render_prometheus
+
+
+def test_thread_safe_counter():
+    metrics = CacheMetrics(["hits"])
+
+    def _incr(_):
+        for _ in range(1000):
+            metrics.incr("hits")
+            metrics.observe("hit_time", 0.001)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(_incr, range(8)))
+    assert metrics["hits"] == 8000
+    assert metrics.histogram("hit_time").count == 8000
+    assert abs(metrics["avg_hit_time"] - 0.001) < 1e-9
+
+
+def test_percentile():
+    histogram = Histogram((0.01, 0.1, 1.0))
+    for _ in range(90):
+        histogram.observe(0.005)
+    for _ in range(10):
+        histogram.observe(0.5)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["p50"] <= 0.01
+    assert 0.1 < snapshot["p95"] <= 0.5
+    assert snapshot["buckets"][float("inf")] == 100
+
+
+def test_prometheus():
+    first, second = CacheMetrics(["hits"]), CacheMetrics(["hits"])
+    first.incr("hits", 2)
+    first.observe("hit_time", 0.2)
+    text = render_prometheus(
+        [(first, {"func": "a"}), (second, {"func": "b"})], prefix="test"
+    )
+    assert text.count("# TYPE test_hits_total counter") == 1
+    assert 'test_hits_total{func="a"} 2' in text
+    assert 'test_hits_total{func="b"} 0' in text
+    assert 'test_hit_time_bucket{func="a",le="0.25"} 1' in text
+    assert 'test_hit_time_bucket{func="a",le="+Inf"} 1' in text
+    assert 'test_hit_time_count{func="a"} 1' in text
@@ -16,3 +16,9 @@ class CoreTest(testutils.BaseTestCase):
             __main__.fire.Fire(
                 {"version": __main__.version}, command=["version", "--help"]
             )
+
+    def test_warm_up_help_info(self):
+        with self.assertRaisesFireExit(0, regexp="预热缓存函数"):
+            __main__.fire.Fire(
+                {"warm_up": __main__.warm_up}, command=["warm_up", "--help"]
+            )
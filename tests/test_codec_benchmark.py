@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 16:50
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : test_codec_benchmark.py
+"""
+编解码器性能对比, 序列化后大小记录在 benchmark extra_info 中
+
+pytest tests/test_codec_benchmark.py --benchmark-group-by=param:payload
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from lk_tool_kit.func_redis_cache import RedisCacheValue
+
+_PAYLOADS = {
+    "json_rows": (
+        [
+            {"id": i, "name": "user_%s" % i, "score": i * 1.5, "tags": ["a", "b"]}
+            for i in range(1000)
+        ],
+        ("pickle", "json"),
+    ),
+    "text": ("报表" * 10000, ("pickle", "raw")),
+    "ndarray": (np.random.rand(200, 500), ("pickle", "numpy")),
+    "dataframe": (
+        pd.DataFrame(
+            {
+                "ts": pd.date_range("2022-01-01", periods=50000, freq="s"),
+                "value": np.random.rand(50000),
+                "count": np.arange(50000),
+                "device": np.random.choice(["a", "b", "c"], 50000),
+            }
+        ),
+        ("pickle", "pandas"),
+    ),
+}
+
+
+@pytest.mark.parametrize(
+    "payload, codec",
+    [
+        (payload, codec)
+        for payload, (_, codecs) in _PAYLOADS.items()
+        for codec in codecs
+    ],
+)
+def test_codec_benchmark(benchmark, payload, codec):
+    value = RedisCacheValue(_PAYLOADS[payload][0])
+
+    def _roundtrip() -> RedisCacheValue:
+        data = RedisCacheValue.serialize(0, value, False, codec=codec)
+        return RedisCacheValue.deserialize(data, False)
+
+    res = benchmark(_roundtrip)
+    benchmark.extra_info["size"] = len(
+        RedisCacheValue.serialize(0, value, False, codec=codec)
+    )
+    assert type(res.value) is type(value.value)
@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 16:40
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : test_codecs.py
+import pickle
+import struct
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lk_tool_kit.func_redis_cache import RedisCacheValue
+from lk_tool_kit.mixins import (
+    Codec,
+    CompressionPolicy,
+    get_codec,
+    get_compressor,
+    register_codec,
+)
+from lk_tool_kit.mixins.serializable import Version
+
+
+def _v1_package(value, compress: bool) -> bytes:
+    """升级前(V1)写入redis的数据"""
+    mask = Version.V1.value
+    prefix = bytes(c ^ mask[i % len(mask)] for i, c in enumerate(b"version"))
+    data = pickle.dumps(RedisCacheValue(value))
+    data = zlib.compress(data) if compress else data
+    return prefix + struct.pack("d", 1.5) + data
+
+
+@pytest.mark.parametrize(
+    "codec, value",
+    [
+        ("pickle", {"a": (1, 2)}),
+        ("json", {"a": [1, "2", None, 1.5]}),
+        ("raw", "字符串"),
+        ("raw", b"\x00bytes"),
+        ("numpy", np.arange(12, dtype=np.float32).reshape(3, 4)),
+    ],
+)
+@pytest.mark.parametrize("compress", [True, False])
+def test_codec_roundtrip(codec, value, compress):
+    data = RedisCacheValue.serialize(
+        time.time(), RedisCacheValue(value), compress=compress, codec=codec, ttl=60
+    )
+    _, version, codec_id, compression = RedisCacheValue.parse_header(data)
+    assert version == Version.V3
+    assert RedisCacheValue.parse_ttl(data) == 60
+    assert codec_id == get_codec(codec).codec_id
+    assert compression in ((0, 1) if compress else (0,))  # 压缩无收益时不压缩
+    # 读取时不需要知道写入时的 compress/codec
+    res = RedisCacheValue.deserialize(data, compress=not compress).value
+    if isinstance(value, np.ndarray):
+        assert res.dtype == value.dtype
+        np.testing.assert_array_equal(res, value)
+    else:
+        assert res == value
+
+
+def test_pandas_codec():
+    df = pd.DataFrame(
+        {
+            "a": np.arange(5),
+            "b": list("abcde"),
+            "c": pd.date_range("2022-01-01", periods=5),
+        },
+        index=pd.Index(list("vwxyz"), name="idx"),
+    )
+    data = RedisCacheValue.serialize(0, RedisCacheValue(df), False, codec="pandas")
+    res = RedisCacheValue.deserialize(data, False).value
+    pd.testing.assert_frame_equal(res, df)
+
+
+@pytest.mark.parametrize("value", [{1, 2}, {1: (1, 2)}, {"a": [(1, 2)]}, [True, 1.0j]])
+def test_codec_fallback_to_pickle(value):
+    data = RedisCacheValue.serialize(0, RedisCacheValue(value), False, codec="json")
+    assert RedisCacheValue.parse_header(data)[2] == get_codec("pickle").codec_id
+    assert RedisCacheValue.deserialize(data, False).value == value
+
+
+def test_v2_compatibility():
+    """V2头部没有过期时间"""
+    mask = Version.V2.value
+    prefix = bytes(c ^ mask[i % len(mask)] for i, c in enumerate(b"version"))
+    data = prefix + struct.pack("d", 1.5) + bytes((1, 0)) + b'{"a":1}'
+    assert RedisCacheValue.parse_header(data) == (1.5, Version.V2, 1, 0)
+    assert RedisCacheValue.parse_ttl(data) is None
+    assert RedisCacheValue.deserialize(data, False).value == {"a": 1}
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_v1_compatibility(compress):
+    data = _v1_package({"a": 1}, compress)
+    assert RedisCacheValue.parse_header(data) == (1.5, Version.V1, 0, -1)
+    assert RedisCacheValue.deserialize(data, compress).value == {"a": 1}
+
+
+def test_register_codec():
+    class UpperCodec(Codec):
+        codec_id = 200
+        name = "upper"
+
+        def encode(self, value):
+            return value.upper().encode()
+
+        def decode(self, data):
+            return bytes(data).decode()
+
+    register_codec(UpperCodec())
+    data = RedisCacheValue.serialize(0, RedisCacheValue("abc"), False, codec="upper")
+    assert RedisCacheValue.deserialize(data, False).value == "ABC"
+    with pytest.raises(ValueError):
+        register_codec(type("Dup", (UpperCodec,), {"name": "dup"})())
+    with pytest.raises(ValueError):
+        get_codec("unknown")
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "bz2", "lzma"])
+def test_compression_policy(algorithm):
+    policy = CompressionPolicy(algorithm, level=1, min_size=100)
+    stats = {"raw_bytes": 0, "stored_bytes": 0, "compress_time": 0.0}
+    small = RedisCacheValue.serialize(0, RedisCacheValue("a"), policy, stats=stats)
+    assert RedisCacheValue.parse_header(small)[3] == 0
+    big = RedisCacheValue.serialize(0, RedisCacheValue("a" * 1000), policy, stats=stats)
+    assert (
+        RedisCacheValue.parse_header(big)[3] == get_compressor(algorithm).compression_id
+    )
+    assert stats["stored_bytes"] < stats["raw_bytes"]
+    # 读取时由头部决定算法
+    assert RedisCacheValue.deserialize(big, compress=False).value == "a" * 1000
+    assert RedisCacheValue.deserialize(small, compress=True).value == "a"
+
+
+def test_compression_policy_from_value():
+    assert CompressionPolicy.from_value(False) is None
+    assert CompressionPolicy.from_value(True).compressor.name == "zlib"
+    assert CompressionPolicy.from_value("bz2").compressor.name == "bz2"
+    with pytest.raises(ValueError):
+        CompressionPolicy.from_value("unknown")
@@ -4,13 +4,38 @@
 # @author  : zza
 # @Email   : 740713651@qq.com
 # @File    : test_func_redis_cache.py
+import asyncio
 import datetime
+import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import pytest
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 
 from lk_tool_kit import RedisCache
+from lk_tool_kit.cache_utils import (
+    CallArgs,
+    CircuitBreaker,
+    FrequencyAdmission,
+    MaxSize,
+    MinComputeTime,
+    RefreshAheadScheduler,
+    WriteBehindWriter,
+    load_arg_sets,
+)
+from lk_tool_kit.func_redis_cache import (
+    INTERNAL_PREFIX,
+    CacheLockTimeout,
+    NoneCache,
+    RedisCacheValue,
+    legacy_key_fn,
+)
+from lk_tool_kit.mixins import CompressionPolicy
 
 
 def _get_time_str(timestamp: int = None) -> Optional[str]:
@@ -31,6 +56,77 @@ async def async_get_time_str(timestamp: int = None) -> str:
     return _get_time_str(timestamp)
 
 
+_warm_up_cache = RedisCache.from_url("redis://127.0.0.1:6379/1")
+
+
+@_warm_up_cache.cached(timeout=60, record_hits=True)
+def _square(value: int) -> int:
+    if value < 0:
+        raise ValueError(value)
+    return value * value
+
+
+class _DelayProxy:
+    """转发到本地redis的TCP代理 每次返回响应前等待 delay 秒, 模拟慢redis"""
+
+    def __init__(self, delay: float = 0.0, upstream=("127.0.0.1", 6379)):
+        self.delay = delay
+        self.upstream = upstream
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.sockets = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.upstream)
+            self.sockets += [client, upstream]
+            threading.Thread(
+                target=self._pipe, args=(client, upstream, False), daemon=True
+            ).start()
+            threading.Thread(
+                target=self._pipe, args=(upstream, client, True), daemon=True
+            ).start()
+
+    def _pipe(self, source, target, delayed):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if delayed and self.delay:
+                    time.sleep(self.delay)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    @property
+    def url(self) -> str:
+        return "redis://127.0.0.1:%d/1" % self.port
+
+    def drop(self):
+        """断开当前全部连接 之后的新连接照常转发"""
+        sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        self.server.close()
+
+
 class TestRedisCache:
     r_cache: RedisCache
 
@@ -81,3 +177,1066 @@ class TestRedisCache:
         time.sleep(1)
         _get_time(1)
         assert _get_time.metrics["misses"] == 2
+
+    def test_local_cache(self):
+        _get_time = self.r_cache.cached(metrics=True, local_maxsize=8)(_get_time_str)
+        tmp_str = _get_time()  # miss+1
+        assert tmp_str == _get_time()  # local hit+1
+        assert _get_time.metrics["misses"] == 1
+        assert _get_time.metrics["local_hits"] == 1
+        assert _get_time.metrics["hits"] == 0
+
+        _get_time.local_cache.clear()
+        assert tmp_str == _get_time()  # redis hit+1, 回填一级缓存
+        assert _get_time.metrics["hits"] == 1
+        assert len(_get_time.local_cache) == 1
+
+        _get_time.bust()
+        assert len(_get_time.local_cache) == 0
+        _get_time(1)
+        _get_time.bust_all()
+        assert len(_get_time.local_cache) == 0
+
+    def test_local_cache_ttl_capped_by_timeout(self):
+        _get_time = self.r_cache.cached(metrics=True, timeout=1, local_ttl=60)(
+            _get_time_str
+        )
+        _get_time(1)
+        time.sleep(1)
+        _get_time(1)
+        assert _get_time.metrics["misses"] == 2
+        assert _get_time.metrics["local_hits"] == 0
+
+    def test_local_cache_maxbytes(self):
+        _get_time = self.r_cache.cached(local_maxbytes=1)(_get_time_str)
+        _get_time(1)
+        assert len(_get_time.local_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_async_database(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(metrics=True)(async_get_time_str)
+
+        def sync_get_time_str(timestamp: int = None) -> Optional[str]:
+            return _get_time_str(timestamp)
+
+        sync_get_time_str.__name__ = async_get_time_str.__name__  # 同名同步函数
+        _sync_get_time = r_cache.cached(metrics=True)(sync_get_time_str)
+        await _get_time.abust_all()
+
+        tmp_str = await _get_time()  # miss+1
+        assert tmp_str == await _get_time()  # hit+1
+        assert tmp_str == _sync_get_time()  # 同步与异步共用缓存
+        assert _get_time.metrics["misses"] == 1
+        assert _get_time.metrics["hits"] == 1
+        assert len(await _get_time.aredis_keys()) == 1
+
+        assert await _get_time.abust() == 1
+        await _get_time(1)
+        assert await _get_time.abust_all() == 1
+        await r_cache.async_database.aclose()
+
+    def test_lock(self):
+        calls = []
+
+        def _slow_get_time_str(timestamp: int = None) -> Optional[str]:
+            calls.append(timestamp)
+            time.sleep(0.3)
+            return _get_time_str(timestamp)
+
+        _get_time = self.r_cache.cached(metrics=True, lock=True, lock_timeout=2)(
+            _slow_get_time_str
+        )
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lambda _: _get_time(100), range(4)))
+        assert len(set(results)) == 1
+        assert len(calls) == 1
+        assert _get_time.metrics["misses"] == 1
+        assert _get_time.metrics["hits"] == 3
+        assert _get_time.metrics["lock_waits"] == 3
+        assert not self.r_cache.keys(INTERNAL_PREFIX + "lock:*")
+
+    def test_internal_keys(self):
+        r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1")
+
+        @r_cache.cached(timeout=60, tags=lambda value: ["all"])
+        def lock(value: int) -> int:
+            return value
+
+        r_cache.delete_all()
+        assert lock(1) == 1
+        token = r_cache.acquire_lock(lock.make_key(2), 10)
+        assert r_cache.keys() == [r_cache.make_key(lock.make_key(1))]
+        assert lock.bust_all() == 1
+        assert len(r_cache.keys(INTERNAL_PREFIX + "*")) == 2
+        assert r_cache.release_lock(lock.make_key(2), token)
+
+    def test_lock_fallback(self):
+        _get_time = self.r_cache.cached(
+            metrics=True, lock=True, lock_wait=0.1, lock_fallback="raise"
+        )(_get_time_str)
+        key = _get_time.make_key(100)
+        token = self.r_cache.acquire_lock(key, 1)
+        with pytest.raises(CacheLockTimeout):
+            _get_time(100)
+        assert not self.r_cache.release_lock(key, "other token")
+        assert self.r_cache.release_lock(key, token)
+        assert _get_time(100) == _get_time_str(100)
+        assert _get_time.metrics["lock_timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_async_lock(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(metrics=True, lock=True)(async_get_time_str)
+        results = await asyncio.gather(*(_get_time(100) for _ in range(4)))
+        assert len(set(results)) == 1
+        assert _get_time.metrics["misses"] == 1
+        await r_cache.async_database.aclose()
+
+    def test_stale_while_revalidate(self):
+        _get_time = self.r_cache.cached(metrics=True, timeout=1, stale_ttl=10)(
+            _get_time_str
+        )
+        tmp_str = _get_time()
+        assert (
+            self.r_cache.database.ttl(self.r_cache.make_key(_get_time.make_key())) > 1
+        )
+        time.sleep(1.1)
+        assert tmp_str == _get_time()  # 返回旧值 后台刷新
+        time.sleep(0.2)
+        assert tmp_str != _get_time()
+        assert _get_time.metrics["stale_hits"] == 1
+        assert _get_time.metrics["refreshes"] == 1
+
+    def test_early_refresh(self):
+        _get_time = self.r_cache.cached(metrics=True, timeout=1, early_refresh=True)(
+            _get_time_str
+        )
+        _get_time()
+        _get_time._compute_time = 1e9  # 计算耗时远大于剩余过期时间, 必然提前刷新
+        _get_time()
+        time.sleep(0.2)
+        assert _get_time.metrics["early_refreshes"] == 1
+        assert _get_time.metrics["refreshes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_async_stale_while_revalidate(self):
+        _get_time = self.r_cache.cached(metrics=True, timeout=1, stale_ttl=10)(
+            async_get_time_str
+        )
+        tmp_str = await _get_time()
+        await asyncio.sleep(1.1)
+        assert tmp_str == await _get_time()
+        await asyncio.sleep(0.2)
+        assert tmp_str != await _get_time()
+        assert _get_time.metrics["refreshes"] == 1
+
+    def test_scan_keys(self):
+        r_cache = RedisCache.from_url(
+            "redis://127.0.0.1:6379/1", scan_count=2, delete_batch_size=3
+        )
+        _get_time = r_cache.cached()(_get_time_str)
+        for timestamp in range(100, 110):
+            _get_time(timestamp)
+        assert len(_get_time.redis_keys()) == 10
+        assert sorted(_get_time.iter_redis_keys()) == sorted(_get_time.redis_keys())
+        assert _get_time.bust_all() == 10
+        assert r_cache.keys() == []
+
+    @pytest.mark.asyncio
+    async def test_async_scan_keys(self):
+        r_cache = RedisCache.from_url_async(
+            "redis://127.0.0.1:6379/1", delete_batch_size=3
+        )
+        _get_time = r_cache.cached()(async_get_time_str)
+        for timestamp in range(100, 110):
+            await _get_time(timestamp)
+        assert len(await _get_time.aredis_keys()) == 10
+        assert await _get_time.abust_all() == 10
+        await r_cache.async_database.aclose()
+
+    def test_many(self):
+        _get_time = self.r_cache.cached(metrics=True)(_get_time_str)
+        _get_time(100)
+        results = _get_time.many([100, (101,), {"timestamp": 102}, 101], max_workers=2)
+        assert results == [_get_time_str(ts) for ts in (100, 101, 102, 101)]
+        assert _get_time.metrics["hits"] == 1
+        assert _get_time.metrics["misses"] == 4  # 100 + 101*2 + 102
+        assert len(_get_time.redis_keys()) == 3
+        assert _get_time.many([101, {"timestamp": 102}]) == [
+            _get_time_str(101),
+            _get_time_str(102),
+        ]
+        assert _get_time.metrics["hits"] == 3
+
+    def test_get_set_many(self):
+        assert self.r_cache.set_many([("a", b"1"), ("b", b"2")], timeout=10) == [
+            True,
+            True,
+        ]
+        assert self.r_cache.get_many(["a", "c", "b"], default=None) == [
+            b"1",
+            None,
+            b"2",
+        ]
+        assert self.r_cache.get_many([]) == []
+
+    @pytest.mark.asyncio
+    async def test_async_many(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(metrics=True)(async_get_time_str)
+        await _get_time(100)
+        results = await _get_time.many([100, 101, 102], max_workers=1)
+        assert results == [_get_time_str(ts) for ts in (100, 101, 102)]
+        assert _get_time.metrics["hits"] == 1
+        assert _get_time.metrics["misses"] == 3
+        await r_cache.async_database.aclose()
+
+    def test_write_behind(self):
+        r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(metrics=True, write_behind=True)(_get_time_str)
+        tmp_str = _get_time(100)
+        _get_time.many([101, 102])
+        assert r_cache.flush(timeout=5)
+        assert tmp_str == _get_time(100)
+        assert _get_time.metrics["hits"] == 1
+        assert len(_get_time.redis_keys()) == 3
+        assert r_cache.write_behind_metrics["queued"] == 3
+        assert r_cache.write_behind_metrics["written"] == 3
+        assert r_cache.close(timeout=5)
+        assert not r_cache.enqueue_response("closed", b"1")
+        assert r_cache.write_behind_metrics["dropped"] == 1
+
+    def test_write_behind_backpressure(self):
+        r_cache = RedisCache.from_url(
+            "redis://127.0.0.1:6379/1", write_behind_maxsize=1
+        )
+        results = [r_cache.enqueue_response(str(i), b"1") for i in range(100)]
+        assert not all(results)
+        r_cache.close(timeout=5)
+        metrics = r_cache.write_behind_metrics
+        assert metrics["queued"] + metrics["dropped"] == 100
+        assert metrics["written"] == metrics["queued"]
+
+    def test_write_behind_close_timeout(self):
+        release = threading.Event()
+        writer = WriteBehindWriter(lambda batch: release.wait(5), maxsize=1)
+        writer.put("1", b"1")
+        time.sleep(0.05)  # 后台线程阻塞在写入
+        writer.put("2", b"2")  # 队列已满
+        start = time.time()
+        # 写入超时且队列已满时不阻塞在放入结束标记
+        assert not writer.close(timeout=0.2)
+        assert time.time() - start < 1
+        release.set()
+        writer._thread.join(1)
+        assert not writer._thread.is_alive()
+
+    @pytest.mark.asyncio
+    async def test_async_write_behind(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(metrics=True, write_behind=True)(async_get_time_str)
+        tmp_str = await _get_time(100)
+        await r_cache.aflush()
+        assert tmp_str == await _get_time(100)
+        assert r_cache.write_behind_metrics["written"] == 1
+        await r_cache.aclose()
+        await r_cache.async_database.aclose()
+
+    def test_signature_key(self):
+        _get_time = self.r_cache.cached(metrics=True)(_get_time_str)
+        _get_time(100)
+        _get_time(timestamp=100)
+        _get_time.many([100, {"timestamp": 100}])
+        assert _get_time.metrics["misses"] == 1
+        assert _get_time.metrics["hits"] == 3
+        assert _get_time.bust(timestamp=100) == 1
+
+        _get_time_legacy = self.r_cache.cached(metrics=True, key_fn=legacy_key_fn)(
+            _get_time_str
+        )
+        _get_time_legacy(100)
+        _get_time_legacy(timestamp=100)
+        assert _get_time_legacy.metrics["misses"] == 2
+
+    def test_codec(self):
+        _get_time = self.r_cache.cached(metrics=True, codec="json")(_get_time_str)
+        tmp_str = _get_time(100)
+        assert tmp_str == _get_time(100)
+        bytes_data = self.r_cache.get(_get_time.make_key(100))
+        assert RedisCacheValue.parse_header(bytes_data)[2] == 1
+
+        # 相同函数名改用其他codec后仍可读取已有缓存
+        _get_time_raw = self.r_cache.cached(metrics=True, codec="raw")(_get_time_str)
+        assert tmp_str == _get_time_raw(100)
+        assert _get_time_raw.metrics["hits"] == 1
+
+        # JSON往返会改变类型的值退回pickle, 命中与未命中返回相同的值
+        @self.r_cache.cached(codec="json")
+        def _pairs(value: int) -> dict:
+            return {value: (value, value + 1)}
+
+        _pairs.bust_all()
+        assert _pairs(1) == _pairs(1) == {1: (1, 2)}
+
+    def test_compression_policy(self):
+        policy = CompressionPolicy("bz2", min_size=10)
+        _get_time = self.r_cache.cached(metrics=True, compress=policy)(_get_time_str)
+        tmp_str = _get_time(100)
+        assert _get_time.compression_stats["raw_bytes"] > 0
+        assert _get_time.compression_stats["compress_time"] > 0
+        _get_time_zlib = self.r_cache.cached(metrics=True, compress=True)(_get_time_str)
+        assert tmp_str == _get_time_zlib(100)
+        assert _get_time_zlib.metrics["hits"] == 1
+
+    def test_metrics_export(self):
+        _get_time = self.r_cache.cached(metrics=True)(_get_time_str)
+        _get_time(100)
+        _get_time(100)
+        for name in ("redis_get", "compute", "serialize", "redis_set"):
+            assert _get_time.metrics.histogram(name).count >= 1
+        assert _get_time.metrics.histogram("deserialize").count == 1
+        assert _get_time.metrics.histogram("hit_time").count == 1
+        assert _get_time.metrics["avg_miss_time"] > 0
+
+        snapshot = self.r_cache.metrics_snapshot()
+        func_snapshot = snapshot["functions"][_get_time_str.__qualname__]
+        assert func_snapshot["counters"]["hits"] == 1
+        assert func_snapshot["histograms"]["hit_time"]["p99"] > 0
+        text = self.r_cache.to_prometheus()
+        assert 'func="%s"' % _get_time_str.__qualname__ in text
+        assert "# TYPE lk_cache_redis_get histogram" in text
+
+    def test_invalidation(self):
+        def _wait(condition, timeout=3):
+            deadline = time.time() + timeout
+            while not condition() and time.time() < deadline:
+                time.sleep(0.01)
+            return condition()
+
+        worker_a = RedisCache.from_url("redis://127.0.0.1:6379/1", invalidation=True)
+        worker_b = RedisCache.from_url("redis://127.0.0.1:6379/1", invalidation=True)
+        cached_a = worker_a.cached(local_maxsize=10, metrics=True)(_get_time_str)
+        cached_b = worker_b.cached(local_maxsize=10, metrics=True)(_get_time_str)
+        assert _wait(lambda: worker_a.invalidation.connected)
+        assert _wait(lambda: worker_b.invalidation.connected)
+        time.sleep(0.1)
+
+        value = cached_a(100)
+        assert cached_a(100) == value
+        assert cached_a.metrics["local_hits"] == 1
+        key = cached_a.make_key(100)
+        assert key in cached_a.local_cache
+
+        # 其他进程删除缓存后 本进程一级缓存随之失效
+        cached_b.bust(100)
+        assert _wait(lambda: key not in cached_a.local_cache)
+        assert cached_a(100) == value
+        assert cached_a.metrics["misses"] == 2
+
+        cached_a(200)
+        cached_b.bust_all()
+        assert _wait(lambda: len(cached_a.local_cache) == 0)
+        assert worker_a.invalidation.metrics["received"] >= 2
+        worker_a.close(1)
+        worker_b.close(1)
+
+    def test_invalidation_fallback_ttl(self):
+        r_cache = RedisCache(
+            redis.Redis(port=1, retry=Retry(NoBackoff(), 0)),
+            invalidation=True,
+            invalidation_fallback_ttl=0.05,
+        )
+        r_cache.invalidation.reconnect_delay = 0.01
+        r_cache.cached(local_ttl=60)(_get_time_str)
+        assert not r_cache.invalidation.connected
+        assert r_cache.local_fallback_ttl() == 0.05
+        time.sleep(0.2)
+        assert r_cache.invalidation.metrics["reconnects"] >= 1
+        r_cache.close(1)
+
+    def test_invalidation_disconnect(self):
+        def _wait(condition, timeout=3):
+            deadline = time.time() + timeout
+            while not condition() and time.time() < deadline:
+                time.sleep(0.01)
+            return condition()
+
+        proxy = _DelayProxy()
+        r_cache = RedisCache.from_url(proxy.url, invalidation=True)
+        r_cache.invalidation.reconnect_delay = 0.5
+        cached = r_cache.cached(local_maxsize=10)(_get_time_str)
+        assert _wait(lambda: r_cache.invalidation.connected)
+        cached(100)
+        key = cached.make_key(100)
+        assert key in cached.local_cache
+
+        # 订阅断开时清空一级缓存 断开前的条目收不到之后的失效消息
+        proxy.drop()
+        assert _wait(lambda: not r_cache.invalidation.connected)
+        assert key not in cached.local_cache
+        cached(100)
+        assert key in cached.local_cache
+        # 重新订阅后再次清空 断线期间的条目可能错过了失效消息
+        assert _wait(lambda: r_cache.invalidation.connected)
+        assert key not in cached.local_cache
+        assert r_cache.invalidation.metrics["reconnects"] == 1
+        r_cache.close(1)
+        proxy.close()
+
+    def test_tags(self):
+        def _tags(timestamp: int = None):
+            return ["even" if timestamp % 2 == 0 else "odd", "all"]
+
+        _get_time = self.r_cache.cached(metrics=True, timeout=60, tags=_tags)(
+            _get_time_str
+        )
+        _get_time_wb = self.r_cache.cached(
+            metrics=True, timeout=30, tags=_tags, write_behind=True
+        )(_get_time_str)
+        _get_time(1)
+        _get_time(2)
+        _get_time.many([3, 4, 5])
+        tag_key = self.r_cache.make_tag_key("even")
+        assert self.r_cache.database.zcard(tag_key) == 2
+        assert 55 < self.r_cache.database.ttl(tag_key) <= 60
+        # 过期时间更短的成员不会缩短标签索引的过期时间
+        _get_time_wb(6)
+        self.r_cache.flush()
+        assert self.r_cache.database.zcard(tag_key) == 3
+        assert self.r_cache.database.ttl(tag_key) > 30
+
+        assert self.r_cache.invalidate_tags("odd") == 3
+        assert sorted(_get_time.redis_keys()) == sorted(
+            self.r_cache.make_key(_get_time.make_key(i)) for i in (2, 4, 6)
+        )
+        assert self.r_cache.invalidate_tags("odd") == 0
+        assert self.r_cache.invalidate_tags("all", "even") == 3
+        assert _get_time.redis_keys() == []
+        assert not self.r_cache.database.exists(tag_key)
+
+    def test_tags_prune(self):
+        _get_time = self.r_cache.cached(timeout=1, tags=lambda timestamp: ["prune"])(
+            _get_time_str
+        )
+        _get_time_forever = self.r_cache.cached(tags=lambda timestamp: ["prune"])(
+            _get_time_str
+        )
+        tag_key = self.r_cache.make_tag_key("prune")
+        _get_time.bust_all()
+        _get_time_forever.bust_all()
+        self.r_cache.database.delete(tag_key)
+        _get_time.many([1, 2, 3])
+        assert self.r_cache.database.zcard(tag_key) == 3
+        assert 0 < self.r_cache.database.pttl(tag_key) <= 1000
+        time.sleep(1.1)
+        # 写入时清理已过期的成员
+        _get_time_forever(4)
+        assert self.r_cache.database.zcard(tag_key) == 1
+        assert self.r_cache.database.ttl(tag_key) == -1
+        assert self.r_cache.invalidate_tags("prune") == 1
+        assert _get_time_forever.redis_keys() == []
+
+    @pytest.mark.asyncio
+    async def test_async_tags(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(
+            metrics=True, local_maxsize=10, tags=lambda timestamp: ["t%s" % timestamp]
+        )(async_get_time_str)
+        await _get_time(100)
+        await _get_time.many([200, 300])
+        assert await _get_time(100)
+        assert _get_time.metrics["local_hits"] == 1
+        assert await r_cache.ainvalidate_tags("t100", "t200") == 2
+        assert _get_time.make_key(100) not in _get_time.local_cache
+        assert len(await _get_time.aredis_keys()) == 1
+        await r_cache.async_database.aclose()
+
+    def test_generation(self):
+        _get_time = self.r_cache.cached(
+            metrics=True, timeout=60, generation=True, generation_interval=60
+        )(_get_time_str)
+        _get_time(1)
+        _get_time(2)
+        old_key = _get_time.make_key(1)
+        assert old_key.startswith("_get_time_str:g0.0:")
+        assert _get_time.bust_all() == 0
+        assert _get_time.make_key(1) == old_key.replace("g0.0", "g0.1")
+        # 旧缓存不再被读取, 随过期时间淘汰
+        _get_time(1)
+        assert _get_time.metrics["misses"] == 3
+        assert len(_get_time.redis_keys()) == 3
+
+        # 其他进程递增版本号后 generation_interval 内仍使用本地版本号
+        self.r_cache.database.hincrby(self.r_cache.make_generation_key(), "*", 1)
+        assert _get_time.make_key(1) == old_key.replace("g0.0", "g0.1")
+        _get_time.expire_generation()
+        assert _get_time.make_key(1) == old_key.replace("g0.0", "g1.1")
+        self.r_cache.bump_generation()
+        assert _get_time.make_key(1) == old_key.replace("g0.0", "g2.1")
+
+    @pytest.mark.asyncio
+    async def test_async_generation(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(metrics=True, timeout=60, generation=True)(
+            async_get_time_str
+        )
+        await _get_time(100)
+        assert await _get_time(100)
+        assert _get_time.metrics["hits"] == 1
+        assert await _get_time.abust_all() == 0
+        await _get_time(100)
+        await _get_time.many([100, 200])
+        assert _get_time.metrics["misses"] == 3
+        assert len(await _get_time.aredis_keys()) == 3
+        await r_cache.async_database.aclose()
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_chunked(self, compress):
+        r_cache = RedisCache.from_url(
+            "redis://127.0.0.1:6379/1", chunk_threshold=4096, chunk_size=1024
+        )
+        calls = []
+
+        @r_cache.cached(timeout=60, compress=compress)
+        def _big(size: int) -> bytes:
+            calls.append(size)
+            return bytes(range(256)) * size
+
+        assert _big(20) == _big(20)
+        assert _big.many([20, 1]) == [_big(20), _big(1)]
+        assert calls == [20, 1]
+        chunk_keys = r_cache.keys(INTERNAL_PREFIX + "chunk:*")
+        if compress:
+            # 压缩后不超过阈值 不分块
+            assert chunk_keys == []
+            return
+        assert len(chunk_keys) == 6
+        assert all(55 < r_cache.database.ttl(key) <= 60 for key in chunk_keys)
+        assert r_cache.metrics["chunk_errors"] == 0
+
+        # 块缺失时视为未命中 重新计算
+        r_cache.database.delete(chunk_keys[0])
+        assert _big(20) == bytes(range(256)) * 20
+        assert calls == [20, 1, 20]
+        assert r_cache.metrics["chunk_errors"] == 1
+        # 覆盖写入时删除旧清单的各块, 删除时同时删除当前清单的各块
+        assert len(r_cache.keys(INTERNAL_PREFIX + "chunk:*")) == 6
+        assert _big.bust(20) == 1
+        assert r_cache.keys(INTERNAL_PREFIX + "chunk:*") == []
+        _big(20)
+        assert _big.bust_all() == 2
+        assert r_cache.keys(INTERNAL_PREFIX + "chunk:*") == []
+
+    def test_chunked_cleanup(self):
+        r_cache = RedisCache.from_url(
+            "redis://127.0.0.1:6379/1", chunk_threshold=4096, chunk_size=1024
+        )
+        r_cache.delete_all()
+        r_cache.set_many([("big", b"x" * 10000, ("t",))])
+        r_cache.set_many([("big", b"y" * 5000)])
+        chunk_keys = r_cache.keys(INTERNAL_PREFIX + "chunk:*")
+        assert len(chunk_keys) == 5
+        assert all(r_cache.database.ttl(key) == -1 for key in chunk_keys)
+        r_cache.set_many([("big", b"small")])
+        assert r_cache.keys(INTERNAL_PREFIX + "chunk:*") == []
+        r_cache.set_many([("big", b"z" * 10000, ("t",))])
+        assert r_cache.invalidate_tags("t") == 1
+        assert r_cache.keys("*") == []
+        assert r_cache.keys(INTERNAL_PREFIX + "chunk:*") == []
+        # 单条写入 小值覆盖分块值时同样删除旧块
+        assert r_cache.set_response("big", b"x" * 10000)
+        assert len(r_cache.keys(INTERNAL_PREFIX + "chunk:*")) == 10
+        assert r_cache.set_response("big", b"small")
+        assert r_cache.keys(INTERNAL_PREFIX + "chunk:*") == []
+        assert bytes(r_cache.get("big")) == b"small"
+
+    def test_script_cache_flush(self):
+        # 服务端脚本缓存为空(重启/切换)时 各脚本先加载再执行
+        r_cache = RedisCache.from_url(
+            "redis://127.0.0.1:6379/1", chunk_threshold=4096, chunk_size=1024
+        )
+        r_cache.delete_all()
+        r_cache.database.script_flush()
+        assert r_cache.set_many([("big", b"x" * 10000, ("t",))]) == [True]
+        r_cache.database.script_flush()
+        assert r_cache.delete("big") == 1
+        r_cache.set_many([("big", b"x" * 10000, ("t",))])
+        r_cache.database.script_flush()
+        assert r_cache.invalidate_tags("t") == 1
+        token = r_cache.acquire_lock("k", 10)
+        r_cache.database.script_flush()
+        assert r_cache.release_lock("k", token)
+        assert r_cache.keys(INTERNAL_PREFIX + "*") == []
+
+    @pytest.mark.asyncio
+    async def test_async_script_cache_flush(self):
+        r_cache = RedisCache.from_url_async(
+            "redis://127.0.0.1:6379/1", chunk_threshold=4096, chunk_size=1024
+        )
+        await r_cache.adelete_all()
+        await r_cache.async_database.script_flush()
+        assert await r_cache.aset_many([("big", b"x" * 10000, ("t",))]) == [True]
+        await r_cache.async_database.script_flush()
+        assert await r_cache.adelete("big") == 1
+        await r_cache.aset_many([("big", b"x" * 10000, ("t",))])
+        await r_cache.async_database.script_flush()
+        assert await r_cache.ainvalidate_tags("t") == 1
+        token = await r_cache.aacquire_lock("k", 10)
+        await r_cache.async_database.script_flush()
+        assert await r_cache.arelease_lock("k", token)
+        assert await r_cache.akeys(INTERNAL_PREFIX + "*") == []
+        await r_cache.async_database.aclose()
+
+    @pytest.mark.asyncio
+    async def test_async_chunked(self):
+        r_cache = RedisCache.from_url_async(
+            "redis://127.0.0.1:6379/1", chunk_threshold=4096, chunk_size=1024
+        )
+        value = "x" * 10000
+        await r_cache.aset_response("big", value.encode(), 60)
+        assert bytes(await r_cache.aget("big")) == value.encode()
+        assert len(await r_cache.akeys(INTERNAL_PREFIX + "chunk:*")) == 10
+        assert (await r_cache.aget_many(["big", "none"]))[1] is NoneCache
+        assert await r_cache.adelete("big") == 1
+        assert await r_cache.akeys(INTERNAL_PREFIX + "chunk:*") == []
+        await r_cache.aset_many([("big", value.encode(), ("t",))], 60)
+        assert await r_cache.ainvalidate_tags("t") == 1
+        await r_cache.aset_many([("big", value.encode())], 60)
+        assert await r_cache.adelete_all("bi*") == 1
+        assert await r_cache.akeys(INTERNAL_PREFIX + "chunk:*") == []
+        await r_cache.aset_response("big", value.encode(), 60)
+        assert len(await r_cache.akeys(INTERNAL_PREFIX + "chunk:*")) == 10
+        assert await r_cache.aset_response("big", b"small", 60)
+        assert await r_cache.akeys(INTERNAL_PREFIX + "chunk:*") == []
+        assert bytes(await r_cache.aget("big")) == b"small"
+        await r_cache.async_database.aclose()
+
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_warm_up(self, executor):
+        _square(1)
+        progress = []
+        report = _square.warm_up(
+            [1, 2, 2, 3, -1],
+            concurrency=2,
+            executor=executor,
+            batch_size=2,
+            progress=progress.append,
+        )
+        # 已存在的1与重复的2被跳过, -1 计算失败
+        assert (report.total, report.skipped, report.computed, report.failed) == (
+            5,
+            2,
+            2,
+            1,
+        )
+        assert report.errors == [("-1", "ValueError(-1)")]
+        assert len(progress) == 3
+        assert len(_square.redis_keys()) == 3
+
+    def test_record_hits(self, tmp_path):
+        _square(4)
+        _square(4)
+        _square.many([4, 5])
+        assert list(_square.recorded_arg_sets()) == [CallArgs((4,), {})]
+
+        _square.bust_all()
+        report = _square.warm_up(_square.recorded_arg_sets(), progress=None)
+        assert report.computed == 1
+        assert _square.redis_keys() == [_warm_up_cache.make_key(_square.make_key(4))]
+
+        arg_file = tmp_path / "args.jsonl"
+        arg_file.write_text(
+            '[6]\n{"value": 7}\n\n8\n{"args": [9], "kwargs": {}}\n# comment\n'
+        )
+        report = _square.warm_up(load_arg_sets(str(arg_file)), progress=None)
+        assert (report.total, report.computed) == (4, 4)
+
+    @pytest.mark.asyncio
+    async def test_async_warm_up(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(timeout=60)(async_get_time_str)
+        await _get_time(100)
+        report = await _get_time.awarm_up([100, 200, 200, 300], progress=None)
+        assert (report.total, report.skipped, report.computed) == (4, 2, 2)
+        assert len(await _get_time.aredis_keys()) == 3
+        with pytest.raises(ValueError):
+            _get_time.warm_up([1], executor="thread")
+        await r_cache.async_database.aclose()
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        r_cache = RedisCache(
+            redis.Redis(port=1, retry=Retry(NoBackoff(), 0)), circuit_breaker=breaker
+        )
+        _square_cached = r_cache.cached(metrics=True, timeout=60)(_square.func)
+        assert [_square_cached(3) for _ in range(3)] == [9, 9, 9]
+        assert _square_cached.many([1, 2]) == [1, 4]
+        assert _square_cached.metrics["bypasses"] == 5
+        assert breaker.state == "open"
+        assert breaker.metrics["failures"] == 2
+        assert breaker.metrics["rejected"] == 2
+        snapshot = r_cache.metrics_snapshot()["circuit_breaker"]
+        assert snapshot["opened"] == 1 and snapshot["state"] == "open"
+        assert 'component="circuit_breaker"' in r_cache.to_prometheus()
+
+    def test_call_budget(self):
+        proxy = _DelayProxy(delay=0.1)
+        r_cache = RedisCache.from_url(
+            proxy.url,
+            circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=0.05),
+            call_budget=0.05,
+        )
+        connection_kwargs = r_cache.database.connection_pool.connection_kwargs
+        assert connection_kwargs.get("socket_timeout") is None
+        _get_time = r_cache.cached(metrics=True, timeout=60)(_get_time_str)
+        _get_time.bust_all()
+        assert _get_time(100) == _get_time(100)
+        assert r_cache.breaker.state == "open"
+        assert r_cache.breaker.metrics["slow_calls"] == 2
+        assert _get_time.metrics["bypasses"] == 1
+        proxy.delay = 0
+        time.sleep(0.1)
+        assert _get_time(100)
+        assert r_cache.breaker.state == "closed"
+        assert r_cache.breaker.metrics["half_opened"] == 1
+        proxy.close()
+
+    def test_circuit_breaker_probe_error(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        r_cache = RedisCache.from_url(
+            "redis://127.0.0.1:6379/1", circuit_breaker=breaker
+        )
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        def _raise(error):
+            raise error
+
+        with pytest.raises(redis.ResponseError):
+            r_cache.guard(_raise, redis.ResponseError("WRONGTYPE"))
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        with pytest.raises(KeyboardInterrupt):
+            r_cache.guard(_raise, KeyboardInterrupt())
+        assert breaker.state == "half_open"
+        assert r_cache.guard(r_cache.database.ping)
+        assert breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_async_circuit_breaker(self):
+        r_cache = RedisCache.from_url_async(
+            "redis://127.0.0.1:1/1", circuit_breaker=True, call_budget=0.5
+        )
+        _get_time = r_cache.cached(metrics=True, timeout=60)(async_get_time_str)
+        assert await _get_time(100)
+        assert await _get_time.many([100, 200]) == [
+            await async_get_time_str(100),
+            await async_get_time_str(200),
+        ]
+        assert _get_time.metrics["bypasses"] == 3
+        assert r_cache.breaker.metrics["failures"] == 2
+
+    @pytest.mark.asyncio
+    async def test_async_call_budget(self):
+        proxy = _DelayProxy(delay=0.2)
+        r_cache = RedisCache.from_url_async(
+            proxy.url,
+            circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=0.05),
+            call_budget=0.05,
+        )
+        _get_time = r_cache.cached(metrics=True, timeout=60)(async_get_time_str)
+        assert await _get_time(100) == await _get_time(100)
+        assert r_cache.breaker.state == "open"
+        assert r_cache.breaker.metrics["failures"] == 2
+        assert _get_time.metrics["bypasses"] == 2
+        proxy.delay = 0
+        await asyncio.sleep(0.1)
+        assert await _get_time(100)
+        assert r_cache.breaker.state == "closed"
+        await r_cache.async_database.aclose()
+        proxy.close()
+
+    def test_coalesce(self):
+        r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1")
+        calls = []
+
+        @r_cache.cached(metrics=True, timeout=60, coalesce=True)
+        def _slow(value: int) -> int:
+            calls.append(value)
+            time.sleep(0.2)
+            if value < 0:
+                raise ValueError(value)
+            return value * 2
+
+        _slow.bust_all()
+        with ThreadPoolExecutor(8) as executor:
+            assert list(executor.map(_slow, [1] * 8)) == [2] * 8
+            errors = [executor.submit(_slow, -1) for _ in range(4)]
+            for future in errors:
+                with pytest.raises(ValueError):
+                    future.result()
+        assert calls == [1, -1]
+        assert _slow.metrics["coalesced"] == 10
+        assert _slow.metrics["misses"] == 1
+        assert not _slow._inflight
+
+    @pytest.mark.asyncio
+    async def test_async_coalesce(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        calls = []
+
+        @r_cache.cached(metrics=True, timeout=60, coalesce=True)
+        async def _slow(value: int) -> int:
+            calls.append(value)
+            await asyncio.sleep(0.1)
+            if value < 0:
+                raise ValueError(value)
+            return value * 2
+
+        await _slow.abust_all()
+        assert await asyncio.gather(*(_slow(1) for _ in range(5))) == [2] * 5
+        results = await asyncio.gather(
+            *(_slow(-1) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        assert calls == [1, -1]
+        assert _slow.metrics["coalesced"] == 6
+        assert not _slow._inflight
+        await r_cache.async_database.aclose()
+
+    @pytest.mark.asyncio
+    async def test_async_coalesce_leader_cancelled(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        calls = []
+
+        @r_cache.cached(metrics=True, timeout=60, coalesce=True)
+        async def _slow(value: int) -> int:
+            calls.append(value)
+            await asyncio.sleep(0.2)
+            return value * 2
+
+        await _slow.abust_all()
+        leader = asyncio.ensure_future(_slow(1))
+        await asyncio.sleep(0.05)
+        waiters = [asyncio.ensure_future(_slow(1)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        assert await asyncio.gather(*waiters) == [2] * 3
+        assert leader.cancelled()
+        assert calls == [1, 1]
+        assert _slow.metrics["coalesced"] == 3
+        assert not _slow._inflight
+        await r_cache.async_database.aclose()
+
+    @pytest.mark.asyncio
+    async def test_async_batch(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        calls, loads = [], []
+
+        @r_cache.cached(metrics=True, timeout=60, batch=True)
+        async def _double(value: int) -> int:
+            calls.append(value)
+            if value < 0:
+                raise ValueError(value)
+            return value * 2
+
+        await _double.abust_all()
+        assert (
+            await asyncio.gather(*(_double(i % 3) for i in range(6)))
+            == [
+                0,
+                2,
+                4,
+            ]
+            * 2
+        )
+        assert sorted(calls) == [0, 1, 2]
+        assert _double.metrics["batches"] == 1
+        results = await asyncio.gather(
+            _double(5), _double(-1), _double(-1), return_exceptions=True
+        )
+        assert results[0] == 10 and isinstance(results[1], ValueError)
+        assert results[2] is results[1]
+        # 失败的参数集不会导致同批次中成功的参数集重新计算
+        assert sorted(calls) == [-1, 0, 1, 2, 5]
+        assert await _double(5) == 10
+        assert calls.count(5) == 1
+
+        async def _load_triples(arg_sets):
+            loads.append([call_args.args[0] for call_args in arg_sets])
+            return [call_args.args[0] * 3 for call_args in arg_sets]
+
+        @r_cache.cached(timeout=60, batch=0.01, batch_loader=_load_triples)
+        async def _triple(value: int) -> int:
+            raise AssertionError("batch_loader should be used")
+
+        await _triple.abust_all()
+        assert await asyncio.gather(_triple(1), _triple(2), _triple(1)) == [3, 6, 3]
+        assert await _triple.many([2, 3]) == [6, 9]
+        assert loads == [[1, 2], [3]]
+        with pytest.raises(ValueError):
+            r_cache.cached(batch=True)(_square.func)
+        await r_cache.async_database.aclose()
+
+    def test_admission(self):
+        r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1")
+
+        @r_cache.cached(
+            metrics=True, timeout=60, admission=[MaxSize(1024), MinComputeTime(0.01)]
+        )
+        def _payload(size: int, delay: float) -> bytes:
+            time.sleep(delay)
+            return b"x" * size
+
+        _payload.bust_all()
+        _payload(10, 0)  # 计算太快
+        _payload(4096, 0.02)  # 太大
+        _payload(10, 0.02)
+        assert len(_payload.redis_keys()) == 1
+        assert _payload.metrics["admission_rejects"] == 2
+
+        @r_cache.cached(metrics=True, timeout=60, admission=FrequencyAdmission())
+        def _once(value: int) -> int:
+            return value
+
+        _once.bust_all()
+        assert _once.many([1, 2]) == [1, 2]
+        assert _once.redis_keys() == []
+        assert [_once(1), _once(3)] == [1, 3]
+        assert len(_once.redis_keys()) == 1
+        assert _once.metrics["admission_rejects"] == 3
+
+    @pytest.mark.asyncio
+    async def test_async_admission(self):
+        r_cache = RedisCache.from_url_async("redis://127.0.0.1:6379/1")
+        _get_time = r_cache.cached(
+            metrics=True, timeout=60, admission=FrequencyAdmission(min_count=2)
+        )(async_get_time_str)
+        await _get_time.abust_all()
+        await _get_time(100)
+        await _get_time.many([100, 200])
+        assert len(await _get_time.aredis_keys()) == 1
+        assert _get_time.metrics["admission_rejects"] == 2
+        await r_cache.async_database.aclose()
+
+    def test_ttl_jitter(self):
+        r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1", ttl_jitter=0.5)
+        _get_time = r_cache.cached(metrics=True, timeout=1000)(_get_time_str)
+        _get_time.bust_all()
+        _get_time.many(range(100, 150))
+        redis_keys = _get_time.redis_keys()
+        ttls = [RedisCacheValue.parse_ttl(r_cache.database.get(k)) for k in redis_keys]
+        assert len(ttls) == 50
+        assert all(500 <= ttl <= 1000 for ttl in ttls)
+        assert len(set(ttls)) > 10
+        # redis中的剩余时间读取时已流逝一部分, TTL向下取整后可能比写入值少1秒
+        for key, ttl in zip(redis_keys, ttls):
+            assert ttl - 1 <= r_cache.database.ttl(key) <= ttl
+        histogram = _get_time.metrics.histogram("ttl")
+        assert histogram.count == 50 and histogram.max <= 1000
+        with pytest.raises(ValueError):
+            r_cache.cached(ttl_jitter=1)(_get_time_str)
+
+    def test_ttl_fn(self):
+        r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1")
+        seen = []
+
+        def _ttl(value, compute_time):
+            seen.append((value, compute_time >= 0))
+            return None if value is None else 300
+
+        _get_time = r_cache.cached(timeout=60, ttl_fn=_ttl, stale_ttl=10)(_get_time_str)
+        _get_time.bust_all()
+        _get_time(100)
+        _get_time(1)
+        ttls = [
+            r_cache.database.ttl(r_cache.make_key(_get_time.make_key(timestamp)))
+            for timestamp in (100, 1)
+        ]
+        assert 300 < ttls[0] <= 310
+        assert 60 < ttls[1] <= 70
+        assert seen[1] == (None, True)
+        with pytest.raises(ValueError):
+            r_cache.cached(timeout=60, ttl_fn=lambda value, _: 0)(_get_time_str)(200)
+
+    def test_ttl_fn_expiry(self):
+        """一级缓存与stale判断以头部记录的实际过期时间为准, 而不是timeout"""
+        r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1")
+        calls = []
+
+        @r_cache.cached(
+            metrics=True,
+            timeout=60,
+            ttl_fn=lambda value, _: 1,
+            stale_ttl=10,
+            local_maxsize=10,
+        )
+        def _echo(value: int) -> int:
+            calls.append(value)
+            return value
+
+        _echo.bust_all()
+        assert _echo(1) == _echo(1) == 1
+        assert _echo.metrics["local_hits"] == 1
+        time.sleep(1.1)
+        assert _echo(1) == 1  # 一级缓存已过期, redis中为stale数据 返回旧值并刷新
+        assert _echo.metrics["stale_hits"] == 1
+        for _ in range(100):
+            if len(calls) == 2:
+                break
+            time.sleep(0.01)
+        assert calls == [1, 1]
+
+    def test_refresh_ahead(self):
+        scheduler = RefreshAheadScheduler(interval=60, ahead_ratio=0.5)
+        r_cache = RedisCache.from_url(
+            "redis://127.0.0.1:6379/1", refresh_ahead=scheduler
+        )
+        calls = []
+
+        @r_cache.cached(timeout=10, refresh_ahead=True)
+        def _echo(value):
+            calls.append(value)
+            return value
+
+        _echo.bust_all()
+        assert [_echo(1), _echo(1), _echo(2)] == [1, 1, 2]
+        assert scheduler.run_once() == 0
+        key = r_cache.make_key(_echo.make_key(1))
+        r_cache.database.pexpire(key, 3000)
+        assert scheduler.run_once() == 1
+        scheduler.close()
+        assert calls == [1, 2, 1]
+        assert r_cache.database.ttl(key) > 5
+        snapshot = r_cache.metrics_snapshot()["refresh_ahead"]
+        assert snapshot["refreshed"] == 1 and snapshot["skipped_fresh"] == 3
+        with pytest.raises(ValueError):
+            RedisCache(r_cache.database).cached(refresh_ahead=True)(_get_time_str)
+
+    @pytest.mark.asyncio
+    async def test_async_refresh_ahead(self):
+        scheduler = RefreshAheadScheduler(interval=60, ahead_ratio=0.5)
+        r_cache = RedisCache.from_url_async(
+            "redis://127.0.0.1:6379/1", refresh_ahead=scheduler
+        )
+        calls = []
+
+        @r_cache.cached(timeout=10, refresh_ahead=True)
+        async def _echo(value):
+            calls.append(value)
+            return value
+
+        await _echo.abust_all()
+        assert await _echo(1) == 1
+        key = r_cache.make_key(_echo.make_key(1))
+        await r_cache.async_database.pexpire(key, 3000)
+        assert await asyncio.to_thread(scheduler.run_once) == 1
+        for _ in range(100):
+            if not scheduler.snapshot()["in_flight"]:
+                break
+            await asyncio.sleep(0.01)
+        assert calls == [1, 1]
+        assert await r_cache.async_database.ttl(key) > 5
+        scheduler.close()
+        await r_cache.async_database.aclose()
@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 15:30
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : test_key_builder.py
+import numpy as np
+import pandas as pd
+
+from lk_tool_kit.cache_utils import hash_arguments, signature_key_fn
+
+
+def _func(x, y=2, *args, **kwargs):
+    pass
+
+
+def test_signature_key_fn():
+    key_fn = signature_key_fn(_func)
+    assert key_fn(1) == key_fn(x=1) == key_fn(1, y=2) == key_fn(y=2, x=1)
+    assert key_fn(1, 2, 3) != key_fn(1, 2)
+    assert key_fn(1, a={"b": 1, "c": [1, 2]}) == key_fn(1, a={"c": [1, 2], "b": 1})
+    assert key_fn("1") != key_fn(1) != key_fn(1.0) != key_fn(True)
+    assert key_fn((1, 2)) != key_fn([1, 2])
+    assert len(key_fn(1)) == 32
+    # 无法绑定的参数退化为直接摘要
+    assert key_fn(z=1) == hash_arguments(z=1)
+
+
+def test_numpy_pandas_key():
+    key_fn = signature_key_fn(_func)
+    array = np.arange(12, dtype=np.int64).reshape(3, 4)
+    assert key_fn(array) == key_fn(array.copy())
+    assert key_fn(array) == key_fn(np.asfortranarray(array))
+    assert key_fn(array) != key_fn(array.reshape(4, 3))
+    assert key_fn(array) != key_fn(array.astype(np.int32))
+    assert key_fn(np.int64(1)) != key_fn(np.int32(1))
+
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    assert key_fn(df) == key_fn(df.copy())
+    assert key_fn(df) != key_fn(df.rename(columns={"b": "c"}))
+    assert key_fn(df) != key_fn(df.iloc[::-1])
+    assert key_fn(df["a"]) != key_fn(df["a"] + 1)
+    assert key_fn(df.index) == key_fn(pd.RangeIndex(2))
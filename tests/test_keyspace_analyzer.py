@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/19 00:40
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : test_keyspace_analyzer.py
+import json
+
+from lk_tool_kit import KeyspaceAnalyzer, RedisCache, ShardedRedisCache
+from lk_tool_kit.__main__ import analyze_keyspace
+from lk_tool_kit.keyspace_analyzer import format_table
+
+
+class TestKeyspaceAnalyzer:
+    def setup_method(self):
+        self.r_cache = RedisCache.from_url("redis://127.0.0.1:6379/1", name="ks")
+        self.r_cache.delete_all()
+
+        @self.r_cache.cached(timeout=600, compress=True, tags=lambda i: ["t"])
+        def compressed(i: int) -> str:
+            return "x" * 1000
+
+        @self.r_cache.cached()
+        def plain(i: int) -> int:
+            return i
+
+        compressed.many(range(3))
+        plain.many(range(5))
+
+    def test_analyze(self):
+        report = KeyspaceAnalyzer(self.r_cache, memory_usage=False).analyze()
+        assert report["scanned"] == 8
+        assert report["size_source"] == "strlen"
+        # 标签集合不是字符串键, 不计入
+        assert list(report["prefixes"]) == ["compressed", "plain"]
+        compressed = report["prefixes"]["compressed"]
+        assert compressed["keys"] == compressed["sampled"] == 3
+        assert compressed["encodings"] == {"zlib": 3}
+        assert compressed["compressed_ratio"] == 1.0
+        assert compressed["no_ttl"] == 0
+        assert 590 < compressed["ttl"]["max"] <= 600
+        assert compressed["ttl"]["buckets"] == {"<=900": 3}
+        plain = report["prefixes"]["plain"]
+        assert plain["no_ttl"] == 5
+        assert plain["encodings"] == {"none": 5}
+        assert plain["total_bytes"] < compressed["total_bytes"]
+        assert "compressed" in format_table(report)
+
+    def test_sample_and_limit(self):
+        analyzer = KeyspaceAnalyzer(
+            self.r_cache, sample_rate=0.01, memory_usage=False, limit=4
+        )
+        report = analyzer.analyze("plain:*")
+        assert report["scanned"] == 4
+        assert report["prefixes"]["plain"]["sampled"] <= 4
+
+    def test_sharded_and_cli(self):
+        sharded = ShardedRedisCache.from_urls(
+            ["redis://127.0.0.1:6379/2", "redis://127.0.0.1:6379/3"], name="ks"
+        )
+        sharded.delete_all()
+        sharded.cached()(lambda i: i).many(range(10))
+        report = KeyspaceAnalyzer(sharded, memory_usage=False).analyze()
+        assert report["prefixes"]["<lambda>"]["keys"] == 10
+
+        output = analyze_keyspace(
+            "redis://127.0.0.1:6379/1", name="ks", memory_usage=False, output="json"
+        )
+        assert json.loads(output)["scanned"] == 8
+        sharded.delete_all()
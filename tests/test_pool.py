@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 19:40
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : test_pool.py
+import threading
+
+import pytest
+import redis
+
+from lk_tool_kit.cache_utils import PoolRegistry, pool_stats
+from lk_tool_kit.func_redis_cache import RedisCache
+
+URL = "redis://127.0.0.1:6379/1"
+
+
+def test_shared_pool():
+    first = RedisCache.from_url(URL, name="a", max_connections=5, socket_timeout=3)
+    second = RedisCache.from_url(URL, name="b", max_connections=5, socket_timeout=3)
+    other = RedisCache.from_url(URL, name="c", max_connections=6)
+    private = RedisCache.from_url(URL, max_connections=5, shared_pool=False)
+    assert first.database.connection_pool is second.database.connection_pool
+    assert first.database.connection_pool is not other.database.connection_pool
+    assert first.database.connection_pool is not private.database.connection_pool
+    kwargs = first.database.connection_pool.connection_kwargs
+    assert kwargs["socket_timeout"] == 3
+    assert first.database.connection_pool.max_connections == 5
+
+
+def test_blocking_pool_stats():
+    registry = PoolRegistry()
+    pool = registry.get(URL, max_connections=1, blocking=True, pool_timeout=0.2)
+    first = pool.get_connection()
+    assert pool_stats(pool)["in_use"] == 1
+    with pytest.raises(redis.ConnectionError):
+        pool.get_connection()
+    stats = pool_stats(pool)
+    assert stats["waits"] == 1
+    assert stats["wait_timeouts"] == 1
+    assert stats["avg_wait_time"] >= 0.2
+
+    timer = threading.Timer(0.02, pool.release, (first,))
+    timer.start()
+    assert pool.get_connection() is first
+    stats = registry.stats()[URL]
+    assert stats["waits"] == 2
+    assert stats["acquired"] == 2
+    assert stats["in_use"] == 1 and stats["idle"] == 0
+    registry.clear()
+    assert registry.stats() == {}
+
+
+@pytest.mark.asyncio
+async def test_async_shared_pool():
+    first = RedisCache.from_url_async(URL, name="a", max_connections=3)
+    second = RedisCache.from_url_async(URL, name="b", max_connections=3)
+    assert first.async_database.connection_pool is second.async_database.connection_pool
+    await first.async_database.set("pool_test", b"1")
+    assert await second.async_database.get("pool_test") == b"1"
+    stats = first.pool_stats()["async"]
+    assert stats["acquired"] == 2
+    assert stats["idle"] == 1
+    await first.async_database.connection_pool.disconnect()
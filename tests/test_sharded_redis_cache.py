@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+# encoding: utf-8
+# @Time    : 2026/10/18 20:40
+# @author  : zza
+# @Email   : 740713651@qq.com
+# @File    : test_sharded_redis_cache.py
+import asyncio
+
+import pytest
+import redis
+
+from lk_tool_kit import ShardedRedisCache
+
+URLS = ["redis://127.0.0.1:6379/%s" % db for db in (1, 2, 3)]
+
+
+def _square(x):
+    return x * x
+
+
+class TestShardedRedisCache:
+    def setup_method(self):
+        self.r_cache = ShardedRedisCache.from_urls(URLS, name="sharded")
+        self.r_cache.delete_all()
+
+    def teardown_method(self):
+        self.r_cache.close()
+
+    def test_routing(self):
+        cached = self.r_cache.cached(metrics=True)(_square)
+        for i in range(30):
+            assert cached(i) == i * i
+        shard_keys = {
+            name: shard.database.keys("sharded:*")
+            for name, shard in self.r_cache.shards.items()
+        }
+        assert sum(len(keys) for keys in shard_keys.values()) == 30
+        assert all(shard_keys.values())  # 每个分片都分到了键
+        for i in range(30):
+            key = cached.make_key(i)
+            redis_key = self.r_cache.make_key(key).encode()
+            assert redis_key in shard_keys[self.r_cache.shard_for(key).name]
+
+        assert cached.many(range(30)) == [i * i for i in range(30)]
+        assert cached.metrics["hits"] == 30
+        snapshot = self.r_cache.metrics_snapshot()
+        assert sum(c["hits"] for c in snapshot["shards"].values()) == 30
+        assert 'shard="%s"' % URLS[0] in self.r_cache.to_prometheus()
+        assert len(self.r_cache.keys()) == 30
+        assert cached.bust_all() == 30
+        assert self.r_cache.keys() == []
+
+    def test_lock(self):
+        cached = self.r_cache.cached(lock=True)(_square)
+        assert cached(3) == 9
+        key = cached.make_key(3)
+        token = self.r_cache.acquire_lock(key, 1)
+        lock_key = self.r_cache.make_lock_key(key)
+        assert self.r_cache.shard_for(key).database.get(lock_key) == token.encode()
+        assert self.r_cache.release_lock(key, token)
+
+    def test_add_shard(self):
+        keys = ["func:%s" % i for i in range(1000)]
+        before = {key: self.r_cache.shard_for(key).name for key in keys}
+        new_url = "redis://127.0.0.1:6379/4"
+        self.r_cache.add_shard(new_url, redis.Redis.from_url(new_url))
+        moved = [key for key in keys if self.r_cache.shard_for(key).name != before[key]]
+        assert all(self.r_cache.shard_for(key).name == new_url for key in moved)
+        assert 150 < len(moved) < 350
+        self.r_cache.remove_shard(new_url)
+        assert {key: self.r_cache.shard_for(key).name for key in keys} == before
+
+
+@pytest.mark.asyncio
+async def test_async_sharded():
+    r_cache = ShardedRedisCache.from_urls(URLS, name="sharded", with_async=True)
+    await r_cache.adelete_all()
+
+    @r_cache.cached(metrics=True)
+    async def _async_square(x):
+        await asyncio.sleep(0)
+        return x * x
+
+    assert await _async_square.many(range(20)) == [i * i for i in range(20)]
+    assert await _async_square(5) == 25
+    assert _async_square.metrics["hits"] == 1
+    assert len(await r_cache.akeys()) == 20
+    assert await r_cache.adelete_all() == 20